@@ -3,14 +3,19 @@ Endpoints de autenticación con JWT profesional
 """
 
 from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr, Field
 from app.database.firebase import get_firebase
 from app.utils.validators import validar_email
+from app.api.responses import FastJSONResponse
 from app.security_enhanced import (
     create_access_token,
     create_refresh_token,
     verify_token,
     get_current_user,
+    revoke_token,
+    security,
     SecurityValidator,
     TokenResponse,
     UserContext
@@ -18,7 +23,7 @@ from app.security_enhanced import (
 import logging
 
 logger = logging.getLogger(__name__)
-router = APIRouter(prefix="/api/auth", tags=["auth"])
+router = APIRouter(prefix="/api/auth", tags=["auth"], default_response_class=FastJSONResponse)
 
 
 class LoginRequest(BaseModel):
@@ -90,7 +95,7 @@ async def signup(request: SignupRequest):
         access_token = create_access_token(uid, request.email)
         refresh_token = create_refresh_token(uid, request.email)
         
-        logger.info(f"Usuario registrado exitosamente: {request.email} (UID: {uid})")
+        logger.info("Usuario registrado exitosamente: %s (UID: %s)", request.email, uid)
         
         return AuthResponse(
             uid=uid,
@@ -103,7 +108,7 @@ async def signup(request: SignupRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error creando usuario: {str(e)}")
+        logger.error("Error creando usuario: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error creando usuario: {str(e)}"
@@ -137,7 +142,7 @@ async def login(request: LoginRequest):
             email = user.email
             display_name = user.display_name or ""
         except Exception as e:
-            logger.warning(f"Usuario no encontrado: {request.email}")
+            logger.warning("Usuario no encontrado: %s", request.email)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Email o contraseña incorrectos"
@@ -147,7 +152,7 @@ async def login(request: LoginRequest):
         access_token = create_access_token(uid, email)
         refresh_token = create_refresh_token(uid, email)
         
-        logger.info(f"Login exitoso: {email} (UID: {uid})")
+        logger.info("Login exitoso: %s (UID: %s)", email, uid)
         
         return AuthResponse(
             uid=uid,
@@ -160,7 +165,7 @@ async def login(request: LoginRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error en login: {str(e)}")
+        logger.error("Error en login: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email o contraseña incorrectos"
@@ -186,7 +191,7 @@ async def refresh_access_token(refresh_token: str = Query(...)):
         # Crear nuevo access token
         new_access_token = create_access_token(uid, email)
         
-        logger.info(f"Token refreshed para: {email}")
+        logger.info("Token refreshed para: %s", email)
         
         return {
             "access_token": new_access_token,
@@ -196,7 +201,7 @@ async def refresh_access_token(refresh_token: str = Query(...)):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error refreshing token: {str(e)}")
+        logger.error("Error refreshing token: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido o expirado"
@@ -212,7 +217,7 @@ async def get_me(current_user: UserContext = Depends(get_current_user)):
         # Obtener datos completos del usuario
         user_data = firebase.read_data(f"users/{current_user.uid}") or {}
         
-        logger.info(f"Me endpoint accedido por: {current_user.email}")
+        logger.info("Me endpoint accedido por: %s", current_user.email)
         
         return AuthResponse(
             uid=current_user.uid,
@@ -223,7 +228,7 @@ async def get_me(current_user: UserContext = Depends(get_current_user)):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error obteniendo usuario actual: {str(e)}")
+        logger.error("Error obteniendo usuario actual: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error obteniendo datos del usuario"
@@ -231,9 +236,14 @@ async def get_me(current_user: UserContext = Depends(get_current_user)):
 
 
 @router.post("/logout")
-async def logout(current_user: UserContext = Depends(get_current_user)):
-    """Endpoint de logout (para limpiar tokens en cliente)"""
-    logger.info(f"Logout: {current_user.email}")
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: UserContext = Depends(get_current_user)
+):
+    """Endpoint de logout: revoca el access token hasta su expiración"""
+    # El almacén de revocaciones puede hacer I/O (SQLite o Firebase)
+    await run_in_threadpool(revoke_token, credentials.credentials)
+    logger.info("Logout: %s", current_user.email)
     return {
         "message": "Logout exitoso",
         "email": current_user.email
@@ -4,8 +4,10 @@ API Router para Configuraciones del Sistema con autenticación JWT
 
 from fastapi import APIRouter, HTTPException, Depends, Query
 from app.models import CompanyConfig, HourConfiguration, ConfigurationUpdate, SystemSettings
-from app.database.firebase import get_firebase
+from app.database.async_firebase import get_async_firebase
+from app.database.payroll_dirty import operacion_marcar_config
 from app.security_enhanced import get_current_user, UserContext
+from app.api.responses import FastJSONResponse
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +16,7 @@ router = APIRouter(
     prefix="/api/config",
     tags=["Configuration"],
     responses={404: {"description": "Not found"}},
+    default_response_class=FastJSONResponse,
 )
 
 
@@ -24,12 +27,12 @@ async def get_system_config(
 ):
     """Obtiene la configuración completa del sistema (requiere autenticación JWT)"""
     try:
-        logger.info(f"Usuario {current_user.email} obteniendo configuración del sistema")
+        logger.info("Usuario %s obteniendo configuración del sistema", current_user.email)
         
-        firebase = get_firebase()
+        firebase = get_async_firebase()
         
         # Obtener configuración de empresa
-        company_data = firebase.read_data(f"clients/{client_id}/config/company") or {}
+        company_data = await firebase.read_data(f"clients/{client_id}/config/company", cache=True) or {}
         company = {
             "empresa_nombre": company_data.get("empresa_nombre", "Mi Empresa"),
             "empresa_nit": company_data.get("empresa_nit", ""),
@@ -41,7 +44,7 @@ async def get_system_config(
         }
         
         # Obtener configuración de horas
-        hours_data = firebase.read_data(f"clients/{client_id}/config/hours") or {}
+        hours_data = await firebase.read_data(f"clients/{client_id}/config/hours", cache=True) or {}
         hours = {
             "client_id": client_id,
             "valor_hora_ordinaria": hours_data.get("valor_hora_ordinaria", 1423500 / 240),
@@ -55,7 +58,7 @@ async def get_system_config(
         }
         
     except Exception as e:
-        logger.error(f"Error obteniendo configuración: {str(e)}")
+        logger.error("Error obteniendo configuración: %s", e)
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
@@ -67,9 +70,9 @@ async def update_company_config(
 ):
     """Actualiza la configuración de la empresa (requiere autenticación JWT)"""
     try:
-        logger.info(f"Usuario {current_user.email} actualizando configuración de empresa")
+        logger.info("Usuario %s actualizando configuración de empresa", current_user.email)
         
-        firebase = get_firebase()
+        firebase = get_async_firebase()
         
         config_data = {
             "empresa_nombre": config.empresa_nombre,
@@ -82,8 +85,11 @@ async def update_company_config(
             "updated_by": current_user.uid,
         }
         
-        firebase.write_data(f"clients/{client_id}/config/company", config_data)
-        logger.info(f"Configuración de empresa actualizada por {current_user.email}")
+        await firebase.batch_write([
+            {"path": f"clients/{client_id}/config/company", "operation": "set", "data": config_data},
+            operacion_marcar_config(client_id),
+        ])
+        logger.info("Configuración de empresa actualizada por %s", current_user.email)
         
         return {
             "message": "Configuración de empresa actualizada correctamente",
@@ -91,7 +97,7 @@ async def update_company_config(
         }
         
     except Exception as e:
-        logger.error(f"Error actualizando configuración: {str(e)}")
+        logger.error("Error actualizando configuración: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -103,9 +109,9 @@ async def update_hours_config(
 ):
     """Actualiza la configuración de horas y recargas (requiere autenticación JWT)"""
     try:
-        logger.info(f"Usuario {current_user.email} actualizando configuración de horas")
+        logger.info("Usuario %s actualizando configuración de horas", current_user.email)
         
-        firebase = get_firebase()
+        firebase = get_async_firebase()
         from datetime import datetime
         
         # Convertir horas_por_config a diccionario si viene como Pydantic models
@@ -124,8 +130,11 @@ async def update_hours_config(
             "updated_by": current_user.uid,
         }
         
-        firebase.write_data(f"clients/{client_id}/config/hours", config_data)
-        logger.info(f"Configuración de horas actualizada por {current_user.email}")
+        await firebase.batch_write([
+            {"path": f"clients/{client_id}/config/hours", "operation": "set", "data": config_data},
+            operacion_marcar_config(client_id),
+        ])
+        logger.info("Configuración de horas actualizada por %s", current_user.email)
         
         return {
             "message": "Configuración de horas actualizada correctamente",
@@ -133,7 +142,7 @@ async def update_hours_config(
         }
         
     except Exception as e:
-        logger.error(f"Error actualizando configuración: {str(e)}")
+        logger.error("Error actualizando configuración: %s", e)
         raise HTTPException(status_code=500, detail=f"Error actualizando config: {str(e)}")
 
 
@@ -144,9 +153,9 @@ async def reset_defaults(
 ):
     """Reinicia las configuraciones a valores por defecto (requiere autenticación JWT)"""
     try:
-        logger.info(f"Usuario {current_user.email} reiniciando configuración a defaults")
+        logger.info("Usuario %s reiniciando configuración a defaults", current_user.email)
         
-        firebase = get_firebase()
+        firebase = get_async_firebase()
         from datetime import datetime
         
         # Valores por defecto
@@ -177,8 +186,11 @@ async def reset_defaults(
             "updated_at": str(datetime.now()),
         }
         
-        firebase.write_data(f"clients/{client_id}/config/company", default_company)
-        firebase.write_data(f"clients/{client_id}/config/hours", default_hours)
+        await firebase.batch_write([
+            {"path": f"clients/{client_id}/config/company", "operation": "set", "data": default_company},
+            {"path": f"clients/{client_id}/config/hours", "operation": "set", "data": default_hours},
+            operacion_marcar_config(client_id),
+        ])
         
         return {
             "message": "Configuraciones reiniciadas a valores por defecto",
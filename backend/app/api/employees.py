@@ -2,10 +2,15 @@
 Endpoints de gestión de empleados con autenticación JWT
 """
 
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
 from typing import List
 from app.models.employee import EmployeeCreate, EmployeeUpdate, Employee
-from app.database.firebase import get_firebase
+from app.database.async_firebase import get_async_firebase
+from app.database.payroll_dirty import operacion_marcar_empleado
+from app.business.calculations import CAMPOS_EMPLEADO
+from app.api.pagination import PaginationParams, set_next_cursor
+from app.api.streaming import wants_ndjson, iter_collection, ndjson_response
+from app.api.responses import FastJSONResponse
 from app.security_enhanced import get_current_user, UserContext
 from app.utils.validators import (
     validar_cedula_colombiana,
@@ -18,7 +23,7 @@ import uuid
 import logging
 
 logger = logging.getLogger(__name__)
-router = APIRouter(prefix="/api/employees", tags=["employees"])
+router = APIRouter(prefix="/api/employees", tags=["employees"], default_response_class=FastJSONResponse)
 
 
 @router.post("/", response_model=Employee, status_code=status.HTTP_201_CREATED)
@@ -29,7 +34,7 @@ async def create_employee(
 ):
     """Crea un nuevo empleado con validaciones (requiere autenticación JWT)"""
     try:
-        logger.info(f"Usuario {current_user.email} creando empleado {employee.nombre}")
+        logger.info("Usuario %s creando empleado %s", current_user.email, employee.nombre)
         
         # Validar cédula
         cedula_valida, msg_cedula = validar_cedula_colombiana(employee.cedula)
@@ -51,7 +56,7 @@ async def create_employee(
         if not salario_valido:
             raise HTTPException(status_code=400, detail=f"Salario: {msg_salario}")
         
-        firebase = get_firebase()
+        firebase = get_async_firebase()
         employee_id = str(uuid.uuid4())
         
         # Si es TEMPORAL, no debe tener deducciones
@@ -77,14 +82,14 @@ async def create_employee(
         }
         
         path = f"clients/{client_id}/employees/{employee_id}"
-        firebase.write_data(path, employee_data)
+        await firebase.write_data(path, employee_data)
         
-        logger.info(f"Empleado {employee_id} creado por {current_user.email}")
+        logger.info("Empleado %s creado por %s", employee_id, current_user.email)
         return Employee(**employee_data)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error creando empleado: {str(e)}")
+        logger.error("Error creando empleado: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error creando empleado: {str(e)}"
@@ -93,16 +98,33 @@ async def create_employee(
 
 @router.get("/", response_model=List[Employee])
 async def list_employees(
+    request: Request,
+    response: Response,
     client_id: str = Query(...),
+    page: PaginationParams = Depends(),
+    stream: bool = Query(False, description="Respuesta NDJSON en streaming"),
     current_user: UserContext = Depends(get_current_user)
 ):
-    """Lista todos los empleados de un cliente (requiere autenticación JWT)"""
+    """
+    Lista los empleados de un cliente, paginados si se envía limit/cursor (requiere autenticación JWT)
+    
+    Con ?stream=1 o Accept: application/x-ndjson la colección se recorre por
+    páginas y se envía un empleado por línea.
+    """
     try:
-        logger.info(f"Usuario {current_user.email} listando empleados del cliente {client_id}")
+        logger.info("Usuario %s listando empleados del cliente %s", current_user.email, client_id)
         
-        firebase = get_firebase()
+        firebase = get_async_firebase()
         path = f"clients/{client_id}/employees"
-        employees_data = firebase.read_data(path)
+        if wants_ndjson(request, stream):
+            return ndjson_response(iter_collection(firebase, path, cursor=page.cursor), model=Employee)
+        
+        if page.enabled:
+            result = await firebase.read_paginated(path, limit=page.limit, cursor=page.cursor)
+            employees_data = result["data"]
+            set_next_cursor(response, result["next_cursor"])
+        else:
+            employees_data = await firebase.read_data(path)
         
         if not employees_data or not isinstance(employees_data, dict):
             return []
@@ -113,11 +135,11 @@ async def list_employees(
                 try:
                     employees.append(Employee(**employee))
                 except Exception as e:
-                    logger.warning(f"Error parsing employee {emp_id}: {str(e)}")
+                    logger.warning("Error parsing employee %s: %s", emp_id, e)
         
         return employees
     except Exception as e:
-        logger.error(f"Error listando empleados: {str(e)}")
+        logger.error("Error listando empleados: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -132,11 +154,11 @@ async def get_employee(
 ):
     """Obtiene un empleado específico (requiere autenticación JWT)"""
     try:
-        logger.info(f"Usuario {current_user.email} obteniendo empleado {employee_id}")
+        logger.info("Usuario %s obteniendo empleado %s", current_user.email, employee_id)
         
-        firebase = get_firebase()
+        firebase = get_async_firebase()
         path = f"clients/{client_id}/employees/{employee_id}"
-        employee_data = firebase.read_data(path)
+        employee_data = await firebase.read_data(path)
         
         if not employee_data:
             raise HTTPException(
@@ -148,7 +170,7 @@ async def get_employee(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error obteniendo empleado: {str(e)}")
+        logger.error("Error obteniendo empleado: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -164,13 +186,13 @@ async def update_employee(
 ):
     """Actualiza un empleado (requiere autenticación JWT)"""
     try:
-        logger.info(f"Usuario {current_user.email} actualizando empleado {employee_id}")
+        logger.info("Usuario %s actualizando empleado %s", current_user.email, employee_id)
         
-        firebase = get_firebase()
+        firebase = get_async_firebase()
         path = f"clients/{client_id}/employees/{employee_id}"
         
         # Obtener empleado actual
-        current = firebase.read_data(path)
+        current = await firebase.read_data(path)
         if not current:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -189,16 +211,23 @@ async def update_employee(
             update_data["deducir_pension"] = False
             update_data["deducir_auxilioTransporte"] = False
         
-        firebase.update_data(path, update_data)
+        # Campo a campo, para combinar la actualización con la marca de recálculo
+        operaciones = [
+            {"path": f"{path}/{campo}", "operation": "set", "data": valor}
+            for campo, valor in update_data.items()
+        ]
+        if any(current.get(campo) != update_data[campo] for campo in CAMPOS_EMPLEADO if campo in update_data):
+            operaciones.append(operacion_marcar_empleado(client_id, employee_id))
+        await firebase.batch_write(operaciones)
         
         # Obtener datos actualizados
-        updated = firebase.read_data(path)
-        logger.info(f"Empleado {employee_id} actualizado por {current_user.email}")
+        updated = await firebase.read_data(path)
+        logger.info("Empleado %s actualizado por %s", employee_id, current_user.email)
         return Employee(**updated)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error actualizando empleado: {str(e)}")
+        logger.error("Error actualizando empleado: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -213,25 +242,26 @@ async def delete_employee(
 ):
     """Elimina un empleado (requiere autenticación JWT)"""
     try:
-        logger.info(f"Usuario {current_user.email} eliminando empleado {employee_id}")
+        logger.info("Usuario %s eliminando empleado %s", current_user.email, employee_id)
         
+        firebase = get_async_firebase()
         path = f"clients/{client_id}/employees/{employee_id}"
         
         # Verificar que existe
-        employee = firebase.read_data(path)
+        employee = await firebase.read_data(path)
         if not employee:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Empleado no encontrado"
             )
         
-        firebase.delete_data(path)
-        logger.info(f"Empleado {employee_id} eliminado por {current_user.email}")
+        await firebase.delete_data(path)
+        logger.info("Empleado %s eliminado por %s", employee_id, current_user.email)
         return None
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error eliminando empleado: {str(e)}")
+        logger.error("Error eliminando empleado: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
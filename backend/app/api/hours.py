@@ -2,10 +2,23 @@
 Endpoints para gestión de horas trabajadas con autenticación JWT
 """
 
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
 from typing import List, Dict
 from app.models.hours import HoursCreate, HoursUpdate, Hours
-from app.database.firebase import get_firebase
+from app.database.async_firebase import get_async_firebase
+from app.database.pagination import paginar
+from app.api.pagination import PaginationParams, set_next_cursor
+from app.api.streaming import wants_ndjson, iter_collection, iter_dict, ndjson_response
+from app.api.responses import FastJSONResponse
+from app.database.hours_layout import (
+    ruta_horas,
+    operaciones_guardar,
+    operaciones_eliminar,
+    operaciones_actualizar,
+    leer_horas_empleado_quincena,
+    leer_horas_quincena,
+)
+from app.database.payroll_dirty import operaciones_marcar_horas
 from app.security_enhanced import get_current_user, UserContext
 from app.utils.validators import validar_periodo, validar_horas_trabajo
 from datetime import datetime
@@ -13,7 +26,7 @@ import uuid
 import logging
 
 logger = logging.getLogger(__name__)
-router = APIRouter(prefix="/api/hours", tags=["hours"])
+router = APIRouter(prefix="/api/hours", tags=["hours"], default_response_class=FastJSONResponse)
 
 
 @router.post("/", response_model=Hours, status_code=status.HTTP_201_CREATED)
@@ -49,7 +62,7 @@ async def create_hours(
         if not horas_validas:
             raise HTTPException(status_code=400, detail=f"Validación de horas: {msg_horas}")
         
-        firebase = get_firebase()
+        firebase = get_async_firebase()
         hours_id = str(uuid.uuid4())
         
         hours_data = {
@@ -76,15 +89,18 @@ async def create_hours(
             "created_by": current_user.uid,
         }
         
-        path = f"clients/{client_id}/hours/{hours_id}"
-        firebase.write_data(path, hours_data)
+        # Escritura dual y marca de recálculo en una sola actualización
+        await firebase.batch_write(
+            operaciones_guardar(client_id, hours_id, hours_data)
+            + operaciones_marcar_horas(client_id, hours_data)
+        )
         
-        logger.info(f"Horas {hours_id} registradas por {current_user.email}")
+        logger.info("Horas %s registradas por %s", hours_id, current_user.email)
         return Hours(**hours_data)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error registrando horas: {str(e)}")
+        logger.error("Error registrando horas: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error registrando horas: {str(e)}"
@@ -93,16 +109,56 @@ async def create_hours(
 
 @router.get("/", response_model=List[Hours])
 async def list_hours(
+    request: Request,
+    response: Response,
     client_id: str = Query(...),
+    employee_id: str = Query(None),
+    quincena: str = Query(None),
+    page: PaginationParams = Depends(),
+    stream: bool = Query(False, description="Respuesta NDJSON en streaming"),
     current_user: UserContext = Depends(get_current_user)
 ):
-    """Lista todas las horas registradas de un cliente (requiere autenticación JWT)"""
+    """
+    Lista las horas registradas de un cliente, opcionalmente por empleado y/o quincena (requiere autenticación JWT)
+    
+    Con ?stream=1 o Accept: application/x-ndjson se envía un registro por
+    línea; sin filtros la colección se recorre por páginas.
+    """
     try:
-        logger.info(f"Usuario {current_user.email} listando horas del cliente {client_id}")
+        logger.info("Usuario %s listando horas del cliente %s", current_user.email, client_id)
+        
+        firebase = get_async_firebase()
+        path = ruta_horas(client_id)
+        streaming = wants_ndjson(request, stream)
+        
+        if streaming and not (quincena or employee_id):
+            return ndjson_response(iter_collection(firebase, path, cursor=page.cursor), model=Hours)
+        
+        # El filtro más selectivo se resuelve en el servidor
+        if quincena and employee_id:
+            hours_data = await leer_horas_empleado_quincena(firebase, client_id, employee_id, quincena)
+        elif quincena:
+            hours_data = await leer_horas_quincena(firebase, client_id, quincena)
+        elif employee_id:
+            hours_data = await firebase.query(path, order_by="employee_id", equal_to=employee_id)
+        elif page.enabled:
+            result = await firebase.read_paginated(path, limit=page.limit, cursor=page.cursor)
+            hours_data = result["data"]
+            set_next_cursor(response, result["next_cursor"])
+        else:
+            hours_data = await firebase.read_data(path)
+        
+        if streaming:
+            return ndjson_response(
+                iter_dict(hours_data),
+                model=Hours,
+                filtro=lambda hour: not employee_id or hour.get("employee_id") == employee_id
+            )
         
-        firebase = get_firebase()
-        path = f"clients/{client_id}/hours"
-        hours_data = firebase.read_data(path)
+        # Los resultados filtrados ya son acotados: se paginan en memoria
+        if page.enabled and (quincena or employee_id):
+            hours_data, next_cursor = paginar(hours_data or {}, page.limit, page.cursor)
+            set_next_cursor(response, next_cursor)
         
         if not hours_data:
             return []
@@ -111,13 +167,15 @@ async def list_hours(
         if isinstance(hours_data, dict):
             for hour_id, hour in hours_data.items():
                 if isinstance(hour, dict):
+                    if employee_id and hour.get("employee_id") != employee_id:
+                        continue
                     try:
                         hours_list.append(Hours(**hour))
                     except Exception as e:
-                        logger.warning(f"Error parsing hours record {hour_id}: {str(e)}")
+                        logger.warning("Error parsing hours record %s: %s", hour_id, e)
         return hours_list
     except Exception as e:
-        logger.error(f"Error listando horas: {str(e)}")
+        logger.error("Error listando horas: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -132,11 +190,11 @@ async def get_hours(
 ):
     """Obtiene un registro de horas (requiere autenticación JWT)"""
     try:
-        logger.info(f"Usuario {current_user.email} obteniendo horas {hours_id}")
+        logger.info("Usuario %s obteniendo horas %s", current_user.email, hours_id)
         
-        firebase = get_firebase()
-        path = f"clients/{client_id}/hours/{hours_id}"
-        hours_data = firebase.read_data(path)
+        firebase = get_async_firebase()
+        path = ruta_horas(client_id, hours_id)
+        hours_data = await firebase.read_data(path)
         
         if not hours_data or not isinstance(hours_data, dict):
             raise HTTPException(
@@ -148,7 +206,7 @@ async def get_hours(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error obteniendo horas: {str(e)}")
+        logger.error("Error obteniendo horas: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -163,21 +221,14 @@ async def get_hours_by_employee_quincena(
 ):
     """Obtiene las horas de un empleado en una quincena específica"""
     try:
-        firebase = get_firebase()
-        path = f"clients/{client_id}/hours"
-        all_hours = firebase.read_data(path)
-        
-        if not all_hours or not isinstance(all_hours, dict):
-            return None
+        firebase = get_async_firebase()
+        all_hours = await leer_horas_empleado_quincena(firebase, client_id, employee_id, quincena)
         
-        # Filtrar por empleado y quincena
         for hours_id, hours_data in all_hours.items():
-            if isinstance(hours_data, dict) and (hours_data.get("employee_id") == employee_id and 
-                hours_data.get("quincena") == quincena):
-                try:
-                    return Hours(**hours_data)
-                except Exception as e:
-                    logger.warning(f"Error parsing hours record {hours_id}: {str(e)}")
+            try:
+                return Hours(**hours_data)
+            except Exception as e:
+                logger.warning("Error parsing hours record %s: %s", hours_id, e)
         
         return None
     except Exception as e:
@@ -195,11 +246,11 @@ async def update_hours(
 ):
     """Actualiza un registro de horas"""
     try:
-        firebase = get_firebase()
-        path = f"clients/{client_id}/hours/{hours_id}"
+        firebase = get_async_firebase()
+        path = ruta_horas(client_id, hours_id)
         
         # Obtener registro actual
-        current = firebase.read_data(path)
+        current = await firebase.read_data(path)
         if not current:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -209,11 +260,13 @@ async def update_hours(
         # Actualizar solo campos proporcionados
         update_data = hours_update.dict(exclude_unset=True)
         update_data["updated_at"] = datetime.now().isoformat()
+        updated = {**current, **update_data}
         
-        firebase.update_data(path, update_data)
-        
-        # Obtener datos actualizados
-        updated = firebase.read_data(path)
+        # Escritura dual de los campos modificados en ambas distribuciones
+        await firebase.batch_write(
+            operaciones_actualizar(client_id, hours_id, current, update_data)
+            + operaciones_marcar_horas(client_id, current, updated)
+        )
         return Hours(**updated)
     except Exception as e:
         raise HTTPException(
@@ -226,18 +279,21 @@ async def update_hours(
 async def delete_hours(hours_id: str, client_id: str = Query(...)):
     """Elimina un registro de horas"""
     try:
-        firebase = get_firebase()
-        path = f"clients/{client_id}/hours/{hours_id}"
+        firebase = get_async_firebase()
+        path = ruta_horas(client_id, hours_id)
         
         # Verificar que existe
-        hours_data = firebase.read_data(path)
+        hours_data = await firebase.read_data(path)
         if not hours_data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Registro de horas no encontrado"
             )
         
-        firebase.delete_data(path)
+        await firebase.batch_write(
+            operaciones_eliminar(client_id, hours_id, hours_data)
+            + operaciones_marcar_horas(client_id, hours_data)
+        )
         return None
     except Exception as e:
         raise HTTPException(
@@ -0,0 +1,42 @@
+"""
+Parámetros de paginación por cursor compartidos por los endpoints de listado
+"""
+
+from fastapi import HTTPException, Query, Response, status
+from typing import Optional
+from app.config.settings import settings
+from app.database.pagination import decodificar_cursor
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PaginationParams:
+    """
+    Dependencia con los query params limit/cursor
+
+    Sin limit ni cursor el listado se devuelve completo (comportamiento
+    anterior); con cursor y sin limit se usa PAGINATION_DEFAULT_LIMIT.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=settings.PAGINATION_MAX_LIMIT, description="Registros por página"),
+        cursor: Optional[str] = Query(None, description="Cursor devuelto por la página anterior")
+    ):
+        try:
+            decodificar_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        self.cursor = cursor
+        self.limit = limit or (settings.PAGINATION_DEFAULT_LIMIT if cursor else None)
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit is not None
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    """Publica el cursor de la página siguiente en la cabecera X-Next-Cursor"""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -2,20 +2,289 @@
 Endpoints de cálculo y gestión de nóminas con autenticación JWT
 """
 
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List, Dict
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
 from app.models.payroll import PayrollCalculation, PayrollBatch
 from app.models.hours import Hours
-from app.business.calculations import PayrollCalculator
-from app.database.firebase import get_firebase
-from app.security_enhanced import get_current_user, UserContext
+from app.business.calculations import PayrollRow, calcular_nomina_memo, obtener_calculador
+from app.business.jobs import (
+    ColaLlenaError,
+    ORIGEN_HORAS_ENVIADAS,
+    ORIGEN_HORAS_REGISTRADAS,
+    datos_lote,
+    get_job_manager,
+    preparar_lote,
+    ruta_lote,
+    ruta_trabajo,
+    totales_lote,
+)
+from app.database.async_firebase import get_async_firebase
+from app.database.hours_layout import (
+    leer_horas_empleado_quincena,
+    leer_horas_quincena,
+    leer_horas_quincena_rango,
+    migracion_completa,
+)
+from app.database.payroll_dirty import empleados_pendientes, marca_lote
+from app.database.pagination import paginar
+from app.api.pagination import PaginationParams, set_next_cursor
+from app.api.streaming import (
+    wants_ndjson,
+    iter_collection,
+    iter_dict,
+    iter_pages,
+    ndjson_response,
+    ndjson_stream,
+)
+from app.api.responses import FastJSONResponse
+from app.security_enhanced import get_current_user, get_optional_user, UserContext
 from app.utils.validators import validar_periodo
+from app.config.settings import settings
 from datetime import datetime
+import asyncio
+import time
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
-router = APIRouter(prefix="/api/payroll", tags=["payroll"])
+router = APIRouter(prefix="/api/payroll", tags=["payroll"], default_response_class=FastJSONResponse)
+
+# Registro de horas en ceros para empleados sin horas en el período
+HORAS_VACIAS = {
+    "horas_ordinarias": 0,
+    "recargo_nocturno": 0,
+    "recargo_diurno_dominical": 0,
+    "recargo_nocturno_dominical": 0,
+    "hora_extra_diurna": 0,
+    "hora_extra_nocturna": 0,
+    "hora_diurna_dominical_o_festivo": 0,
+    "hora_extra_diurna_dominical_o_festivo": 0,
+    "hora_nocturna_dominical_o_festivo": 0,
+    "hora_extra_nocturna_dominical_o_festivo": 0,
+}
+
+
+def _indexar_horas(hours_data, periodo: str = None) -> Dict[Tuple[str, str], Dict]:
+    """
+    Construye un índice (employee_id, quincena) -> registro de horas
+
+    Se conserva el primer registro encontrado para cada par, igual que la
+    búsqueda lineal que reemplaza.
+
+    Args:
+        hours_data: Árbol de horas leído de Firebase
+        periodo: Si se indica, solo se indexan registros de esa quincena
+
+    Returns:
+        Dict con los registros indexados
+    """
+    indice = {}
+    if not hours_data:
+        return indice
+
+    registros = hours_data.values() if isinstance(hours_data, dict) else [hours_data]
+    for hora in registros:
+        if not isinstance(hora, dict):
+            continue
+        quincena = hora.get("quincena")
+        if periodo and quincena != periodo:
+            continue
+        indice.setdefault((hora.get("employee_id"), quincena), hora)
+
+    return indice
+
+
+async def _leer_empleados(firebase, client_id: str, employee_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Lee los empleados indicados de forma concurrente
+
+    Si los empleados pedidos son una fracción grande del roster
+    (BATCH_SUBTREE_READ_RATIO) se lee el árbol completo en una sola llamada;
+    si no, se lanzan lecturas individuales con BATCH_READ_CONCURRENCY como
+    máximo de lecturas simultáneas.
+
+    Returns:
+        Dict employee_id -> datos del empleado (solo los que existen)
+    """
+    ids = list(dict.fromkeys(employee_ids))
+    concurrencia = max(1, settings.BATCH_READ_CONCURRENCY)
+    employees_path = f"clients/{client_id}/employees"
+
+    if len(ids) > concurrencia:
+        roster = await firebase.read_keys(employees_path)
+        if roster and len(ids) >= settings.BATCH_SUBTREE_READ_RATIO * len(roster):
+            employees_data = await firebase.read_data(employees_path) or {}
+            if not isinstance(employees_data, dict):
+                return {}
+            return {emp_id: employees_data[emp_id] for emp_id in ids if employees_data.get(emp_id)}
+
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    async def leer(emp_id: str):
+        async with semaforo:
+            return emp_id, await firebase.read_data(f"{employees_path}/{emp_id}")
+
+    leidos = await asyncio.gather(*(leer(emp_id) for emp_id in ids))
+    return {emp_id: employee for emp_id, employee in leidos if employee}
+
+
+async def _leer_horas_empleados(
+    firebase,
+    client_id: str,
+    quincena: str,
+    employee_ids: List[str]
+) -> Dict[Tuple[str, str], Dict]:
+    """
+    Índice de horas de la quincena para algunos empleados
+
+    Hasta BATCH_READ_CONCURRENCY empleados se leen por separado; para más, una
+    sola lectura de la quincena completa.
+    """
+    if len(employee_ids) > max(1, settings.BATCH_READ_CONCURRENCY):
+        return _indexar_horas(await leer_horas_quincena(firebase, client_id, quincena), quincena)
+
+    leidas = await asyncio.gather(*(
+        leer_horas_empleado_quincena(firebase, client_id, emp_id, quincena)
+        for emp_id in employee_ids
+    ))
+    indice = {}
+    for horas_empleado in leidas:
+        for clave, hora in _indexar_horas(horas_empleado, quincena).items():
+            indice.setdefault(clave, hora)
+    return indice
+
+
+def _armar_lote(pares, indice_horas, periodo: str) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Reúne empleados y horas para el cálculo columnar
+
+    Args:
+        pares: Iterable de (employee_id, datos del empleado)
+        indice_horas: Índice (employee_id, quincena) -> registro de horas
+        periodo: Período (YYYY-MM)
+
+    Returns:
+        Tupla (empleados, horas) alineadas por posición
+    """
+    lote_empleados = []
+    lote_horas = []
+    for emp_id, employee in pares:
+        lote_empleados.append(employee)
+        lote_horas.append(indice_horas.get((emp_id, periodo)) or dict(HORAS_VACIAS))
+    return lote_empleados, lote_horas
+
+
+def _nuevos_totales() -> Dict[str, float]:
+    return {"total_bruto": 0.0, "total_descuentos": 0.0, "total_neto": 0.0}
+
+
+def _acumular_totales(totales: Dict[str, float], fila: PayrollRow) -> None:
+    """Suma una nómina a los acumuladores de totales (una sola pasada)"""
+    totales["total_bruto"] += fila.total_bruto
+    totales["total_descuentos"] += fila.total_descuentos
+    totales["total_neto"] += fila.neto_a_pagar
+
+
+def _redondear_totales(totales: Dict[str, float]) -> Dict[str, float]:
+    return {clave: round(valor, 2) for clave, valor in totales.items()}
+
+
+async def _lotes_nomina(
+    firebase,
+    client_id: str,
+    periodo: str,
+    employee_ids: List[str] = None
+) -> AsyncIterator[Tuple[List[Tuple[str, Dict]], Dict[Tuple[str, str], Dict]]]:
+    """
+    Produce los empleados a calcular por lotes de STREAM_PAGE_SIZE
+
+    Sin employee_ids el roster se recorre por páginas y, con la migración de
+    horas completa, cada página lee solo las horas de su rango de empleados,
+    de modo que la memoria queda acotada por el tamaño de página. Antes de la
+    migración las horas de la quincena se leen una vez (no hay índice por
+    empleado dentro de la quincena en la distribución plana).
+
+    Args:
+        firebase: AsyncFirebaseManager
+        client_id: ID del cliente
+        periodo: Período (YYYY-MM)
+        employee_ids: IDs pedidos explícitamente (opcional)
+
+    Yields:
+        Tuplas (pares (employee_id, empleado), índice de horas del lote)
+    """
+    tamano = max(1, settings.STREAM_PAGE_SIZE)
+
+    if employee_ids:
+        empleados, hours_data = await asyncio.gather(
+            _leer_empleados(firebase, client_id, employee_ids),
+            leer_horas_quincena(firebase, client_id, periodo),
+        )
+        indice_horas = _indexar_horas(hours_data, periodo)
+        pares = [(emp_id, empleados[emp_id]) for emp_id in employee_ids if empleados.get(emp_id)]
+        for inicio in range(0, len(pares), tamano):
+            yield pares[inicio:inicio + tamano], indice_horas
+        return
+
+    indice_completo = None
+    if not await migracion_completa(firebase, client_id):
+        indice_completo = _indexar_horas(await leer_horas_quincena(firebase, client_id, periodo), periodo)
+
+    async for pagina in iter_pages(firebase, f"clients/{client_id}/employees", page_size=tamano):
+        pares = [(e["id"], e) for e in pagina.values() if isinstance(e, dict) and e.get("id")]
+        if not pares:
+            continue
+
+        if indice_completo is not None:
+            indice_horas = indice_completo
+        else:
+            ids = [emp_id for emp_id, _ in pares]
+            hours_data = await leer_horas_quincena_rango(firebase, client_id, periodo, min(ids), max(ids))
+            indice_horas = _indexar_horas(hours_data, periodo)
+
+        yield pares, indice_horas
+
+
+async def _stream_nomina_lote(
+    firebase,
+    calculator,
+    client_id: str,
+    periodo: str,
+    employee_ids: List[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Calcula la nómina en lote emitiendo cada resultado apenas está listo
+
+    Cada nómina sale como un objeto; al final se emite un registro con los
+    totales acumulados en la misma pasada. Si algo falla a mitad del stream
+    (ya no se puede cambiar el status) se emite un registro de error en lugar
+    de los totales.
+
+    Yields:
+        Nóminas y, al final, {"success", "periodo", "cantidad_empleados", "totales"}
+    """
+    totales = _nuevos_totales()
+    cantidad = 0
+    try:
+        async for pares, indice_horas in _lotes_nomina(firebase, client_id, periodo, employee_ids):
+            lote_empleados, lote_horas = _armar_lote(pares, indice_horas, periodo)
+            for fila in calculator.calcular_filas_batch(lote_empleados, lote_horas, periodo):
+                _acumular_totales(totales, fila)
+                cantidad += 1
+                yield fila.to_dict()
+    except Exception as e:
+        logger.error("Error en cálculo batch (stream) tras %s empleados: %s", cantidad, e)
+        yield {"success": False, "error": f"Error en cálculo batch: {str(e)}", "cantidad_empleados": cantidad}
+        return
+
+    logger.info("Nómina en lote (stream) calculada: %s empleados", cantidad)
+    yield {
+        "success": True,
+        "periodo": periodo,
+        "cantidad_empleados": cantidad,
+        "totales": _redondear_totales(totales),
+    }
 
 
 @router.post("/calculate/{employee_id}")
@@ -38,7 +307,7 @@ async def calculate_employee_payroll(
         dict: Cálculo completo de la nómina
     """
     try:
-        logger.info(f"Usuario {current_user.email} calculando nómina para {employee_id} período {periodo}")
+        logger.info("Usuario %s calculando nómina para %s período %s", current_user.email, employee_id, periodo)
         
         # Validar período
         periodo_valido, msg_periodo = validar_periodo(periodo)
@@ -49,11 +318,11 @@ async def calculate_employee_payroll(
         if not employee_id or len(employee_id) < 1:
             raise HTTPException(status_code=400, detail="employee_id es requerido")
         
-        firebase = get_firebase()
+        firebase = get_async_firebase()
 
         # Obtener datos del empleado
         employee_path = f"clients/{client_id}/employees/{employee_id}"
-        employee = firebase.read_data(employee_path)
+        employee = await firebase.read_data(employee_path)
 
         if not employee:
             raise HTTPException(
@@ -62,50 +331,24 @@ async def calculate_employee_payroll(
             )
 
         # Obtener configuración del cliente
-        company_config = firebase.read_data(f"clients/{client_id}/config/company") or {}
-        hours_config = firebase.read_data(f"clients/{client_id}/config/hours") or {}
-
-        # Combinar configuración
-        config = {
-            **company_config,
-            **hours_config,
-        }
-
-        # Obtener horas registradas en el período
-        hours_query = firebase.read_data(f"clients/{client_id}/hours")
-        horas_empleado = {}
+        company_config = await firebase.read_data(f"clients/{client_id}/config/company", cache=True) or {}
+        hours_config = await firebase.read_data(f"clients/{client_id}/config/hours", cache=True) or {}
 
-        if hours_query:
-            for hora_data in (hours_query if isinstance(hours_query, list) else [hours_query]):
-                if (
-                    hora_data.get("employee_id") == employee_id
-                    and hora_data.get("quincena") == periodo
-                ):
-                    horas_empleado = hora_data
-                    break
+        # Obtener horas registradas del empleado en el período
+        hours_query = await leer_horas_empleado_quincena(firebase, client_id, employee_id, periodo)
+        horas_empleado = _indexar_horas(hours_query, periodo).get((employee_id, periodo), {})
 
         # Si no hay registro de horas, usar ceros
         if not horas_empleado:
-            horas_empleado = {
-                "horas_ordinarias": 0,
-                "recargo_nocturno": 0,
-                "recargo_diurno_dominical": 0,
-                "recargo_nocturno_dominical": 0,
-                "hora_extra_diurna": 0,
-                "hora_extra_nocturna": 0,
-                "hora_diurna_dominical_o_festivo": 0,
-                "hora_extra_diurna_dominical_o_festivo": 0,
-                "hora_nocturna_dominical_o_festivo": 0,
-                "hora_extra_nocturna_dominical_o_festivo": 0,
-            }
+            horas_empleado = dict(HORAS_VACIAS)
 
-        # Crear calculador
-        calculator = PayrollCalculator(config)
+        # Calculador compilado para la configuración del cliente
+        calculator = obtener_calculador(company_config, hours_config)
 
         # Calcular nómina
-        payroll = calculator.calcular_nomina(employee, horas_empleado, periodo)
+        payroll = calcular_nomina_memo(calculator, employee, horas_empleado, periodo)
         
-        logger.info(f"Nómina calculada para {employee_id} por {current_user.email}")
+        logger.info("Nómina calculada para %s por %s", employee_id, current_user.email)
 
         return {
             "success": True,
@@ -123,108 +366,107 @@ async def calculate_employee_payroll(
 
 @router.post("/batch-calculate")
 async def calculate_batch_payroll(
+    request: Request,
     client_id: str = Query(...),
     periodo: str = Query(...),
     employee_ids: List[str] = Query(None),  # Si es None, calcula para todos
+    stream: bool = Query(False, description="Respuesta NDJSON en streaming"),
     current_user: UserContext = Depends(get_current_user)
 ):
     """
     Calcula nómina para múltiples empleados con validaciones (requiere autenticación JWT)
 
+    Con stream (o Accept: application/x-ndjson) cada nómina se envía apenas se
+    calcula, una por línea, y la última línea trae los totales.
+
     Args:
+        request: Request (para negociar NDJSON por el header Accept)
         client_id: ID del cliente
         periodo: Período (YYYY-MM)
         employee_ids: Lista de IDs de empleados (opcional)
+        stream: Enviar una nómina por línea (NDJSON) en lugar del objeto completo
         current_user: Usuario autenticado
 
     Returns:
         dict: Lista de cálculos de nómina
     """
     try:
-        logger.info(f"Usuario {current_user.email} calculando nómina en lote para período {periodo}")
+        logger.info("Usuario %s calculando nómina en lote para período %s", current_user.email, periodo)
         
         # Validar período
         periodo_valido, msg_periodo = validar_periodo(periodo)
         if not periodo_valido:
             raise HTTPException(status_code=400, detail=f"Período: {msg_periodo}")
         
-        firebase = get_firebase()
+        firebase = get_async_firebase()
+
+        if wants_ndjson(request, stream):
+            company_config, hours_config = await asyncio.gather(
+                firebase.read_data(f"clients/{client_id}/config/company", cache=True),
+                firebase.read_data(f"clients/{client_id}/config/hours", cache=True),
+            )
+            calculator = obtener_calculador(company_config or {}, hours_config or {})
+            return ndjson_stream(_stream_nomina_lote(firebase, calculator, client_id, periodo, employee_ids))
+
+        # Empleados, configuración y horas se leen en paralelo
+        if employee_ids:
+            lectura_empleados = _leer_empleados(firebase, client_id, employee_ids)
+        else:
+            lectura_empleados = firebase.read_data(f"clients/{client_id}/employees")
+
+        empleados_leidos, company_config, hours_config, hours_data = await asyncio.gather(
+            lectura_empleados,
+            firebase.read_data(f"clients/{client_id}/config/company", cache=True),
+            firebase.read_data(f"clients/{client_id}/config/hours", cache=True),
+            leer_horas_quincena(firebase, client_id, periodo),
+        )
 
         # Obtener todos los empleados si no se especifican
-        if not employee_ids:
-            employees_data = firebase.read_data(f"clients/{client_id}/employees")
-            employee_ids = [e["id"] for e in (employees_data.values() if isinstance(employees_data, dict) else [employees_data])]
+        if employee_ids:
+            empleados = empleados_leidos
+        else:
+            empleados = {}
+            for e in (empleados_leidos.values() if isinstance(empleados_leidos, dict) else [empleados_leidos]):
+                if isinstance(e, dict) and e.get("id"):
+                    empleados[e["id"]] = e
+            employee_ids = list(empleados)
+
+        calculator = obtener_calculador(company_config or {}, hours_config or {})
+
+        # Horas indexadas por (empleado, quincena), leídas una sola vez
+        indice_horas = _indexar_horas(hours_data, periodo)
+
+        # Reunir empleados y horas para el cálculo columnar
+        lote_empleados, lote_horas = _armar_lote(
+            ((emp_id, empleados[emp_id]) for emp_id in employee_ids if empleados.get(emp_id)),
+            indice_horas,
+            periodo,
+        )
 
-        # Obtener configuración del cliente
-        company_config = firebase.read_data(f"clients/{client_id}/config/company") or {}
-        hours_config = firebase.read_data(f"clients/{client_id}/config/hours") or {}
+        payrolls = calculator.calcular_nomina_batch(lote_empleados, lote_horas, periodo)
 
-        config = {
-            **company_config,
-            **hours_config,
-        }
+        # Calcular totales en una sola pasada
+        totales = _nuevos_totales()
+        for payroll in payrolls:
+            totales["total_bruto"] += payroll["total_bruto"]
+            totales["total_descuentos"] += payroll["total_descuentos"]
+            totales["total_neto"] += payroll["neto_a_pagar"]
 
-        calculator = PayrollCalculator(config)
-        payrolls = []
-
-        # Calcular nómina para cada empleado
-        for emp_id in employee_ids:
-            employee = firebase.read_data(f"clients/{client_id}/employees/{emp_id}")
-            if not employee:
-                continue
-
-            horas_empleado = {}
-            hours_data = firebase.read_data(f"clients/{client_id}/hours")
-
-            if hours_data:
-                for hora in (hours_data.values() if isinstance(hours_data, dict) else [hours_data]):
-                    if (
-                        hora.get("employee_id") == emp_id
-                        and hora.get("quincena") == periodo
-                    ):
-                        horas_empleado = hora
-                        break
-
-            if not horas_empleado:
-                horas_empleado = {
-                    "horas_ordinarias": 0,
-                    "recargo_nocturno": 0,
-                    "recargo_diurno_dominical": 0,
-                    "recargo_nocturno_dominical": 0,
-                    "hora_extra_diurna": 0,
-                    "hora_extra_nocturna": 0,
-                    "hora_diurna_dominical_o_festivo": 0,
-                    "hora_extra_diurna_dominical_o_festivo": 0,
-                    "hora_nocturna_dominical_o_festivo": 0,
-                    "hora_extra_nocturna_dominical_o_festivo": 0,
-                }
-
-            payroll = calculator.calcular_nomina(employee, horas_empleado, periodo)
-            payrolls.append(payroll)
-
-        # Calcular totales
-        total_bruto = sum(p["total_bruto"] for p in payrolls)
-        total_descuentos = sum(p["total_descuentos"] for p in payrolls)
-        total_neto = sum(p["neto_a_pagar"] for p in payrolls)
-        
-        logger.info(f"Nómina en lote calculada: {len(payrolls)} empleados por {current_user.email}")
+        logger.info("Nómina en lote calculada: %s empleados por %s", len(payrolls), current_user.email)
 
-        return {
+        # Resultado grande: se serializa directamente, sin jsonable_encoder
+        return FastJSONResponse({
             "success": True,
             "periodo": periodo,
             "cantidad_empleados": len(payrolls),
             "payrolls": payrolls,
-            "totales": {
-                "total_bruto": round(total_bruto, 2),
-                "total_descuentos": round(total_descuentos, 2),
-                "total_neto": round(total_neto, 2),
-            }
-        }
+            "totales": _redondear_totales(totales),
+        })
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error en cálculo batch: {str(e)}")
+        logger.error("Error en cálculo batch: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error en cálculo batch: {str(e)}"
@@ -233,53 +475,85 @@ async def calculate_batch_payroll(
 
 @router.get("/history")
 async def get_payroll_history(
+    request: Request,
     client_id: str,
     employee_id: str = None,
     periodo: str = None,
+    page: PaginationParams = Depends(),
+    stream: bool = Query(False, description="Respuesta NDJSON en streaming"),
     current_user: UserContext = Depends(get_current_user)
 ):
     """
     Obtiene el historial de nóminas calculadas (requiere autenticación JWT)
 
     Args:
+        request: Request (para negociar NDJSON por el header Accept)
         client_id: ID del cliente
         employee_id: Filtro opcional por empleado
         periodo: Filtro opcional por período
+        page: Paginación opcional (limit/cursor)
+        stream: Enviar una nómina por línea (NDJSON) en lugar del objeto completo
         current_user: Usuario autenticado
 
     Returns:
-        dict: Historial de nóminas
+        dict: Historial de nóminas (con next_cursor si hay más páginas),
+        o StreamingResponse NDJSON en modo streaming
     """
     try:
-        logger.info(f"Usuario {current_user.email} consultando historial de nóminas")
+        logger.info("Usuario %s consultando historial de nóminas", current_user.email)
         
-        firebase = get_firebase()
+        firebase = get_async_firebase()
+
+        # El filtro se resuelve en el servidor; el segundo, si existe, aquí
+        history_path = f"clients/{client_id}/payroll_history"
+        streaming = wants_ndjson(request, stream)
 
-        payrolls_data = firebase.read_data(f"clients/{client_id}/payroll_history") or {}
+        def coincide(payroll: Dict) -> bool:
+            return (
+                (not employee_id or payroll.get("employee_id") == employee_id)
+                and (not periodo or payroll.get("periodo") == periodo)
+            )
+
+        if streaming and not (employee_id or periodo):
+            return ndjson_response(iter_collection(firebase, history_path, cursor=page.cursor))
+
+        next_cursor = None
+        if employee_id:
+            payrolls_data = await firebase.query(history_path, order_by="employee_id", equal_to=employee_id)
+        elif periodo:
+            payrolls_data = await firebase.query(history_path, order_by="periodo", equal_to=periodo)
+        elif page.enabled:
+            result = await firebase.read_paginated(history_path, limit=page.limit, cursor=page.cursor)
+            payrolls_data, next_cursor = result["data"], result["next_cursor"]
+        else:
+            payrolls_data = await firebase.read_data(history_path) or {}
+
+        if streaming:
+            return ndjson_response(iter_dict(payrolls_data), filtro=coincide)
 
         # Filtrar resultados
-        results = []
+        filtrados = {}
         if isinstance(payrolls_data, dict):
             for payroll_id, payroll in payrolls_data.items():
-                if not isinstance(payroll, dict):
-                    continue
-                if employee_id and payroll.get("employee_id") != employee_id:
-                    continue
-                if periodo and payroll.get("periodo") != periodo:
-                    continue
-                try:
-                    results.append(payroll)
-                except Exception as e:
-                    logger.warning(f"Error processing payroll record {payroll_id}: {str(e)}")
+                if isinstance(payroll, dict) and coincide(payroll):
+                    filtrados[payroll_id] = payroll
 
-        return {
+        # Los resultados filtrados ya son acotados: se paginan en memoria
+        if page.enabled and (employee_id or periodo):
+            filtrados, next_cursor = paginar(filtrados, page.limit, page.cursor)
+        results = list(filtrados.values())
+
+        respuesta = {
             "success": True,
             "total": len(results),
             "data": results
         }
+        if page.enabled:
+            respuesta["next_cursor"] = next_cursor
+        return FastJSONResponse(respuesta)
 
     except Exception as e:
-        logger.error(f"Error obteniendo historial: {str(e)}")
+        logger.error("Error obteniendo historial: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error obteniendo historial: {str(e)}"
@@ -295,11 +569,11 @@ async def calculate_employee_payroll(
 ):
     """Calcula la nómina de un empleado específico"""
     try:
-        firebase = get_firebase()
+        firebase = get_async_firebase()
         
         # Obtener datos del empleado
         employee_path = f"clients/{client_id}/employees/{employee_id}"
-        employee = firebase.read_data(employee_path)
+        employee = await firebase.read_data(employee_path)
         
         if not employee:
             raise HTTPException(
@@ -309,7 +583,7 @@ async def calculate_employee_payroll(
         
         # Obtener configuración del cliente
         config_path = f"clients/{client_id}/config"
-        config = firebase.read_data(config_path) or DEFAULT_CONFIG
+        config = await firebase.read_data(config_path) or DEFAULT_CONFIG
         
         # Calcular nómina
         payroll_data = calcular_nomina_empleado(
@@ -334,15 +608,51 @@ async def calculate_employee_payroll(
 async def calculate_batch_payroll(
     client_id: str,
     quincena: str,
-    horas_batch: Dict[str, Dict[str, float]]
+    horas_batch: Dict[str, Dict[str, float]],
+    response: Response,
+    background: bool = Query(False, description="Encolar el cálculo y responder con el ID del trabajo"),
+    current_user: Optional[UserContext] = Depends(get_optional_user)
 ):
-    """Calcula nómina para múltiples empleados"""
+    """
+    Calcula nómina para múltiples empleados y guarda el lote
+
+    Con background=true (requiere autenticación JWT) el lote se encola y se
+    responde 202 con el ID del trabajo; el progreso se consulta en
+    GET /api/payroll/jobs/{job_id}.
+    """
+    if background:
+        if current_user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Se requiere autenticación para encolar lotes",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        try:
+            # submit guarda el estado inicial en Firebase
+            job = await run_in_threadpool(get_job_manager().submit, client_id, quincena, horas_batch)
+        except ColaLlenaError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e)
+            )
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {
+            "success": True,
+            "job_id": job.id,
+            "estado": job.estado,
+            "status_url": f"{router.prefix}/jobs/{job.id}",
+        }
+
     try:
-        firebase = get_firebase()
+        firebase = get_async_firebase()
+        calculado_ts = time.time()
         
-        # Obtener todos los empleados del cliente
-        employees_path = f"clients/{client_id}/employees"
-        employees_data = firebase.read_data(employees_path)
+        # Empleados y configuración se leen en paralelo
+        employees_data, company_config, hours_config = await asyncio.gather(
+            firebase.read_data(f"clients/{client_id}/employees"),
+            firebase.read_data(f"clients/{client_id}/config/company", cache=True),
+            firebase.read_data(f"clients/{client_id}/config/hours", cache=True),
+        )
         
         if not employees_data:
             raise HTTPException(
@@ -350,51 +660,19 @@ async def calculate_batch_payroll(
                 detail="No hay empleados registrados"
             )
         
-        # Obtener configuración
-        config_path = f"clients/{client_id}/config"
-        config = firebase.read_data(config_path) or DEFAULT_CONFIG
-        
-        # Calcular nómina para cada empleado
-        payrolls = []
-        total_neto = 0
-        total_bruto = 0
-        
-        for employee_id, employee in employees_data.items():
-            horas = horas_batch.get(employee_id, {})
-            
-            payroll_data = calcular_nomina_empleado(
-                empleado_id=employee_id,
-                nombre=employee["nombre"],
-                cedula=employee["cedula"],
-                tipo=employee["tipo"],
-                salario_base=employee["salario"],
-                horas_dict=horas,
-                config=config
-            )
-            
-            payrolls.append(payroll_data)
-            total_neto += payroll_data["neto"]
-            total_bruto += payroll_data["total_bruto"]
+        # Calcular nómina para todos los empleados con las horas enviadas
+        calculator = obtener_calculador(company_config or {}, hours_config or {})
+        empleados, horas = preparar_lote(employees_data, horas_batch)
+        payrolls = calculator.calcular_nomina_batch(empleados, horas, quincena)
         
         # Guardar lote en Firebase
         batch_id = str(uuid.uuid4())
-        batch_path = f"clients/{client_id}/payroll_batches/{quincena}/{batch_id}"
-        
-        batch_data = {
-            "id": batch_id,
-            "client_id": client_id,
-            "quincena": quincena,
-            "payrolls": payrolls,
-            "total_neto": total_neto,
-            "total_bruto": total_bruto,
-            "cantidad_empleados": len(payrolls),
-            "created_at": datetime.now().isoformat(),
-            "estado": "BORRADOR"
-        }
-        
-        firebase.write_data(batch_path, batch_data)
+        batch_data = datos_lote(client_id, quincena, batch_id, payrolls, calculado_ts, horas_entrada=horas_batch)
+        await firebase.write_data(ruta_lote(client_id, quincena, batch_id), batch_data)
         
         return batch_data
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -402,13 +680,173 @@ async def calculate_batch_payroll(
         )
 
 
+@router.post("/batch/{quincena}/{batch_id}/recalculate")
+async def recalculate_payroll_batch(
+    quincena: str,
+    batch_id: str,
+    client_id: str = Query(...),
+    current_user: UserContext = Depends(get_current_user)
+):
+    """
+    Recalcula solo los empleados del lote con cambios desde su último cálculo (requiere autenticación JWT)
+
+    Los cambios se toman de payroll_dirty (datos del empleado, configuración
+    y, si el lote usó las horas registradas, horas de la quincena). Cada
+    empleado se recalcula con las mismas horas del cálculo original: las
+    enviadas (guardadas en el lote) o las registradas. Las entradas de esos
+    empleados y los totales se actualizan en el lote guardado sin reescribir
+    el resto. Los lotes que no guardan el origen de sus horas no se
+    recalculan (409).
+
+    Args:
+        quincena: Período (YYYY-MM)
+        batch_id: ID del lote
+        client_id: ID del cliente
+        current_user: Usuario autenticado
+
+    Returns:
+        dict: Empleados recalculados y totales actualizados
+    """
+    try:
+        firebase = get_async_firebase()
+        path = ruta_lote(client_id, quincena, batch_id)
+        calculado_ts = time.time()
+
+        batch = await firebase.read_data(path)
+        if not batch:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Lote de nómina no encontrado"
+            )
+        if batch.get("estado", "BORRADOR") != "BORRADOR":
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Solo se pueden recalcular lotes en estado BORRADOR"
+            )
+        origen_horas = batch.get("origen_horas")
+        if origen_horas not in (ORIGEN_HORAS_ENVIADAS, ORIGEN_HORAS_REGISTRADAS):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="El lote no guarda las horas con que se calculó; vuelve a calcularlo"
+            )
+        horas_registradas = origen_horas == ORIGEN_HORAS_REGISTRADAS
+
+        # Firebase devuelve las listas con huecos como diccionarios
+        payrolls = batch.get("payrolls") or []
+        entradas = dict(enumerate(payrolls)) if isinstance(payrolls, list) else dict(payrolls)
+        posiciones = {
+            payroll.get("employee_id"): posicion
+            for posicion, payroll in entradas.items()
+            if isinstance(payroll, dict)
+        }
+
+        pendientes, config_modificada = await empleados_pendientes(
+            firebase, client_id, quincena, marca_lote(batch), incluir_horas=horas_registradas
+        )
+        recalcular = [emp_id for emp_id in posiciones if config_modificada or emp_id in pendientes]
+
+        if not recalcular:
+            return {
+                "success": True,
+                "batch_id": batch_id,
+                "recalculados": [],
+                "omitidos": [],
+                "total_neto": batch.get("total_neto"),
+                "total_bruto": batch.get("total_bruto"),
+            }
+
+        empleados, company_config, hours_config = await asyncio.gather(
+            _leer_empleados(firebase, client_id, recalcular),
+            firebase.read_data(f"clients/{client_id}/config/company", cache=True),
+            firebase.read_data(f"clients/{client_id}/config/hours", cache=True),
+        )
+
+        # Los empleados eliminados conservan su última nómina
+        calculables = [emp_id for emp_id in recalcular if empleados.get(emp_id)]
+        calculator = obtener_calculador(company_config or {}, hours_config or {})
+        pares = ((emp_id, {"id": emp_id, **empleados[emp_id]}) for emp_id in calculables)
+        if horas_registradas:
+            indice_horas = await _leer_horas_empleados(firebase, client_id, quincena, calculables)
+            lote_empleados, lote_horas = _armar_lote(pares, indice_horas, quincena)
+        else:
+            # Igual que preparar_lote: sin horas enviadas se calcula sin horas
+            horas_entrada = batch.get("horas_entrada") or {}
+            lote_empleados, lote_horas = preparar_lote(
+                dict(pares), {emp_id: horas_entrada.get(emp_id) for emp_id in calculables}
+            )
+        nuevas = calculator.calcular_nomina_batch(lote_empleados, lote_horas, quincena)
+
+        operaciones = []
+        for emp_id, payroll in zip(calculables, nuevas):
+            posicion = posiciones[emp_id]
+            entradas[posicion] = payroll
+            operaciones.append({"path": f"{path}/payrolls/{posicion}", "operation": "set", "data": payroll})
+
+        totales = totales_lote([p for p in entradas.values() if isinstance(p, dict)])
+        for campo, valor in {**totales, "calculado_ts": calculado_ts, "updated_at": datetime.now().isoformat()}.items():
+            operaciones.append({"path": f"{path}/{campo}", "operation": "set", "data": valor})
+
+        await firebase.batch_write(operaciones)
+        logger.info(
+            "Lote %s recalculado: %s de %s empleados por %s",
+            batch_id, len(calculables), len(posiciones), current_user.email,
+        )
+
+        return {
+            "success": True,
+            "batch_id": batch_id,
+            "recalculados": calculables,
+            "omitidos": [emp_id for emp_id in recalcular if emp_id not in empleados],
+            **totales,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error recalculando lote %s: %s", batch_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error recalculando lote: {str(e)}"
+        )
+
+
+@router.get("/jobs/{job_id}")
+async def get_payroll_job(
+    job_id: str,
+    client_id: str = Query(...),
+    current_user: UserContext = Depends(get_current_user)
+):
+    """
+    Estado y progreso de un lote de nómina en segundo plano (requiere autenticación JWT)
+
+    Args:
+        job_id: ID devuelto por POST /batch/{quincena}?background=true
+        client_id: ID del cliente dueño del trabajo
+        current_user: Usuario autenticado
+
+    Returns:
+        dict: Estado, empleados procesados/total y batch_id al completar
+    """
+    job = get_job_manager().get(job_id)
+    if job and job.client_id == client_id:
+        return job.to_dict()
+
+    # Trabajo aceptado por otro worker: su estado se guarda en Firebase
+    estado = await get_async_firebase().read_data(ruta_trabajo(client_id, job_id))
+    if not estado:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo no encontrado"
+        )
+    return estado
+
+
 @router.get("/batch/{quincena}/{batch_id}")
 async def get_payroll_batch(quincena: str, batch_id: str, client_id: str = Query(...)):
     """Obtiene un lote de nómina"""
     try:
-        firebase = get_firebase()
+        firebase = get_async_firebase()
         path = f"clients/{client_id}/payroll_batches/{quincena}/{batch_id}"
-        batch = firebase.read_data(path)
+        batch = await firebase.read_data(path)
         
         if not batch:
             raise HTTPException(
@@ -416,7 +854,7 @@ async def get_payroll_batch(quincena: str, batch_id: str, client_id: str = Query
                 detail="Lote de nómina no encontrado"
             )
         
-        return batch
+        return FastJSONResponse(batch)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -433,7 +871,7 @@ async def update_batch_status(
 ):
     """Actualiza el estado de un lote (BORRADOR, PAGADA, ANULADA)"""
     try:
-        firebase = get_firebase()
+        firebase = get_async_firebase()
         path = f"clients/{client_id}/payroll_batches/{quincena}/{batch_id}"
         
         # Validar estado
@@ -444,12 +882,12 @@ async def update_batch_status(
                 detail=f"Estado inválido. Debe ser uno de: {', '.join(valid_statuses)}"
             )
         
-        firebase.update_data(path, {
+        await firebase.update_data(path, {
             "estado": new_status,
             "updated_at": datetime.now().isoformat()
         })
         
-        batch = firebase.read_data(path)
+        batch = await firebase.read_data(path)
         return batch
     except Exception as e:
         raise HTTPException(
@@ -459,12 +897,22 @@ async def update_batch_status(
 
 
 @router.get("/batches/{quincena}")
-async def list_batches_by_quincena(quincena: str, client_id: str = Query(...)):
-    """Lista todos los lotes de una quincena"""
+async def list_batches_by_quincena(
+    quincena: str,
+    response: Response,
+    client_id: str = Query(...),
+    page: PaginationParams = Depends()
+):
+    """Lista los lotes de una quincena, paginados si se envía limit/cursor"""
     try:
-        firebase = get_firebase()
+        firebase = get_async_firebase()
         path = f"clients/{client_id}/payroll_batches/{quincena}"
-        batches_data = firebase.read_data(path)
+        if page.enabled:
+            result = await firebase.read_paginated(path, limit=page.limit, cursor=page.cursor)
+            batches_data = result["data"]
+            set_next_cursor(response, result["next_cursor"])
+        else:
+            batches_data = await firebase.read_data(path)
         
         if not batches_data:
             return []
@@ -476,7 +924,7 @@ async def list_batches_by_quincena(quincena: str, client_id: str = Query(...)):
                     try:
                         batches_list.append(batch)
                     except Exception as e:
-                        logger.warning(f"Error processing batch {batch_id}: {str(e)}")
+                        logger.warning("Error processing batch %s: %s", batch_id, e)
         return batches_list
     except Exception as e:
         raise HTTPException(
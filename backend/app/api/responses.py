@@ -0,0 +1,75 @@
+"""
+Respuestas JSON rápidas para los routers de la API
+
+FastJSONResponse serializa con orjson (JSON_RESPONSE_BACKEND=orjson) y cae a
+json de la biblioteca estándar si orjson no está instalado o si se configura
+JSON_RESPONSE_BACKEND=json. Los tipos que ninguno serializa de forma nativa
+(modelos Pydantic, Decimal, ...) pasan por jsonable_encoder, así que la salida
+es la misma que la de JSONResponse: datetime/date en ISO 8601 y modelos en su
+forma JSON.
+
+Las rutas que devuelven un dict pasan siempre por jsonable_encoder antes de
+la respuesta; las de resultados grandes devuelven FastJSONResponse(...)
+directamente para evitar esa copia.
+"""
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from typing import Any
+from app.config.settings import settings
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional, se usa json
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+if orjson is not None:
+    _OPCIONES_ORJSON = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _por_defecto(obj: Any) -> Any:
+    """Tipos no nativos: la misma conversión que aplica FastAPI"""
+    convertido = jsonable_encoder(obj)
+    if type(convertido) is type(obj):
+        raise TypeError(f"Tipo no serializable a JSON: {type(obj).__name__}")
+    return convertido
+
+
+def _dumps_orjson(content: Any) -> bytes:
+    return orjson.dumps(content, default=_por_defecto, option=_OPCIONES_ORJSON)
+
+
+def _dumps_json(content: Any) -> bytes:
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=_por_defecto,
+    ).encode("utf-8")
+
+
+def _elegir_dumps():
+    if settings.JSON_RESPONSE_BACKEND == "json":
+        return _dumps_json
+    if settings.JSON_RESPONSE_BACKEND != "orjson":
+        raise ValueError(f"JSON_RESPONSE_BACKEND desconocido: {settings.JSON_RESPONSE_BACKEND}")
+    if orjson is None:
+        logger.warning("[JSON] orjson no está instalado; respuestas con json estándar")
+        return _dumps_json
+    return _dumps_orjson
+
+
+# Serializador activo: valor -> bytes UTF-8
+dumps = _elegir_dumps()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serializada con el backend de JSON_RESPONSE_BACKEND"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
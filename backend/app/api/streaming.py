@@ -0,0 +1,132 @@
+"""
+Respuestas NDJSON en streaming para los endpoints de listado
+"""
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple, Type
+from pydantic import BaseModel
+from app.api.responses import dumps
+from app.config.settings import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Tamaño aproximado de cada chunk enviado al cliente
+CHUNK_BYTES = 64 * 1024
+
+
+def wants_ndjson(request: Request, stream: bool = False) -> bool:
+    """True si el cliente pidió streaming con ?stream=1 o Accept: application/x-ndjson"""
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def iter_pages(
+    firebase,
+    path: str,
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Recorre una colección completa página a página (paginación por cursor)
+
+    Solo una página está en memoria a la vez.
+
+    Args:
+        firebase: AsyncFirebaseManager
+        path: Ruta de la colección
+        cursor: Cursor desde el que empezar (opcional)
+        page_size: Registros por lectura (por defecto STREAM_PAGE_SIZE)
+
+    Yields:
+        Páginas {clave: registro} en orden de clave
+    """
+    page_size = page_size or settings.STREAM_PAGE_SIZE
+    while True:
+        page = await firebase.read_paginated(path, limit=page_size, cursor=cursor)
+        if page["data"]:
+            yield page["data"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return
+
+
+async def iter_collection(
+    firebase,
+    path: str,
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = None
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Como iter_pages, pero registro a registro: tuplas (clave, registro)"""
+    async for page in iter_pages(firebase, path, cursor=cursor, page_size=page_size):
+        for item in page.items():
+            yield item
+
+
+async def iter_dict(registros: Optional[Dict[str, Any]]) -> AsyncIterator[Tuple[str, Any]]:
+    """Adapta un resultado ya leído (p. ej. una consulta filtrada) a iter_collection"""
+    for item in (registros or {}).items():
+        yield item
+
+
+def ndjson_stream(objetos: AsyncIterator[Any]) -> StreamingResponse:
+    """
+    Respuesta NDJSON a partir de objetos ya preparados (modelos o valores JSON)
+
+    Args:
+        objetos: Iterador asíncrono de modelos Pydantic o valores serializables
+
+    Returns:
+        StreamingResponse con media type application/x-ndjson
+    """
+    async def lineas():
+        buffer = bytearray()
+        async for objeto in objetos:
+            if isinstance(objeto, BaseModel):
+                buffer += objeto.model_dump_json().encode("utf-8")
+            else:
+                buffer += dumps(objeto)
+            buffer += b"\n"
+            if len(buffer) >= CHUNK_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+
+    return StreamingResponse(lineas(), media_type=NDJSON_MEDIA_TYPE)
+
+
+def ndjson_response(
+    registros: AsyncIterator[Tuple[str, Any]],
+    model: Optional[Type[BaseModel]] = None,
+    filtro: Optional[Callable[[Dict[str, Any]], bool]] = None
+) -> StreamingResponse:
+    """
+    Respuesta NDJSON: un registro JSON por línea, validado con model si se indica
+
+    Los registros que no son diccionarios, no pasan el filtro o no validan se
+    omiten (igual que en la respuesta JSON completa).
+
+    Args:
+        registros: Iterador asíncrono de (clave, registro)
+        model: Modelo Pydantic con el que validar y serializar cada registro
+        filtro: Predicado adicional sobre el registro crudo
+
+    Returns:
+        StreamingResponse con media type application/x-ndjson
+    """
+    async def objetos():
+        async for key, registro in registros:
+            if not isinstance(registro, dict) or (filtro and not filtro(registro)):
+                continue
+            if model is None:
+                yield registro
+                continue
+            try:
+                yield model(**registro)
+            except Exception as e:
+                logger.warning("Error parsing record %s: %s", key, e)
+
+    return ndjson_stream(objetos())
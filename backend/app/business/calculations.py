@@ -3,8 +3,173 @@ Cálculos de nómina - Lógica de negocio reutilizable
 Siguiendo la ley colombiana 2025
 """
 
-from typing import Dict, List
+from typing import Any, Dict, List, NamedTuple, Tuple
+from array import array
+from collections import OrderedDict
 from datetime import datetime
+import hashlib
+import json
+import threading
+
+from app.config.settings import settings
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy es opcional, se usa el cálculo escalar
+    np = None
+
+
+# Campos del registro de horas y su tipo de hora en la configuración, en orden de detalle
+MAPPING_HORAS = {
+    "horas_ordinarias": "Ordinarias",
+    "recargo_nocturno": "Recargo Nocturno",
+    "recargo_diurno_dominical": "Recargo Diurno Dominical",
+    "recargo_nocturno_dominical": "Recargo Nocturno Dominical",
+    "hora_extra_diurna": "Hora Extra Diurna",
+    "hora_extra_nocturna": "Hora Extra Nocturna",
+    "hora_diurna_dominical_o_festivo": "Hora Diurna Dominical o Festivo",
+    "hora_extra_diurna_dominical_o_festivo": "Hora Extra Diurna Dominical o Festivo",
+    "hora_nocturna_dominical_o_festivo": "Hora Nocturna Dominical o Festivo",
+    "hora_extra_nocturna_dominical_o_festivo": "Hora Extra Nocturna Dominical o Festivo",
+}
+
+# Campos del empleado que usa el cálculo
+CAMPOS_EMPLEADO = (
+    "id",
+    "nombre",
+    "cedula",
+    "tipo",
+    "salario",
+    "deducir_auxilioTransporte",
+    "deducir_salud",
+    "deducir_pension",
+    "deuda_consumos",
+)
+
+
+class TarifaHora(NamedTuple):
+    """Tarifa compilada de un tipo de hora para un cliente"""
+    campo: str
+    tipo_hora: str
+    recargo_porcentaje: float
+    valor_unitario: float
+    valor_recargo: float
+    valor_total_unitario: float
+    valor_unitario_redondeado: float
+    valor_recargo_redondeado: float
+    valor_total_unitario_redondeado: float
+
+
+class PayrollRow:
+    """
+    Nómina de un empleado en representación compacta (caminos en lote)
+
+    Sin diccionario por instancia: guarda solo los tipos de hora con cantidad
+    positiva (índice, cantidad y subtotal) y referencia la tabla de tarifas del
+    calculador, compartida por todas las filas. to_dict() produce la forma
+    JSON pública, idéntica a la de calcular_nomina.
+    """
+
+    __slots__ = (
+        "employee_id", "employee_name", "cedula", "tipo", "salario_base",
+        "periodo", "fecha_calculo", "tarifas", "indices", "cantidades", "subtotales",
+        "total_bruto", "auxilio_transporte", "descuento_salud", "descuento_pension",
+        "deuda_consumos", "total_descuentos", "neto_a_pagar", "total_horas",
+    )
+
+    def __init__(
+        self, employee_id, employee_name, cedula, tipo, salario_base,
+        periodo, fecha_calculo, tarifas, indices, cantidades, subtotales,
+        total_bruto, auxilio_transporte, descuento_salud, descuento_pension,
+        deuda_consumos, total_descuentos, neto_a_pagar, total_horas,
+    ):
+        self.employee_id = employee_id
+        self.employee_name = employee_name
+        self.cedula = cedula
+        self.tipo = tipo
+        self.salario_base = salario_base
+        self.periodo = periodo
+        self.fecha_calculo = fecha_calculo
+        self.tarifas = tarifas
+        self.indices = indices
+        self.cantidades = cantidades
+        self.subtotales = subtotales
+        self.total_bruto = total_bruto
+        self.auxilio_transporte = auxilio_transporte
+        self.descuento_salud = descuento_salud
+        self.descuento_pension = descuento_pension
+        self.deuda_consumos = deuda_consumos
+        self.total_descuentos = total_descuentos
+        self.neto_a_pagar = neto_a_pagar
+        self.total_horas = total_horas
+
+    @classmethod
+    def desde_dict(cls, resultado: Dict, tarifas: Tuple[TarifaHora, ...]) -> "PayrollRow":
+        """Convierte un resultado de calcular_nomina (camino escalar)"""
+        posicion = {tarifa.tipo_hora: j for j, tarifa in enumerate(tarifas)}
+        detalle = resultado["detalle"]
+        return cls(
+            resultado["employee_id"], resultado["employee_name"], resultado["cedula"],
+            resultado["tipo"], resultado["salario_base"], resultado["periodo"],
+            resultado["fecha_calculo"], tarifas,
+            bytes(posicion[item["tipo_hora"]] for item in detalle),
+            tuple(item["cantidad"] for item in detalle),
+            array("d", (item["subtotal"] for item in detalle)),
+            resultado["total_bruto"], resultado["auxilio_transporte"], resultado["descuento_salud"],
+            resultado["descuento_pension"], resultado["deuda_consumos"], resultado["total_descuentos"],
+            resultado["neto_a_pagar"], resultado["total_horas"],
+        )
+
+    def to_dict(self) -> Dict:
+        """Forma pública de la nómina (la de calcular_nomina)"""
+        detalle = []
+        for j, cantidad, subtotal in zip(self.indices, self.cantidades, self.subtotales):
+            tarifa = self.tarifas[j]
+            detalle.append({
+                "tipo_hora": tarifa.tipo_hora,
+                "cantidad": cantidad,
+                "valor_unitario": tarifa.valor_unitario_redondeado,
+                "recargo_porcentaje": tarifa.recargo_porcentaje,
+                "valor_recargo": tarifa.valor_recargo_redondeado,
+                "valor_total_unitario": tarifa.valor_total_unitario_redondeado,
+                "subtotal": subtotal,
+            })
+
+        return {
+            "employee_id": self.employee_id,
+            "employee_name": self.employee_name,
+            "cedula": self.cedula,
+            "tipo": self.tipo,
+            "salario_base": self.salario_base,
+            "periodo": self.periodo,
+            "fecha_calculo": self.fecha_calculo,
+            "detalle": detalle,
+            "total_bruto": self.total_bruto,
+            "auxilio_transporte": self.auxilio_transporte,
+            "descuento_salud": self.descuento_salud,
+            "descuento_pension": self.descuento_pension,
+            "deuda_consumos": self.deuda_consumos,
+            "total_descuentos": self.total_descuentos,
+            "neto_a_pagar": self.neto_a_pagar,
+            "total_horas": self.total_horas,
+        }
+
+
+def _redondear(valores):
+    """
+    Equivalente vectorizado de round(x, 2)
+
+    np.round escala por 100 antes de redondear, lo que solo puede diferir del
+    redondeo exacto de Python cuando el valor escalado queda en un empate .5;
+    esos casos se resuelven con round() para que el resultado sea idéntico.
+    """
+    redondeados = np.round(valores, 2)
+    escalados = np.abs(valores) * 100
+    fraccion = escalados - np.floor(escalados)
+    dudosos = np.abs(fraccion - 0.5) <= 1e-9 + escalados * 1e-15
+    for idx in zip(*np.nonzero(dudosos)):
+        redondeados[idx] = round(float(valores[idx]), 2)
+    return redondeados
 
 
 class PayrollCalculator:
@@ -24,6 +189,39 @@ class PayrollCalculator:
         self.horas_config = config.get("horas_por_config", {})
         self.valor_hora_base = config.get("valor_hora_ordinaria", self.salario_minimo / 240)
 
+        # Huella de la configuración de origen (la asigna obtener_calculador)
+        self.huella = None
+
+        # Tabla de tarifas inmutable, reutilizada para todos los empleados
+        self.tarifas = self._compilar_tarifas()
+        self.vector_recargo = None
+        if np is not None:
+            self.vector_recargo = np.array(
+                [tarifa.valor_total_unitario for tarifa in self.tarifas], dtype=np.float64
+            )
+            self.vector_recargo.flags.writeable = False
+
+    def _compilar_tarifas(self) -> Tuple[TarifaHora, ...]:
+        """Precalcula valor unitario, recargo y valor total por tipo de hora"""
+        tarifas = []
+        for campo, tipo_hora in MAPPING_HORAS.items():
+            recargo_pct = self.horas_config.get(tipo_hora, {}).get("recargo_porcentaje", 0)
+            valor_unitario = self.valor_hora_base
+            valor_recargo = valor_unitario * (recargo_pct / 100)
+            valor_total_unitario = valor_unitario + valor_recargo
+            tarifas.append(TarifaHora(
+                campo=campo,
+                tipo_hora=tipo_hora,
+                recargo_porcentaje=recargo_pct,
+                valor_unitario=valor_unitario,
+                valor_recargo=valor_recargo,
+                valor_total_unitario=valor_total_unitario,
+                valor_unitario_redondeado=round(valor_unitario, 2),
+                valor_recargo_redondeado=round(valor_recargo, 2),
+                valor_total_unitario_redondeado=round(valor_total_unitario, 2),
+            ))
+        return tuple(tarifas)
+
     def calcular_nomina(self, employee: Dict, horas: Dict, periodo: str) -> Dict:
         """
         Calcula la nómina completa de un empleado
@@ -101,41 +299,19 @@ class PayrollCalculator:
         total_valor = 0
         total_horas = 0
 
-        # Mapeo de campos a tipos de hora
-        mapping_horas = {
-            "horas_ordinarias": "Ordinarias",
-            "recargo_nocturno": "Recargo Nocturno",
-            "recargo_diurno_dominical": "Recargo Diurno Dominical",
-            "recargo_nocturno_dominical": "Recargo Nocturno Dominical",
-            "hora_extra_diurna": "Hora Extra Diurna",
-            "hora_extra_nocturna": "Hora Extra Nocturna",
-            "hora_diurna_dominical_o_festivo": "Hora Diurna Dominical o Festivo",
-            "hora_extra_diurna_dominical_o_festivo": "Hora Extra Diurna Dominical o Festivo",
-            "hora_nocturna_dominical_o_festivo": "Hora Nocturna Dominical o Festivo",
-            "hora_extra_nocturna_dominical_o_festivo": "Hora Extra Nocturna Dominical o Festivo",
-        }
-
-        for campo, tipo_hora in mapping_horas.items():
-            cantidad = horas.get(campo, 0)
+        for tarifa in self.tarifas:
+            cantidad = horas.get(tarifa.campo, 0)
 
             if cantidad > 0:
-                # Obtener configuración del tipo de hora
-                config_hora = self.horas_config.get(tipo_hora, {})
-                recargo_pct = config_hora.get("recargo_porcentaje", 0)
-
-                # Valor base por hora
-                valor_unitario = self.valor_hora_base
-                valor_recargo = valor_unitario * (recargo_pct / 100)
-                valor_total_unitario = valor_unitario + valor_recargo
-                subtotal = round(cantidad * valor_total_unitario, 2)
+                subtotal = round(cantidad * tarifa.valor_total_unitario, 2)
 
                 detalle.append({
-                    "tipo_hora": tipo_hora,
+                    "tipo_hora": tarifa.tipo_hora,
                     "cantidad": cantidad,
-                    "valor_unitario": round(valor_unitario, 2),
-                    "recargo_porcentaje": recargo_pct,
-                    "valor_recargo": round(valor_recargo, 2),
-                    "valor_total_unitario": round(valor_total_unitario, 2),
+                    "valor_unitario": tarifa.valor_unitario_redondeado,
+                    "recargo_porcentaje": tarifa.recargo_porcentaje,
+                    "valor_recargo": tarifa.valor_recargo_redondeado,
+                    "valor_total_unitario": tarifa.valor_total_unitario_redondeado,
                     "subtotal": subtotal,
                 })
 
@@ -147,3 +323,421 @@ class PayrollCalculator:
             "total_valor": round(total_valor, 2),
             "total_horas": round(total_horas, 2),
         }
+
+    def calcular_nomina_batch(self, employees: List[Dict], horas: List[Dict], periodo: str) -> List[Dict]:
+        """
+        Calcula la nómina de muchos empleados de forma columnar
+
+        Las cantidades de los diez tipos de hora se cargan en una matriz que se
+        multiplica por el vector de valores unitarios con recargo; totales,
+        descuentos y neto se calculan sobre columnas. El resultado es idéntico
+        al de llamar calcular_nomina empleado por empleado.
+
+        Args:
+            employees: Datos de los empleados
+            horas: Registro de horas de cada empleado, en el mismo orden
+            periodo: Quincena en formato YYYY-MM
+
+        Returns:
+            Lista con el cálculo de nómina de cada empleado
+        """
+        if np is None:
+            return [
+                self.calcular_nomina(employee, horas_empleado, periodo)
+                for employee, horas_empleado in zip(employees, horas)
+            ]
+
+        detalle_fijo = [
+            {
+                "valor_unitario": tarifa.valor_unitario_redondeado,
+                "recargo_porcentaje": tarifa.recargo_porcentaje,
+                "valor_recargo": tarifa.valor_recargo_redondeado,
+                "valor_total_unitario": tarifa.valor_total_unitario_redondeado,
+            }
+            for tarifa in self.tarifas
+        ]
+        tipos_hora = [tarifa.tipo_hora for tarifa in self.tarifas]
+        fecha_calculo = datetime.now().isoformat()
+
+        resultados = []
+        for (
+            employee, fila_cantidad, fila_positiva, fila_subtotal,
+            bruto, auxilio, salud, pension, deuda, descuentos, neto,
+        ) in self._columnas_batch(employees, horas):
+            detalle = []
+            total_horas = 0
+            for j, positiva in enumerate(fila_positiva):
+                if positiva:
+                    detalle.append({
+                        "tipo_hora": tipos_hora[j],
+                        "cantidad": fila_cantidad[j],
+                        **detalle_fijo[j],
+                        "subtotal": fila_subtotal[j],
+                    })
+                    total_horas += fila_cantidad[j]
+
+            resultados.append({
+                "employee_id": employee.get("id"),
+                "employee_name": employee.get("nombre"),
+                "cedula": employee.get("cedula"),
+                "tipo": employee.get("tipo"),
+                "salario_base": employee.get("salario"),
+                "periodo": periodo,
+                "fecha_calculo": fecha_calculo,
+                "detalle": detalle,
+                "total_bruto": bruto,
+                "auxilio_transporte": auxilio,
+                "descuento_salud": salud,
+                "descuento_pension": pension,
+                "deuda_consumos": deuda,
+                "total_descuentos": descuentos,
+                "neto_a_pagar": neto,
+                "total_horas": round(total_horas, 2),
+            })
+
+        return resultados
+
+    def calcular_filas_batch(self, employees: List[Dict], horas: List[Dict], periodo: str) -> List[PayrollRow]:
+        """
+        Calcula la nómina de muchos empleados como PayrollRow
+
+        Mismo cálculo columnar que calcular_nomina_batch; las filas compactas
+        son para los caminos que envían o guardan el resultado por partes
+        (streaming y trabajos en segundo plano).
+
+        Args:
+            employees: Datos de los empleados
+            horas: Registro de horas de cada empleado, en el mismo orden
+            periodo: Quincena en formato YYYY-MM
+
+        Returns:
+            Lista de PayrollRow, una por empleado
+        """
+        if np is None:
+            return [
+                PayrollRow.desde_dict(self.calcular_nomina(employee, horas_empleado, periodo), self.tarifas)
+                for employee, horas_empleado in zip(employees, horas)
+            ]
+
+        fecha_calculo = datetime.now().isoformat()
+
+        resultados = []
+        for (
+            employee, fila_cantidad, fila_positiva, fila_subtotal,
+            bruto, auxilio, salud, pension, deuda, descuentos, neto,
+        ) in self._columnas_batch(employees, horas):
+            indices = [j for j, positiva in enumerate(fila_positiva) if positiva]
+            cantidades_positivas = tuple(fila_cantidad[j] for j in indices)
+            total_horas = 0
+            for cantidad in cantidades_positivas:
+                total_horas += cantidad
+
+            resultados.append(PayrollRow(
+                employee.get("id"),
+                employee.get("nombre"),
+                employee.get("cedula"),
+                employee.get("tipo"),
+                employee.get("salario"),
+                periodo,
+                fecha_calculo,
+                self.tarifas,
+                bytes(indices),
+                cantidades_positivas,
+                array("d", (fila_subtotal[j] for j in indices)),
+                bruto, auxilio, salud, pension, deuda, descuentos, neto,
+                round(total_horas, 2),
+            ))
+
+        return resultados
+
+    def _columnas_batch(self, employees: List[Dict], horas: List[Dict]):
+        """
+        Cálculo columnar compartido por calcular_nomina_batch y calcular_filas_batch
+
+        Genera por empleado: (employee, cantidades, positivas, subtotales,
+        total_bruto, auxilio_transporte, descuento_salud, descuento_pension,
+        deuda_consumos, total_descuentos, neto_a_pagar), con los mismos tipos
+        int/float que produce calcular_nomina.
+        """
+        n = len(employees)
+        if n == 0:
+            return
+
+        campos = [tarifa.campo for tarifa in self.tarifas]
+
+        # Matriz de cantidades (empleados x tipos de hora)
+        cantidades = [[horas_empleado.get(campo, 0) for campo in campos] for horas_empleado in horas]
+        matriz = np.array(cantidades, dtype=np.float64).reshape(n, len(campos))
+        positivas = matriz > 0
+
+        subtotales = np.where(positivas, _redondear(matriz * self.vector_recargo), 0.0)
+
+        # Suma en el mismo orden que el cálculo escalar para obtener los mismos bits
+        total_valor = np.zeros(n)
+        for j in range(len(campos)):
+            total_valor = total_valor + subtotales[:, j]
+        total_valor = _redondear(total_valor)
+        con_horas = positivas.any(axis=1)
+
+        # Columnas por empleado
+        aplica_auxilio = np.array([e.get("deducir_auxilioTransporte", True) for e in employees], dtype=bool)
+        aplica_salud = np.array([e.get("deducir_salud", True) for e in employees], dtype=bool)
+        aplica_pension = np.array([e.get("deducir_pension", True) for e in employees], dtype=bool)
+        base_descuento = np.array(
+            [e.get("salario", self.salario_minimo) for e in employees], dtype=np.float64
+        )
+        deudas = [e.get("deuda_consumos", 0) for e in employees]
+
+        total_bruto = total_valor + np.where(aplica_auxilio, float(self.auxilio_transporte), 0.0)
+        descuento_salud = np.where(aplica_salud, _redondear(base_descuento * (self.desc_salud / 100)), 0.0)
+        descuento_pension = np.where(aplica_pension, _redondear(base_descuento * (self.desc_pension / 100)), 0.0)
+        total_descuentos = descuento_salud + descuento_pension + np.array(deudas, dtype=np.float64)
+        diferencia = total_bruto - total_descuentos
+
+        # El cálculo escalar produce enteros cuando ningún término es decimal
+        auxilio_entero = isinstance(self.auxilio_transporte, int)
+        bruto_entero = ~con_horas & (~aplica_auxilio | auxilio_entero)
+        descuentos_enteros = (
+            ~aplica_salud & ~aplica_pension
+            & np.array([isinstance(d, int) for d in deudas], dtype=bool)
+        )
+        neto_cero = diferencia <= 0
+        neto_entero = neto_cero | (bruto_entero & descuentos_enteros)
+
+        columnas = zip(
+            employees, cantidades, positivas.tolist(), subtotales.tolist(), deudas,
+            total_bruto.tolist(), descuento_salud.tolist(), descuento_pension.tolist(),
+            total_descuentos.tolist(), diferencia.tolist(),
+            aplica_auxilio.tolist(), aplica_salud.tolist(), aplica_pension.tolist(),
+            bruto_entero.tolist(), descuentos_enteros.tolist(), neto_cero.tolist(), neto_entero.tolist(),
+        )
+        for (
+            employee, fila_cantidad, fila_positiva, fila_subtotal, deuda,
+            bruto, salud, pension, descuentos, neto,
+            auxilio, salud_ok, pension_ok,
+            es_bruto_entero, son_descuentos_enteros, es_neto_cero, es_neto_entero,
+        ) in columnas:
+            yield (
+                employee, fila_cantidad, fila_positiva, fila_subtotal,
+                int(bruto) if es_bruto_entero else bruto,
+                self.auxilio_transporte if auxilio else 0,
+                salud if salud_ok else 0,
+                pension if pension_ok else 0,
+                deuda,
+                int(descuentos) if son_descuentos_enteros else descuentos,
+                0 if es_neto_cero else (int(neto) if es_neto_entero else neto),
+            )
+
+
+# ============ CACHÉ DE CALCULADORES COMPILADOS ============
+
+_CALCULADORES_MAX = 256
+_calculadores: "OrderedDict[str, PayrollCalculator]" = OrderedDict()
+_calculadores_lock = threading.Lock()
+
+
+def huella_config(company_config: Dict, hours_config: Dict) -> str:
+    """Hash estable de config/company + config/hours de un cliente"""
+    contenido = json.dumps(
+        {"company": company_config or {}, "hours": hours_config or {}},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def obtener_calculador(company_config: Dict, hours_config: Dict) -> PayrollCalculator:
+    """
+    Obtiene un calculador compilado para la configuración del cliente
+
+    Los calculadores se comparten entre endpoints mientras la configuración no
+    cambie; cualquier cambio produce otra huella y un calculador nuevo.
+
+    Args:
+        company_config: Contenido de clients/{id}/config/company
+        hours_config: Contenido de clients/{id}/config/hours
+
+    Returns:
+        PayrollCalculator listo para usar
+    """
+    huella = huella_config(company_config, hours_config)
+
+    with _calculadores_lock:
+        calculator = _calculadores.get(huella)
+        if calculator is not None:
+            _calculadores.move_to_end(huella)
+            return calculator
+
+    calculator = PayrollCalculator({**(company_config or {}), **(hours_config or {})})
+    calculator.huella = huella
+
+    with _calculadores_lock:
+        _calculadores[huella] = calculator
+        while len(_calculadores) > _CALCULADORES_MAX:
+            _calculadores.popitem(last=False)
+
+    return calculator
+
+
+# ============ CACHÉ DE RESULTADOS ============
+
+# Campos del empleado que calcular_nomina copia al resultado tal cual
+_TEXTO_EMPLEADO = ("id", "nombre", "cedula", "tipo")
+# Banderas del empleado; el cálculo solo lee su valor de verdad
+_BANDERAS_EMPLEADO = ("deducir_auxilioTransporte", "deducir_salud", "deducir_pension")
+_NUMEROS = (int, float, bool)
+_SIN_SALARIO = object()
+
+
+def _numero_tipado(valor: Any) -> Tuple[type, Any]:
+    """(tipo, valor) de un monto u hora; el tipo se conserva porque el resultado lo repite"""
+    tipo = type(valor)
+    if tipo not in _NUMEROS:
+        raise TypeError(f"Valor no numérico: {valor!r}")
+    return tipo, valor
+
+
+def clave_entrada(employee: Dict, horas: Dict) -> Tuple:
+    """
+    Parte de la clave de caché que corresponde a las entradas de calcular_nomina
+
+    Incluye solo los campos que lee el cálculo. Los que aparecen en el
+    resultado (texto, salario, deuda y cantidades de horas) entran con su tipo,
+    porque 1 y 1.0 o 123 y "123" producen respuestas distintas; las banderas
+    entran como bool y las horas sin cantidad positiva se omiten, ya que no
+    cambian el resultado.
+
+    Args:
+        employee: Datos del empleado
+        horas: Registro de horas
+
+    Returns:
+        Tupla hashable; entradas iguales dan el mismo resultado
+
+    Raises:
+        TypeError: Si un monto u hora no es numérico o un campo no es hashable
+    """
+    horas_clave = []
+    for campo in MAPPING_HORAS:
+        if campo in horas:
+            tipo, cantidad = _numero_tipado(horas[campo])
+            if cantidad > 0:
+                horas_clave.append((campo, tipo, cantidad))
+
+    salario = employee.get("salario", _SIN_SALARIO)
+    get = employee.get
+    clave = (
+        tuple([(type(valor), valor) for valor in map(get, _TEXTO_EMPLEADO)]),
+        tuple([bool(get(campo, True)) for campo in _BANDERAS_EMPLEADO]),
+        None if salario is _SIN_SALARIO else _numero_tipado(salario),
+        _numero_tipado(get("deuda_consumos", 0)),
+        tuple(horas_clave),
+    )
+    hash(clave)
+    return clave
+
+
+class ResultadoCache:
+    """
+    Caché LRU de nóminas individuales indexada por las entradas del cálculo
+
+    La clave combina la huella del calculador, el período y los campos del
+    empleado y de las horas que lee calcular_nomina (ver clave_entrada), así
+    que cualquier cambio relevante produce otra clave y no hace falta
+    invalidar.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def clave(calculator: PayrollCalculator, employee: Dict, horas: Dict, periodo: str) -> Tuple:
+        """
+        Clave de caché de una nómina
+
+        Raises:
+            TypeError: Si las entradas no sirven como clave (ver clave_entrada)
+        """
+        return (calculator.huella, periodo, clave_entrada(employee, horas))
+
+    def get(self, clave: Tuple):
+        with self._lock:
+            resultado = self._entries.get(clave)
+            if resultado is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(clave)
+            self.hits += 1
+            return resultado
+
+    def set(self, clave: Tuple, resultado: Dict):
+        with self._lock:
+            self._entries[clave] = resultado
+            self._entries.move_to_end(clave)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.max_entries > 0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+resultados_cache = ResultadoCache(settings.PAYROLL_RESULT_CACHE_MAX_ENTRIES)
+
+
+def _copia_resultado(resultado: Dict) -> Dict:
+    """Copia independiente de una nómina con fecha_calculo actual"""
+    return {
+        **resultado,
+        "detalle": [dict(item) for item in resultado["detalle"]],
+        "fecha_calculo": datetime.now().isoformat(),
+    }
+
+
+def calcular_nomina_memo(calculator: PayrollCalculator, employee: Dict, horas: Dict, periodo: str) -> Dict:
+    """
+    calcular_nomina con caché de resultados
+
+    Solo aplica a calculadores obtenidos con obtener_calculador (con huella).
+    El resultado es el mismo que el de calcular_nomina con las mismas
+    entradas; cada llamada devuelve una copia que el llamador puede modificar.
+
+    Args:
+        calculator: Calculador compilado
+        employee: Datos del empleado
+        horas: Registro de horas
+        periodo: Quincena en formato YYYY-MM
+
+    Returns:
+        Dict con cálculo completo de nómina
+    """
+    if resultados_cache.max_entries <= 0 or calculator.huella is None:
+        return calculator.calcular_nomina(employee, horas, periodo)
+
+    try:
+        clave = ResultadoCache.clave(calculator, employee, horas, periodo)
+    except TypeError:  # dato inesperado: se calcula sin caché (y falla igual que calcular_nomina)
+        return calculator.calcular_nomina(employee, horas, periodo)
+
+    resultado = resultados_cache.get(clave)
+    if resultado is None:
+        resultado = calculator.calcular_nomina(employee, horas, periodo)
+        resultados_cache.set(clave, resultado)
+    return _copia_resultado(resultado)
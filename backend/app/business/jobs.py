@@ -0,0 +1,469 @@
+"""
+[JOBS] TRABAJOS DE NÓMINA EN SEGUNDO PLANO
+Cola en proceso para lotes de nómina que no caben en el tiempo de una request
+
+Un pool de hilos orquesta cada trabajo (lecturas y escritura en Firebase) y el
+cálculo, que es CPU, se reparte por bloques en un ProcessPoolExecutor. El
+worker que acepta un trabajo lo ejecuta y guarda su estado en
+clients/{id}/payroll_jobs/{job_id}, así que cualquier worker puede responder
+por él; el resultado final se persiste en
+clients/{id}/payroll_batches/{quincena}/{batch_id}. Los trabajos activos al
+detener la cola se marcan como interrumpidos (no se reanudan).
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.business.calculations import PayrollRow, obtener_calculador
+from app.config.settings import settings
+from app.database.firebase import FirebaseManager, get_firebase
+
+logger = logging.getLogger(__name__)
+
+ESTADO_PENDIENTE = "PENDIENTE"
+ESTADO_EN_PROCESO = "EN_PROCESO"
+ESTADO_COMPLETADO = "COMPLETADO"
+ESTADO_ERROR = "ERROR"
+
+ESTADOS_ACTIVOS = (ESTADO_PENDIENTE, ESTADO_EN_PROCESO)
+
+# Origen de las horas con que se calculó un lote (define cómo se recalcula)
+ORIGEN_HORAS_ENVIADAS = "enviadas"        # cuerpo de POST /batch/{quincena}, guardadas en el lote
+ORIGEN_HORAS_REGISTRADAS = "registradas"  # registros de horas de la quincena en la base de datos
+
+# Segundos mínimos entre escrituras del progreso de un trabajo
+PROGRESO_INTERVALO = 1.0
+
+
+class ColaLlenaError(RuntimeError):
+    """Se alcanzó PAYROLL_JOB_MAX_PENDING trabajos pendientes o en proceso"""
+
+
+# ============ CÁLCULO DEL LOTE ============
+
+def ruta_lote(client_id: str, quincena: str, batch_id: str = None) -> str:
+    """Ruta de los lotes de una quincena o de un lote"""
+    path = f"clients/{client_id}/payroll_batches/{quincena}"
+    return f"{path}/{batch_id}" if batch_id else path
+
+
+def preparar_lote(
+    employees_data: Dict[str, Any],
+    horas_batch: Dict[str, Dict[str, float]]
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Alinea empleados y horas enviadas para el cálculo columnar
+
+    Args:
+        employees_data: Árbol clients/{id}/employees
+        horas_batch: Horas por employee_id (los ausentes se calculan sin horas)
+
+    Returns:
+        Tupla (empleados, horas) alineadas por posición
+    """
+    empleados = []
+    horas = []
+    for employee_id, employee in (employees_data or {}).items():
+        if not isinstance(employee, dict):
+            continue
+        empleados.append({"id": employee_id, **employee})
+        horas.append(horas_batch.get(employee_id) or {})
+    return empleados, horas
+
+
+def calcular_bloque(
+    company_config: Dict,
+    hours_config: Dict,
+    empleados: List[Dict],
+    horas: List[Dict],
+    quincena: str
+) -> List[PayrollRow]:
+    """
+    Calcula un bloque de nóminas (se ejecuta en un proceso del pool)
+
+    Cada proceso compila y reutiliza su propio calculador por huella de
+    configuración. Devuelve filas compactas (menos datos que serializar de
+    vuelta); se convierten a dicts al guardar.
+    """
+    calculator = obtener_calculador(company_config, hours_config)
+    return calculator.calcular_filas_batch(empleados, horas, quincena)
+
+
+def totales_lote(payrolls: List[Dict]) -> Dict[str, float]:
+    """Totales del lote en una sola pasada"""
+    total_bruto = 0.0
+    total_neto = 0.0
+    for payroll in payrolls:
+        total_bruto += payroll["total_bruto"]
+        total_neto += payroll["neto_a_pagar"]
+    return {"total_neto": round(total_neto, 2), "total_bruto": round(total_bruto, 2)}
+
+
+def datos_lote(
+    client_id: str,
+    quincena: str,
+    batch_id: str,
+    payrolls: List[Dict],
+    calculado_ts: Optional[float] = None,
+    horas_entrada: Optional[Dict[str, Dict[str, float]]] = None
+) -> Dict[str, Any]:
+    """
+    Documento del lote tal como se guarda en payroll_batches
+
+    Args:
+        client_id: ID del cliente
+        quincena: Período (YYYY-MM)
+        batch_id: ID del lote
+        payrolls: Nóminas calculadas
+        calculado_ts: Instante en que se leyeron los datos del cálculo
+            (time.time()); los cambios posteriores se recalculan
+        horas_entrada: Horas enviadas por employee_id; se guardan (solo las
+            de empleados del lote) para recalcular con ellas. None si el
+            cálculo usó las horas registradas
+
+    Returns:
+        Dict con nóminas y totales del lote
+    """
+    if horas_entrada is None:
+        origen = {"origen_horas": ORIGEN_HORAS_REGISTRADAS}
+    else:
+        origen = {
+            "origen_horas": ORIGEN_HORAS_ENVIADAS,
+            "horas_entrada": {
+                payroll["employee_id"]: horas_entrada[payroll["employee_id"]]
+                for payroll in payrolls
+                if horas_entrada.get(payroll["employee_id"])
+            },
+        }
+    return {
+        "id": batch_id,
+        "client_id": client_id,
+        "quincena": quincena,
+        "payrolls": payrolls,
+        **origen,
+        **totales_lote(payrolls),
+        "cantidad_empleados": len(payrolls),
+        "created_at": datetime.now().isoformat(),
+        "calculado_ts": calculado_ts or time.time(),
+        "estado": "BORRADOR"
+    }
+
+
+# ============ TRABAJOS ============
+
+def ruta_trabajo(client_id: str, job_id: str = None) -> str:
+    """Ruta de los trabajos de un cliente o del estado de un trabajo"""
+    path = f"clients/{client_id}/payroll_jobs"
+    return f"{path}/{job_id}" if job_id else path
+
+
+@dataclass
+class PayrollJob:
+    """Estado y progreso de un lote de nómina encolado"""
+    id: str
+    client_id: str
+    quincena: str
+    horas_batch: Dict[str, Dict[str, float]] = field(default_factory=dict, repr=False)
+    estado: str = ESTADO_PENDIENTE
+    total_empleados: int = 0
+    procesados: int = 0
+    batch_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    progreso_guardado_ts: float = field(default=0.0, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Representación para GET /api/payroll/jobs/{id}"""
+        return {
+            "id": self.id,
+            "client_id": self.client_id,
+            "quincena": self.quincena,
+            "estado": self.estado,
+            "total_empleados": self.total_empleados,
+            "procesados": self.procesados,
+            "progreso": round(self.procesados / self.total_empleados, 4) if self.total_empleados else 0.0,
+            "batch_id": self.batch_id,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class PayrollJobManager:
+    """
+    Cola de lotes de nómina con orquestación en hilos y cálculo en procesos
+
+    Con processes=0 el cálculo se hace en el hilo orquestador (sin procesos
+    hijos), útil en entornos donde no se pueden crear procesos.
+    """
+
+    def __init__(
+        self,
+        firebase: Optional[FirebaseManager] = None,
+        workers: Optional[int] = None,
+        processes: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        retention_seconds: Optional[int] = None
+    ):
+        self.firebase = firebase or get_firebase()
+        self.workers = workers or settings.PAYROLL_JOB_WORKERS
+        self.processes = settings.PAYROLL_JOB_PROCESSES if processes is None else processes
+        self.chunk_size = max(1, chunk_size or settings.PAYROLL_JOB_CHUNK_SIZE)
+        self.max_pending = max_pending or settings.PAYROLL_JOB_MAX_PENDING
+        self.retention = timedelta(seconds=retention_seconds or settings.PAYROLL_JOB_RETENTION_SECONDS)
+
+        self._jobs: Dict[str, PayrollJob] = {}
+        self._lock = threading.Lock()
+        self._orquestador = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="payroll-job")
+        self._procesos: Optional[ProcessPoolExecutor] = None
+        self._procesos_lock = threading.Lock()
+        logger.info("[JOBS] Payroll job queue ready (%s threads, %s processes)", self.workers, self.processes)
+
+    def submit(self, client_id: str, quincena: str, horas_batch: Dict[str, Dict[str, float]]) -> PayrollJob:
+        """
+        Encola un lote de nómina y guarda su estado inicial en Firebase
+        (bloqueante: desde una ruta async se llama en un hilo)
+
+        Raises:
+            ColaLlenaError: Si ya hay max_pending trabajos activos
+        """
+        with self._lock:
+            self._purgar()
+            activos = sum(1 for job in self._jobs.values() if job.estado in ESTADOS_ACTIVOS)
+            if activos >= self.max_pending:
+                raise ColaLlenaError("Demasiados lotes de nómina en cola. Intenta de nuevo más tarde.")
+
+            job = PayrollJob(
+                id=str(uuid.uuid4()),
+                client_id=client_id,
+                quincena=quincena,
+                horas_batch=horas_batch or {},
+            )
+            self._jobs[job.id] = job
+
+        try:
+            self._guardar_estado(job, obligatorio=True)
+        except Exception:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise
+
+        self._orquestador.submit(self._ejecutar, job)
+        logger.info("[JOBS] Lote %s encolado para %s quincena %s", job.id, client_id, quincena)
+        return job
+
+    def get(self, job_id: str) -> Optional[PayrollJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            conteo = {estado: 0 for estado in (ESTADO_PENDIENTE, ESTADO_EN_PROCESO, ESTADO_COMPLETADO, ESTADO_ERROR)}
+            for job in self._jobs.values():
+                conteo[job.estado] += 1
+            return conteo
+
+    def shutdown(self, wait: bool = False):
+        self._orquestador.shutdown(wait=wait, cancel_futures=True)
+        with self._procesos_lock:
+            if self._procesos is not None:
+                self._procesos.shutdown(wait=wait, cancel_futures=True)
+                self._procesos = None
+
+        # Sin esto el estado guardado quedaría PENDIENTE/EN_PROCESO para siempre
+        with self._lock:
+            activos = [job for job in self._jobs.values() if job.estado in ESTADOS_ACTIVOS]
+        for job in activos:
+            job.estado = ESTADO_ERROR
+            job.error = "Trabajo interrumpido por reinicio del servidor; vuelve a enviarlo"
+            job.finished_at = datetime.now()
+            self._guardar_estado(job)
+
+    def _guardar_estado(self, job: PayrollJob, obligatorio: bool = False):
+        """
+        Guarda el estado del trabajo en Firebase para GET /jobs/{id} desde
+        cualquier worker
+
+        Args:
+            job: Trabajo
+            obligatorio: Propagar el error en lugar de solo registrarlo
+        """
+        try:
+            self.firebase.write_data(ruta_trabajo(job.client_id, job.id), job.to_dict())
+            job.progreso_guardado_ts = time.monotonic()
+        except Exception as e:
+            if obligatorio:
+                raise
+            logger.warning("[JOBS] No se pudo guardar el estado del lote %s: %s", job.id, e)
+
+    def _guardar_progreso(self, job: PayrollJob):
+        """Actualiza procesados/progreso como mucho cada PROGRESO_INTERVALO segundos"""
+        if time.monotonic() - job.progreso_guardado_ts < PROGRESO_INTERVALO:
+            return
+        estado = job.to_dict()
+        try:
+            self.firebase.update_data(
+                ruta_trabajo(job.client_id, job.id),
+                {campo: estado[campo] for campo in ("estado", "total_empleados", "procesados", "progreso")}
+            )
+            job.progreso_guardado_ts = time.monotonic()
+        except Exception as e:
+            logger.warning("[JOBS] No se pudo guardar el progreso del lote %s: %s", job.id, e)
+
+    def _purgar_guardados(self, client_id: str):
+        """Borra de Firebase los estados de trabajos terminados hace más de retention"""
+        limite = (datetime.now() - self.retention).isoformat()
+        try:
+            # start_at="" deja fuera los trabajos sin finished_at (null)
+            vencidos = self.firebase.query(ruta_trabajo(client_id), "finished_at", start_at="", end_at=limite)
+            if vencidos:
+                self.firebase.update_data(ruta_trabajo(client_id), {job_id: None for job_id in vencidos})
+        except Exception as e:
+            logger.warning("[JOBS] No se pudieron purgar los trabajos de %s: %s", client_id, e)
+
+    def _purgar(self):
+        """Olvida los trabajos terminados hace más de retention (requiere _lock)"""
+        limite = datetime.now() - self.retention
+        vencidos = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < limite
+        ]
+        for job_id in vencidos:
+            del self._jobs[job_id]
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # spawn: el proceso padre tiene hilos (Firebase, orquestador) y fork
+        # podría heredar locks tomados
+        with self._procesos_lock:
+            if self._procesos is None:
+                self._procesos = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._procesos
+
+    def _ejecutar(self, job: PayrollJob):
+        job.estado = ESTADO_EN_PROCESO
+        job.started_at = datetime.now()
+        self._guardar_estado(job)
+        self._purgar_guardados(job.client_id)
+        try:
+            employees_data = self.firebase.read_data(f"clients/{job.client_id}/employees")
+            if not employees_data:
+                raise ValueError("No hay empleados registrados")
+
+            company_config = self.firebase.read_data(f"clients/{job.client_id}/config/company", cache=True) or {}
+            hours_config = self.firebase.read_data(f"clients/{job.client_id}/config/hours", cache=True) or {}
+
+            empleados, horas = preparar_lote(employees_data, job.horas_batch)
+            del employees_data
+            job.total_empleados = len(empleados)
+            self._guardar_progreso(job)
+
+            payrolls = [fila.to_dict() for fila in self._calcular(job, company_config, hours_config, empleados, horas)]
+
+            batch_id = str(uuid.uuid4())
+            self.firebase.write_data(
+                ruta_lote(job.client_id, job.quincena, batch_id),
+                datos_lote(
+                    job.client_id, job.quincena, batch_id, payrolls,
+                    job.started_at.timestamp(), horas_entrada=job.horas_batch
+                )
+            )
+            job.batch_id = batch_id
+            job.estado = ESTADO_COMPLETADO
+            logger.info("[JOBS] Lote %s completado: %s empleados (batch %s)", job.id, len(payrolls), batch_id)
+        except Exception as e:
+            logger.error("[JOBS] Error en lote %s: %s", job.id, e)
+            job.error = str(e)
+            job.estado = ESTADO_ERROR
+        finally:
+            job.horas_batch = {}
+            job.finished_at = datetime.now()
+            self._guardar_estado(job)
+
+    def _calcular(
+        self,
+        job: PayrollJob,
+        company_config: Dict,
+        hours_config: Dict,
+        empleados: List[Dict],
+        horas: List[Dict]
+    ) -> List[PayrollRow]:
+        """Calcula por bloques de chunk_size actualizando job.procesados"""
+        bloques = [
+            (empleados[inicio:inicio + self.chunk_size], horas[inicio:inicio + self.chunk_size])
+            for inicio in range(0, len(empleados), self.chunk_size)
+        ]
+        resultados: List[Optional[List[PayrollRow]]] = [None] * len(bloques)
+
+        if self.processes <= 0:
+            for idx, (bloque_empleados, bloque_horas) in enumerate(bloques):
+                resultados[idx] = calcular_bloque(
+                    company_config, hours_config, bloque_empleados, bloque_horas, job.quincena
+                )
+                job.procesados += len(bloque_empleados)
+                self._guardar_progreso(job)
+        else:
+            pool = self._pool()
+            try:
+                futuros = {
+                    pool.submit(
+                        calcular_bloque, company_config, hours_config,
+                        bloque_empleados, bloque_horas, job.quincena
+                    ): idx
+                    for idx, (bloque_empleados, bloque_horas) in enumerate(bloques)
+                }
+                for futuro in as_completed(futuros):
+                    idx = futuros[futuro]
+                    resultados[idx] = futuro.result()
+                    job.procesados += len(resultados[idx])
+                    self._guardar_progreso(job)
+            except BrokenProcessPool:
+                # El siguiente trabajo crea un pool nuevo
+                with self._procesos_lock:
+                    if self._procesos is pool:
+                        self._procesos = None
+                raise
+
+        return [fila for bloque in resultados for fila in bloque]
+
+
+# Instancia global
+_job_manager: Optional[PayrollJobManager] = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> PayrollJobManager:
+    """
+    Obtiene la cola global de trabajos de nómina
+
+    Returns:
+        Instancia singleton de PayrollJobManager
+    """
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = PayrollJobManager()
+        return _job_manager
+
+
+def shutdown_job_manager():
+    """Detiene la cola en el cierre de la aplicación (los trabajos en curso se pierden)"""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is not None:
+            _job_manager.shutdown(wait=False)
+            _job_manager = None
@@ -0,0 +1,260 @@
+"""
+[PAYROLL] CIERRE DE NÓMINA DE UN PERÍODO PARA VARIOS CLIENTES
+Reparte los clientes entre procesos para que el cálculo no compita por el GIL
+
+El proceso principal lee de Firebase y envía a cada proceso solo los campos
+que usa PayrollCalculator; los resultados se guardan con batch_write como el
+lote payroll_batches/{periodo}/cierre-{periodo} y una entrada por empleado en
+payroll_history/{periodo}_{employee_id}. Las claves son estables: re-ejecutar
+el período (p. ej. tras un fallo parcial) reemplaza ambos, salvo que el lote
+ya no esté en BORRADOR.
+
+Uso (desde backend/):
+    python -m app.business.run_period --period 2026-10 [CLIENT_ID ...]
+    python -m app.business.run_period --period 2026-10 --processes 8 --dry-run
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.business.calculations import CAMPOS_EMPLEADO, MAPPING_HORAS
+from app.business.jobs import calcular_bloque, datos_lote, ruta_lote
+from app.database.async_firebase import AsyncFirebaseManager
+from app.database.firebase import get_firebase
+from app.database.hours_layout import leer_horas_quincena
+from app.utils.validators import validar_periodo
+
+logger = logging.getLogger(__name__)
+
+# Operaciones por llamada a batch_write
+OPERACIONES_POR_ESCRITURA = 500
+
+
+def ruta_historial(client_id: str, periodo: str, employee_id: str) -> str:
+    """Entrada del historial de un empleado en un período (clave estable)"""
+    return f"clients/{client_id}/payroll_history/{periodo}_{employee_id}"
+
+
+def lote_periodo_id(periodo: str) -> str:
+    """ID del lote de cierre de un período (estable entre ejecuciones)"""
+    return f"cierre-{periodo}"
+
+
+def calcular_bloque_medido(
+    company_config: Dict,
+    hours_config: Dict,
+    empleados: List[Dict],
+    horas: List[Dict],
+    periodo: str
+) -> Tuple[List[Any], float]:
+    """
+    calcular_bloque midiendo el tiempo dentro del proceso del pool
+
+    Returns:
+        Tupla (filas, segundos de cálculo sin la espera en la cola del pool)
+    """
+    inicio = time.perf_counter()
+    filas = calcular_bloque(company_config, hours_config, empleados, horas, periodo)
+    return filas, time.perf_counter() - inicio
+
+
+async def leer_entrada(firebase: AsyncFirebaseManager, client_id: str, periodo: str) -> Tuple:
+    """
+    Lee y compacta lo que necesita el cálculo de un cliente
+
+    Returns:
+        Tupla (company_config, hours_config, empleados, horas) lista para
+        calcular_bloque; empleados y horas alineados por posición
+    """
+    employees_data, company_config, hours_config, hours_data = await asyncio.gather(
+        firebase.read_data(f"clients/{client_id}/employees"),
+        firebase.read_data(f"clients/{client_id}/config/company", cache=True),
+        firebase.read_data(f"clients/{client_id}/config/hours", cache=True),
+        leer_horas_quincena(firebase, client_id, periodo),
+    )
+
+    # Primer registro de horas de cada empleado en el período, solo cantidades
+    horas_por_empleado: Dict[str, Dict[str, float]] = {}
+    for registro in (hours_data or {}).values():
+        if isinstance(registro, dict) and registro.get("quincena") == periodo:
+            horas_por_empleado.setdefault(
+                registro.get("employee_id"),
+                {campo: registro[campo] for campo in MAPPING_HORAS if registro.get(campo)}
+            )
+
+    empleados = []
+    horas = []
+    for employee in (employees_data or {}).values() if isinstance(employees_data, dict) else []:
+        if not isinstance(employee, dict) or not employee.get("id"):
+            continue
+        empleados.append({campo: employee[campo] for campo in CAMPOS_EMPLEADO if campo in employee})
+        horas.append(horas_por_empleado.get(employee["id"], {}))
+
+    return company_config or {}, hours_config or {}, empleados, horas
+
+
+def operaciones_resultado(
+    client_id: str,
+    periodo: str,
+    payrolls: List[Dict],
+    calculado_ts: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """Operaciones batch_write del historial por empleado y, al final, el lote"""
+    operaciones = [
+        {"path": ruta_historial(client_id, periodo, payroll["employee_id"]), "operation": "set", "data": payroll}
+        for payroll in payrolls
+    ]
+    batch_id = lote_periodo_id(periodo)
+    operaciones.append({
+        "path": ruta_lote(client_id, periodo, batch_id),
+        "operation": "set",
+        "data": datos_lote(client_id, periodo, batch_id, payrolls, calculado_ts),
+    })
+    return operaciones
+
+
+async def procesar_cliente(
+    firebase: AsyncFirebaseManager,
+    pool: ProcessPoolExecutor,
+    client_id: str,
+    periodo: str,
+    escribir: bool = True
+) -> Dict[str, Any]:
+    """
+    Lee, calcula en el pool de procesos y guarda la nómina de un cliente
+
+    Returns:
+        Dict con empleados y tiempos (lectura, espera en el pool, cálculo,
+        escritura, total)
+
+    Raises:
+        ValueError: Si el lote del período ya no está en BORRADOR
+    """
+    loop = asyncio.get_running_loop()
+    calculado_ts = time.time()
+    inicio = time.perf_counter()
+
+    (company_config, hours_config, empleados, horas), lote_anterior = await asyncio.gather(
+        leer_entrada(firebase, client_id, periodo),
+        firebase.read_data(ruta_lote(client_id, periodo, lote_periodo_id(periodo))),
+    )
+    if escribir and lote_anterior and lote_anterior.get("estado", "BORRADOR") != "BORRADOR":
+        raise ValueError(f"El lote {lote_periodo_id(periodo)} está en {lote_anterior['estado']}; no se reemplaza")
+    leido = time.perf_counter()
+
+    filas, calculo = await loop.run_in_executor(
+        pool, calcular_bloque_medido, company_config, hours_config, empleados, horas, periodo
+    )
+    calculado = time.perf_counter()
+
+    if escribir and filas:
+        payrolls = [fila.to_dict() for fila in filas]
+        operaciones = operaciones_resultado(client_id, periodo, payrolls, calculado_ts)
+        for inicio_bloque in range(0, len(operaciones), OPERACIONES_POR_ESCRITURA):
+            await firebase.batch_write(operaciones[inicio_bloque:inicio_bloque + OPERACIONES_POR_ESCRITURA])
+    fin = time.perf_counter()
+
+    total = fin - inicio
+    return {
+        "client_id": client_id,
+        "empleados": len(filas),
+        "lectura": leido - inicio,
+        "espera": max(0.0, calculado - leido - calculo),
+        "calculo": calculo,
+        "escritura": fin - calculado,
+        "total": total,
+        "empleados_por_segundo": len(filas) / total if total > 0 else 0.0,
+    }
+
+
+async def ejecutar_periodo(
+    firebase: AsyncFirebaseManager,
+    client_ids: List[str],
+    periodo: str,
+    procesos: Optional[int] = None,
+    escribir: bool = True
+) -> List[Any]:
+    """
+    Procesa todos los clientes del período repartiendo el cálculo en procesos
+
+    Las lecturas se limitan a dos clientes por proceso para que solo esas
+    entradas estén en memoria a la vez.
+
+    Returns:
+        Resultado de procesar_cliente o la excepción, por cliente y en orden
+    """
+    procesos = procesos or os.cpu_count() or 1
+    semaforo = asyncio.Semaphore(procesos * 2)
+
+    # spawn: el proceso principal tiene hilos (pool de Firebase)
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn")) as pool:
+        async def con_limite(client_id: str):
+            async with semaforo:
+                return await procesar_cliente(firebase, pool, client_id, periodo, escribir=escribir)
+
+        return await asyncio.gather(*(con_limite(c) for c in client_ids), return_exceptions=True)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Calcula la nómina de un período para varios clientes")
+    parser.add_argument("client_ids", nargs="*", help="Clientes a procesar (por defecto, todos)")
+    parser.add_argument("--period", required=True, help="Período (YYYY-MM)")
+    parser.add_argument("--processes", type=int, default=None, help="Procesos de cálculo (por defecto, CPUs)")
+    parser.add_argument("--dry-run", action="store_true", help="Calcular sin guardar resultados")
+    args = parser.parse_args(argv)
+
+    periodo_valido, msg_periodo = validar_periodo(args.period)
+    if not periodo_valido:
+        parser.error(f"--period: {msg_periodo}")
+
+    firebase = AsyncFirebaseManager(get_firebase())
+    try:
+        client_ids = args.client_ids or firebase.manager.read_keys("clients")
+        if not client_ids:
+            print("No hay clientes para procesar")
+            return 0
+
+        inicio = time.perf_counter()
+        resultados = asyncio.run(
+            ejecutar_periodo(firebase, client_ids, args.period, procesos=args.processes, escribir=not args.dry_run)
+        )
+        total = time.perf_counter() - inicio
+    finally:
+        firebase.shutdown(wait=False)
+
+    print(
+        f"{'cliente':<24} {'empleados':>9} {'lectura':>9} {'espera':>9} {'cálculo':>9} "
+        f"{'escritura':>9} {'total':>9} {'emp/s':>9}"
+    )
+    fallidos = 0
+    empleados = 0
+    for client_id, resultado in zip(client_ids, resultados):
+        if isinstance(resultado, Exception):
+            fallidos += 1
+            logger.error("[PAYROLL] Client %s failed: %s", client_id, resultado)
+            print(f"{client_id:<24} error: {str(resultado)}")
+            continue
+        empleados += resultado["empleados"]
+        print(
+            f"{client_id:<24} {resultado['empleados']:>9} {resultado['lectura']:>8.2f}s "
+            f"{resultado['espera']:>8.2f}s {resultado['calculo']:>8.2f}s {resultado['escritura']:>8.2f}s {resultado['total']:>8.2f}s "
+            f"{resultado['empleados_por_segundo']:>9.0f}"
+        )
+
+    print(
+        f"{len(client_ids) - fallidos}/{len(client_ids)} clientes, {empleados} empleados en {total:.2f}s "
+        f"({empleados / total if total > 0 else 0:.0f} emp/s)"
+        + (" [dry-run, sin guardar]" if args.dry_run else "")
+    )
+    return 1 if fallidos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,6 +24,19 @@ class Settings(BaseSettings):
     FIREBASE_DATABASE_URL: str = Field(default="", description="URL de base de datos realtime Firebase")
     FIREBASE_CREDENTIALS_JSON: Optional[str] = Field(default=None, description="Credenciales JSON en variable de entorno")
     FIREBASE_PROJECT_ID: str = Field(default="", description="ID del proyecto Firebase")
+    FIREBASE_MAX_WORKERS: int = Field(default=16, description="Hilos para llamadas concurrentes al SDK de Firebase")
+    FIREBASE_CACHE_ENABLED: bool = Field(default=False, description="Habilitar caché en memoria de lecturas")
+    FIREBASE_CACHE_TTL_SECONDS: int = Field(default=60, description="Segundos de vida de una lectura en caché")
+    FIREBASE_CACHE_MAX_BYTES: int = Field(default=16 * 1024 * 1024, description="Tamaño máximo de la caché en bytes")
+    FIREBASE_TRACE_ENABLED: Optional[bool] = Field(
+        default=None,
+        description="Trazar las llamadas a Firebase de cada request (por defecto, igual que DEBUG)"
+    )
+    FIREBASE_TRACE_REPEAT_THRESHOLD: int = Field(
+        default=3,
+        description="Avisar si una request lee la misma ruta más de estas veces"
+    )
+    FIREBASE_TRACE_CALL_BUDGET: int = Field(default=50, description="Avisar si una request supera estas llamadas a Firebase")
     
     # ============ SEGURIDAD ============
     SECRET_KEY: str = Field(
@@ -33,6 +46,19 @@ class Settings(BaseSettings):
     ALGORITHM: str = Field(default="HS256", description="Algoritmo para JWT")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(default=30, description="Minutos de expiración del token")
     REFRESH_TOKEN_EXPIRE_DAYS: int = Field(default=7, description="Días de expiración del refresh token")
+    TOKEN_CACHE_MAX_ENTRIES: int = Field(default=10000, description="Tokens verificados en caché (0 = deshabilitada)")
+    TOKEN_REVOCATION_BACKEND: str = Field(
+        default="sqlite",
+        description="Dónde se guardan los tokens revocados: memory (un worker), sqlite (workers del host) o firebase"
+    )
+    TOKEN_REVOCATION_SQLITE_PATH: Optional[str] = Field(
+        default=None,
+        description="Archivo SQLite de revocaciones (por defecto en el directorio temporal)"
+    )
+    TOKEN_REVOCATION_CHECK_SECONDS: float = Field(
+        default=30.0,
+        description="Segundos que un token en caché se da por no revocado sin volver a consultar el backend"
+    )
     
     # ============ CORS ============
     ALLOWED_ORIGINS_STR: str = Field(
@@ -53,11 +79,66 @@ class Settings(BaseSettings):
     RATE_LIMIT_ENABLED: bool = Field(default=True, description="Habilitar rate limiting")
     RATE_LIMIT_REQUESTS: int = Field(default=100, description="Requests por ventana de tiempo")
     RATE_LIMIT_WINDOW_SECONDS: int = Field(default=60, description="Ventana de tiempo en segundos")
+    RATE_LIMIT_USER_REQUESTS: int = Field(default=300, description="Requests por ventana para usuarios autenticados (por uid)")
+    RATE_LIMIT_ROUTES: str = Field(
+        default="POST /api/auth/login=10/60,POST /api/auth/signup=5/60",
+        description="Límites por ruta: '[METODO] /prefijo=N/SEGUNDOS' separados por comas"
+    )
+    RATE_LIMIT_BACKEND: str = Field(default="memory", description="Backend del rate limiter: memory o sqlite")
+    RATE_LIMIT_SQLITE_PATH: Optional[str] = Field(
+        default=None,
+        description="Archivo SQLite compartido entre workers (por defecto en el directorio temporal)"
+    )
+    RATE_LIMIT_SQLITE_TIMEOUT: float = Field(
+        default=0.05,
+        description="Segundos máximos esperando el lock de SQLite antes de dejar pasar la request"
+    )
+    RATE_LIMIT_SHARDS: int = Field(default=16, description="Shards del backend en memoria")
+    RATE_LIMIT_SWEEP_SECONDS: float = Field(default=30, description="Periodo de desalojo de claves inactivas")
+    
+    # ============ PAGINACIÓN ============
+    PAGINATION_DEFAULT_LIMIT: int = Field(default=100, description="Registros por página si se envía cursor sin limit")
+    PAGINATION_MAX_LIMIT: int = Field(default=1000, description="Máximo de registros por página")
+    STREAM_PAGE_SIZE: int = Field(default=500, description="Registros leídos por página en respuestas NDJSON")
+    
+    # ============ RESPUESTAS JSON ============
+    JSON_RESPONSE_BACKEND: str = Field(
+        default="orjson",
+        description="Serializador de respuestas JSON: orjson (cae a json si no está instalado) o json"
+    )
+    
+    # ============ NÓMINA EN LOTE ============
+    BATCH_READ_CONCURRENCY: int = Field(default=16, description="Lecturas simultáneas de empleados en nómina en lote")
+    BATCH_SUBTREE_READ_RATIO: float = Field(
+        default=0.5,
+        description="Fracción del roster a partir de la cual se lee el árbol completo de empleados"
+    )
+    PAYROLL_RESULT_CACHE_MAX_ENTRIES: int = Field(
+        default=4096,
+        description="Nóminas individuales calculadas en caché (0 = deshabilitada)"
+    )
+    
+    # ============ TRABAJOS EN SEGUNDO PLANO ============
+    PAYROLL_JOB_WORKERS: int = Field(default=2, description="Lotes de nómina en segundo plano ejecutándose a la vez")
+    PAYROLL_JOB_PROCESSES: int = Field(
+        default=2,
+        description="Procesos para el cálculo de lotes en segundo plano (0 = calcular en el hilo del trabajo)"
+    )
+    PAYROLL_JOB_CHUNK_SIZE: int = Field(default=500, description="Empleados por bloque enviado a un proceso")
+    PAYROLL_JOB_MAX_PENDING: int = Field(default=20, description="Máximo de lotes pendientes o en proceso")
+    PAYROLL_JOB_RETENTION_SECONDS: int = Field(default=3600, description="Tiempo que se conserva el estado de un lote terminado")
+    
+    # ============ MÉTRICAS ============
+    METRICS_ENABLED: bool = Field(default=True, description="Exponer /metrics (formato de texto de Prometheus)")
     
     # ============ LOGGING ============
     LOG_LEVEL: str = Field(default="INFO", description="Nivel de logging")
     LOG_FORMAT: str = Field(default="json", description="Formato de logs: json o text")
     LOG_FILE: Optional[str] = Field(default="logs/app.log", description="Archivo de log")
+    LOG_ASYNC: bool = Field(default=True, description="Formatear y escribir los logs en un hilo en segundo plano")
+    LOG_QUEUE_MAX_SIZE: int = Field(default=10000, description="Registros en espera en la cola de logging (0 = sin límite)")
+    LOG_QUEUE_POLICY: str = Field(default="drop", description="Con la cola llena: drop (descartar) o block (esperar)")
+    LOG_QUEUE_BLOCK_SECONDS: float = Field(default=0.1, description="Espera máxima con la política block antes de descartar")
     
     # ============ VALIDACIONES ============
     @field_validator('DEBUG')
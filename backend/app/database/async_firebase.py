@@ -0,0 +1,133 @@
+"""
+[DB] ACCESO ASÍNCRONO A FIREBASE
+Ejecuta el SDK síncrono de firebase_admin en un pool de hilos acotado
+para no bloquear el event loop de FastAPI
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Callable
+
+from app.config.settings import settings
+from app.database.firebase import FirebaseManager, get_firebase
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFirebaseManager:
+    """
+    Fachada asíncrona de FirebaseManager
+
+    Cada operación se despacha a un ThreadPoolExecutor dedicado; el tamaño del
+    pool limita cuántas llamadas al SDK pueden estar en vuelo por worker.
+    """
+
+    def __init__(self, manager: Optional[FirebaseManager] = None, max_workers: Optional[int] = None):
+        self.manager = manager or get_firebase()
+        self.max_workers = max_workers or settings.FIREBASE_MAX_WORKERS
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="firebase"
+        )
+        logger.info("[FIREBASE] Async executor ready (%s threads)", self.max_workers)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Ejecuta una función bloqueante en el pool de Firebase
+
+        El contexto (contextvars) de la request se propaga al hilo.
+        """
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, func, *args, **kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
+    # ============ OPERACIONES DE LECTURA ============
+
+    async def read_data(self, path: str, cache: bool = False) -> Dict:
+        """Lee datos de la base de datos (ver FirebaseManager.read_data)"""
+        return await self.run(self.manager.read_data, path, cache=cache)
+
+    async def query(
+        self,
+        path: str,
+        order_by: str,
+        equal_to: Any = None,
+        start_at: Any = None,
+        end_at: Any = None,
+        limit: Optional[int] = None
+    ) -> Dict:
+        """Consulta filtrada en el servidor (ver FirebaseManager.query)"""
+        return await self.run(
+            self.manager.query, path, order_by,
+            equal_to=equal_to, start_at=start_at, end_at=end_at, limit=limit
+        )
+
+    async def read_keys(self, path: str) -> List[str]:
+        """Lee solo las claves hijas de una ruta (ver FirebaseManager.read_keys)"""
+        return await self.run(self.manager.read_keys, path)
+
+    async def read_paginated(self, path: str, limit: int = 50, cursor: Optional[str] = None) -> Dict:
+        """Lee una pagina por cursor (ver FirebaseManager.read_paginated)"""
+        return await self.run(self.manager.read_paginated, path, limit=limit, cursor=cursor)
+
+    # ============ OPERACIONES DE ESCRITURA ============
+
+    async def write_data(self, path: str, data: Dict) -> bool:
+        """Escribe datos (ver FirebaseManager.write_data)"""
+        return await self.run(self.manager.write_data, path, data)
+
+    async def update_data(self, path: str, data: Dict) -> bool:
+        """Actualiza datos (ver FirebaseManager.update_data)"""
+        return await self.run(self.manager.update_data, path, data)
+
+    async def delete_data(self, path: str) -> bool:
+        """Elimina datos (ver FirebaseManager.delete_data)"""
+        return await self.run(self.manager.delete_data, path)
+
+    async def batch_write(self, operations: List[Dict[str, Any]]) -> bool:
+        """Operaciones en batch (ver FirebaseManager.batch_write)"""
+        return await self.run(self.manager.batch_write, operations)
+
+    # ============ OPERACIONES DE SALUD ============
+
+    async def health_check(self) -> bool:
+        """Verifica conexion a Firebase (ver FirebaseManager.health_check)"""
+        return await self.run(self.manager.health_check)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Contadores de la caché de lecturas (no hace I/O)"""
+        return self.manager.cache_stats()
+
+    def shutdown(self, wait: bool = True):
+        """Detiene el pool de hilos"""
+        self._executor.shutdown(wait=wait)
+
+
+# ============ SINGLETON GLOBAL ============
+
+_async_firebase_instance = None
+
+
+def get_async_firebase() -> AsyncFirebaseManager:
+    """
+    Obtiene la instancia global de AsyncFirebaseManager
+
+    Returns:
+        Instancia singleton de AsyncFirebaseManager
+    """
+    global _async_firebase_instance
+    if _async_firebase_instance is None:
+        _async_firebase_instance = AsyncFirebaseManager()
+    return _async_firebase_instance
+
+
+def shutdown_async_firebase():
+    """Libera el pool de hilos en el cierre de la aplicación"""
+    global _async_firebase_instance
+    if _async_firebase_instance is not None:
+        _async_firebase_instance.shutdown(wait=False)
+        _async_firebase_instance = None
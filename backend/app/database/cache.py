@@ -0,0 +1,156 @@
+"""
+[CACHE] CACHÉ DE LECTURAS DE FIREBASE
+LRU en memoria con expiración (TTL), límite de bytes e invalidación por ruta
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+
+def normalizar_ruta(path: str) -> str:
+    """Normaliza una ruta de Realtime Database ('/a//b/' -> 'a/b')"""
+    return "/".join(parte for parte in (path or "").split("/") if parte)
+
+
+def rutas_relacionadas(a: str, b: str) -> bool:
+    """True si las rutas son iguales o una es ancestro de la otra"""
+    if a == b or not a or not b:
+        return True
+    return a.startswith(b + "/") or b.startswith(a + "/")
+
+
+class TTLCache:
+    """
+    Caché LRU de lecturas indexada por ruta
+
+    Los valores se guardan serializados en JSON: el tamaño en bytes es exacto y
+    cada acierto devuelve una copia independiente que el llamador puede mutar.
+    """
+
+    def __init__(self, ttl_seconds: float = 60, max_bytes: int = 16 * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        """Contador que cambia con cada invalidación"""
+        return self._generation
+
+    def get(self, path: str) -> Tuple[bool, Any]:
+        """
+        Busca una ruta en la caché
+
+        Returns:
+            Tupla (acierto, valor)
+        """
+        key = normalizar_ruta(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            expires_at, payload = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return True, json.loads(payload)
+
+    def set(self, path: str, value: Any, generation: int = None) -> bool:
+        """
+        Guarda el valor leído de una ruta
+
+        Args:
+            path: Ruta leída
+            value: Valor devuelto por la base de datos
+            generation: Generación observada antes de leer; si hubo una
+                invalidación desde entonces el valor se descarta
+
+        Returns:
+            True si el valor quedó en caché
+        """
+        key = normalizar_ruta(path)
+        try:
+            payload = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        except (TypeError, ValueError):
+            return False
+
+        if len(payload) > self.max_bytes:
+            return False
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, payload)
+            self._bytes += len(payload)
+
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+        return True
+
+    def invalidate(self, path: str) -> int:
+        """
+        Invalida la ruta, sus ancestros y sus descendientes
+
+        Returns:
+            Cantidad de entradas eliminadas
+        """
+        key = normalizar_ruta(path)
+        with self._lock:
+            self._generation += 1
+            afectadas = [k for k in self._entries if rutas_relacionadas(k, key)]
+            for k in afectadas:
+                self._remove(k)
+            self.invalidations += len(afectadas)
+        return len(afectadas)
+
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: str):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
@@ -6,14 +6,84 @@ Autenticacion, base de datos realtime y operaciones complejas
 import firebase_admin
 from firebase_admin import credentials, db, auth
 from app.config.settings import settings
+from app.database.cache import TTLCache
+from app.database.pagination import codificar_cursor, decodificar_cursor
+from app.database.tracing import current_trace, json_size
+from app.metrics import registry, timed
+import functools
+import inspect
 import os
 import json
+import time
 from typing import Optional, Dict, Any, List
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Llamadas al SDK por operación (incluye las lecturas servidas por la caché)
+firebase_operation_duration = registry.histogram(
+    "firebase_operation_duration_seconds",
+    "Duración de las operaciones de FirebaseManager",
+    ("operation",),
+)
+firebase_operation_errors = registry.counter(
+    "firebase_operation_errors_total",
+    "Operaciones de FirebaseManager que terminaron con excepción",
+    ("operation",),
+)
+
+
+# Argumentos que no identifican lo leído o escrito
+_ARGS_SIN_DESTINO = frozenset({"self", "path", "data", "operations", "cache"})
+
+
+def _operacion(nombre: str):
+    """
+    Instrumenta una operación de FirebaseManager
+
+    Siempre la mide (métricas); si la request tiene una traza activa
+    (app.database.tracing) además la anota con su destino y tamaño. El
+    destino es la ruta más los parámetros de la consulta, para que dos
+    páginas o rangos distintos de la misma ruta no cuenten como repetidos.
+    """
+    def decorador(func):
+        medida = timed(firebase_operation_duration, firebase_operation_errors, nombre)(func)
+        firma = inspect.signature(func)
+
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            traza = current_trace()
+            if traza is None:
+                return medida(*args, **kwargs)
+
+            inicio = time.perf_counter()
+            resultado = None
+            ok = False
+            try:
+                resultado = medida(*args, **kwargs)
+                ok = True
+                return resultado
+            finally:
+                duracion = time.perf_counter() - inicio
+                argumentos = firma.bind(*args, **kwargs).arguments
+                if nombre == "batch_write":
+                    operaciones = argumentos.get("operations") or []
+                    destino = f"<batch de {len(operaciones)}>"
+                    tamano = sum(json_size(op.get("data")) for op in operaciones if isinstance(op, dict))
+                else:
+                    destino = argumentos.get("path", "")
+                    parametros = [
+                        f"{clave}={valor}" for clave, valor in argumentos.items()
+                        if clave not in _ARGS_SIN_DESTINO and valor is not None
+                    ]
+                    if parametros:
+                        destino = f"{destino}?{'&'.join(parametros)}"
+                    tamano = json_size(argumentos["data"] if "data" in argumentos else resultado)
+                traza.record(nombre, destino, tamano, duracion, ok)
+        return envoltura
+    return decorador
+
 
 class FirebaseManager:
     """
@@ -38,6 +108,7 @@ class FirebaseManager:
         
         logger.info("[FIREBASE] Initializing Firebase Manager...")
         self._init_firebase()
+        self._init_cache()
         self._initialized = True
     
     def _init_firebase(self):
@@ -64,7 +135,7 @@ class FirebaseManager:
                 return
             
             if cred:
-                logger.info(f"[INFO] Initializing Firebase with URL: {db_url}")
+                logger.info("[INFO] Initializing Firebase with URL: %s", db_url)
                 firebase_admin.initialize_app(cred, {
                     'databaseURL': db_url
                 })
@@ -79,13 +150,37 @@ class FirebaseManager:
                 raise Exception("Firebase credentials required in production")
                 
         except Exception as e:
-            logger.error(f"[ERROR] Error initializing Firebase: {str(e)}")
+            logger.error("[ERROR] Error initializing Firebase: %s", e)
             logger.error("[ERROR] Check: 1) serviceAccountKey.json exists, 2) FIREBASE_DATABASE_URL in .env, 3) Firebase permissions")
             if not settings.DEBUG:
                 raise
             self._mock_mode = True
             logger.warning("[WARN] Continuing in MOCK mode")
     
+    def _init_cache(self):
+        """Configura la caché de lecturas si esta habilitada"""
+        self.cache = None
+        if settings.FIREBASE_CACHE_ENABLED:
+            self.cache = TTLCache(
+                ttl_seconds=settings.FIREBASE_CACHE_TTL_SECONDS,
+                max_bytes=settings.FIREBASE_CACHE_MAX_BYTES
+            )
+            logger.info(
+                "[CACHE] Read cache enabled (ttl=%ss, max_bytes=%s)",
+                settings.FIREBASE_CACHE_TTL_SECONDS, settings.FIREBASE_CACHE_MAX_BYTES,
+            )
+    
+    def _invalidate(self, path: str):
+        """Invalida en caché la ruta escrita, sus ancestros y descendientes"""
+        if self.cache is not None:
+            self.cache.invalidate(path)
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Contadores de la caché de lecturas"""
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.stats()}
+    
     def _load_credentials(self) -> Optional[credentials.Certificate]:
         """Carga credenciales de multiples fuentes"""
         
@@ -105,48 +200,147 @@ class FirebaseManager:
         
         if os.path.exists(cred_path):
             try:
-                logger.info(f"[OK] Credentials loaded from {cred_path}")
+                logger.info("[OK] Credentials loaded from %s", cred_path)
                 return credentials.Certificate(cred_path)
             except Exception as e:
-                logger.warning(f"[ERROR] Error loading credentials from file: {str(e)}")
+                logger.warning("[ERROR] Error loading credentials from file: %s", e)
         
         return None
     
     # ============ OPERACIONES DE LECTURA ============
     
-    def read_data(self, path: str) -> Dict:
+    @_operacion("read_data")
+    def read_data(self, path: str, cache: bool = False) -> Dict:
         """
         Lee datos de la base de datos
         
         Args:
             path: Ruta en la base de datos
+            cache: Usar la caché de lecturas (si esta habilitada) para rutas
+                casi estáticas como la configuración del cliente
             
         Returns:
             Diccionario con los datos o diccionario vacio si no existe
         """
         try:
             if self._mock_mode:
-                logger.debug(f"[MOCK] Reading from {path}")
+                logger.debug("[MOCK] Reading from %s", path)
                 return {}
             
-            ref = self.db.reference(path)
-            snapshot = ref.get()
-            value = snapshot.val() if snapshot.val() is not None else {}
+            use_cache = cache and self.cache is not None
+            if use_cache:
+                hit, value = self.cache.get(path)
+                if hit:
+                    logger.debug("[CACHE] Hit for %s", path)
+                    return value
+                generation = self.cache.generation
+            
+            value = self.db.reference(path).get()
+            if value is None:
+                value = {}
             
-            logger.debug(f"[OK] Data read from {path}: {type(value).__name__}")
-            return value if value is not None else {}
+            if use_cache:
+                self.cache.set(path, value, generation=generation)
+            
+            logger.debug("[OK] Data read from %s: %s", path, type(value).__name__)
+            return value
             
         except AttributeError as e:
-            logger.warning(f"[WARN] Path '{path}' may not exist or Firebase not initialized properly: {str(e)}")
+            logger.warning("[WARN] Path '%s' may not exist or Firebase not initialized properly: %s", path, e)
             return {}
         except Exception as e:
-            logger.error(f"[ERROR] Error reading {path}: {str(e)}")
+            logger.error("[ERROR] Error reading %s: %s", path, e)
             if self._mock_mode:
                 return {}
             raise
     
+    @_operacion("query")
+    def query(
+        self,
+        path: str,
+        order_by: str,
+        equal_to: Any = None,
+        start_at: Any = None,
+        end_at: Any = None,
+        limit: Optional[int] = None
+    ) -> Dict:
+        """
+        Consulta filtrada en el servidor (order_by_child / equal_to / rangos)
+        
+        Requiere un '.indexOn' para el campo en las reglas de la base de datos.
+        
+        Args:
+            path: Ruta de la coleccion
+            order_by: Campo hijo por el que ordenar, '$key' o '$value'
+            equal_to: Solo registros con ese valor exacto
+            start_at: Limite inferior (incluido) del rango
+            end_at: Limite superior (incluido) del rango
+            limit: Cantidad maxima de registros (los primeros en el orden)
+            
+        Returns:
+            Diccionario {clave: registro} en el orden de la consulta
+        """
+        try:
+            if self._mock_mode:
+                logger.debug("[MOCK] Querying %s by %s", path, order_by)
+                return {}
+            
+            ref = self.db.reference(path)
+            if order_by == "$key":
+                query = ref.order_by_key()
+            elif order_by == "$value":
+                query = ref.order_by_value()
+            else:
+                query = ref.order_by_child(order_by)
+            
+            if equal_to is not None:
+                query = query.equal_to(equal_to)
+            if start_at is not None:
+                query = query.start_at(start_at)
+            if end_at is not None:
+                query = query.end_at(end_at)
+            if limit is not None:
+                query = query.limit_to_first(limit)
+            
+            value = query.get()
+            result = dict(value) if isinstance(value, dict) else {}
+            
+            logger.debug("[OK] Query %s by %s: %s records", path, order_by, len(result))
+            return result
+            
+        except Exception as e:
+            logger.error("[ERROR] Error querying %s: %s", path, e)
+            raise
+    
+    @_operacion("read_keys")
+    def read_keys(self, path: str) -> List[str]:
+        """
+        Lee solo las claves hijas de una ruta (lectura shallow)
+        
+        Args:
+            path: Ruta en la base de datos
+            
+        Returns:
+            Lista de claves, vacia si la ruta no existe
+        """
+        try:
+            if self._mock_mode:
+                logger.debug("[MOCK] Reading keys from %s", path)
+                return []
+            
+            value = self.db.reference(path).get(shallow=True)
+            keys = list(value.keys()) if isinstance(value, dict) else []
+            
+            logger.debug("[OK] %s keys read from %s", len(keys), path)
+            return keys
+            
+        except Exception as e:
+            logger.error("[ERROR] Error reading keys from %s: %s", path, e)
+            raise
+    
     # ============ OPERACIONES DE ESCRITURA ============
     
+    @_operacion("write_data")
     def write_data(self, path: str, data: Dict) -> bool:
         """
         Escribe datos en la base de datos (sobrescribe)
@@ -160,17 +354,21 @@ class FirebaseManager:
         """
         try:
             if self._mock_mode:
-                logger.debug(f"[MOCK] Writing to {path}")
+                logger.debug("[MOCK] Writing to %s", path)
                 return True
             
-            self.db.reference(path).set(data)
-            logger.info(f"[OK] Data written to {path}")
+            try:
+                self.db.reference(path).set(data)
+            finally:
+                self._invalidate(path)
+            logger.info("[OK] Data written to %s", path)
             return True
             
         except Exception as e:
-            logger.error(f"[ERROR] Error writing to {path}: {str(e)}")
+            logger.error("[ERROR] Error writing to %s: %s", path, e)
             raise
     
+    @_operacion("update_data")
     def update_data(self, path: str, data: Dict) -> bool:
         """
         Actualiza datos (merge con existentes)
@@ -184,19 +382,23 @@ class FirebaseManager:
         """
         try:
             if self._mock_mode:
-                logger.debug(f"[MOCK] Updating {path}")
+                logger.debug("[MOCK] Updating %s", path)
                 return True
             
-            self.db.reference(path).update(data)
-            logger.info(f"[OK] Data updated at {path}")
+            try:
+                self.db.reference(path).update(data)
+            finally:
+                self._invalidate(path)
+            logger.info("[OK] Data updated at %s", path)
             return True
             
         except Exception as e:
-            logger.error(f"[ERROR] Error updating {path}: {str(e)}")
+            logger.error("[ERROR] Error updating %s: %s", path, e)
             raise
     
     # ============ OPERACIONES DE ELIMINACION ============
     
+    @_operacion("delete_data")
     def delete_data(self, path: str) -> bool:
         """
         Elimina datos de la base de datos
@@ -209,23 +411,31 @@ class FirebaseManager:
         """
         try:
             if self._mock_mode:
-                logger.debug(f"[MOCK] Deleting {path}")
+                logger.debug("[MOCK] Deleting %s", path)
                 return True
             
-            self.db.reference(path).delete()
-            logger.info(f"[OK] Data deleted from {path}")
+            try:
+                self.db.reference(path).delete()
+            finally:
+                self._invalidate(path)
+            logger.info("[OK] Data deleted from %s", path)
             return True
             
         except Exception as e:
-            logger.error(f"[ERROR] Error deleting {path}: {str(e)}")
+            logger.error("[ERROR] Error deleting %s: %s", path, e)
             raise
     
     # ============ OPERACIONES BATCH ============
     
+    @_operacion("batch_write")
     def batch_write(self, operations: List[Dict[str, Any]]) -> bool:
         """
         Realiza multiples operaciones en batch
         
+        Todas van en una sola actualizacion multi-ruta. 'set' reemplaza el
+        nodo; 'update' escribe solo los campos de data (como update_data), de
+        modo que los demas campos del nodo se conservan.
+        
         Args:
             operations: Lista de dict con {'path': path, 'operation': 'set'|'update'|'delete', 'data': dict}
             
@@ -234,7 +444,7 @@ class FirebaseManager:
         """
         try:
             if self._mock_mode:
-                logger.debug(f"[MOCK] Batch with {len(operations)} operations")
+                logger.debug("[MOCK] Batch with %s operations", len(operations))
                 return True
             
             updates = {}
@@ -245,15 +455,22 @@ class FirebaseManager:
                 
                 if operation == 'delete':
                     updates[path] = None
-                else:  # 'set' or 'update'
+                elif operation == 'update':
+                    for campo, valor in data.items():
+                        updates[f"{path}/{campo}"] = valor
+                else:  # 'set'
                     updates[path] = data
             
-            self.db.reference().update(updates)
-            logger.info(f"[OK] Batch of {len(operations)} operations completed")
+            try:
+                self.db.reference().update(updates)
+            finally:
+                for path in updates:
+                    self._invalidate(path)
+            logger.info("[OK] Batch of %s operations completed", len(operations))
             return True
             
         except Exception as e:
-            logger.error(f"[ERROR] Error in batch write: {str(e)}")
+            logger.error("[ERROR] Error in batch write: %s", e)
             raise
     
     # ============ OPERACIONES ESPECIALES DE USUARIO ============
@@ -269,7 +486,7 @@ class FirebaseManager:
             return None
             
         except Exception as e:
-            logger.error(f"[ERROR] Error getting user by email: {str(e)}")
+            logger.error("[ERROR] Error getting user by email: %s", e)
             raise
     
     def register_user_auth(self, email: str, password: str, display_name: str) -> Dict:
@@ -296,7 +513,7 @@ class FirebaseManager:
                 display_name=display_name
             )
             
-            logger.info(f"[OK] User created in Firebase Auth: {email} (UID: {user.uid})")
+            logger.info("[OK] User created in Firebase Auth: %s (UID: %s)", email, user.uid)
             return {
                 "uid": user.uid,
                 "email": user.email,
@@ -304,7 +521,7 @@ class FirebaseManager:
             }
             
         except Exception as e:
-            logger.error(f"[ERROR] Error creating user in Firebase Auth: {str(e)}")
+            logger.error("[ERROR] Error creating user in Firebase Auth: %s", e)
             raise
     
     def initialize_user_data(self, uid: str, email: str, display_name: str) -> bool:
@@ -362,11 +579,11 @@ class FirebaseManager:
                 "_initialized": datetime.now().isoformat()
             })
             
-            logger.info(f"[OK] User data structure initialized: {email} (UID: {uid})")
+            logger.info("[OK] User data structure initialized: %s (UID: %s)", email, uid)
             return True
             
         except Exception as e:
-            logger.error(f"[ERROR] Error initializing user data: {str(e)}")
+            logger.error("[ERROR] Error initializing user data: %s", e)
             raise
     
     def create_user(self, email: str, user_data: Dict) -> str:
@@ -386,11 +603,11 @@ class FirebaseManager:
                 **user_data,
                 "created_at": datetime.now().isoformat()
             })
-            logger.info(f"[OK] User created: {email}")
+            logger.info("[OK] User created: %s", email)
             return uid
             
         except Exception as e:
-            logger.error(f"[ERROR] Error creating user: {str(e)}")
+            logger.error("[ERROR] Error creating user: %s", e)
             raise
     
     def get_user_by_uid(self, uid: str) -> Optional[Dict]:
@@ -398,7 +615,7 @@ class FirebaseManager:
         try:
             return self.read_data(f"users/{uid}")
         except Exception as e:
-            logger.error(f"[ERROR] Error getting user by UID: {str(e)}")
+            logger.error("[ERROR] Error getting user by UID: %s", e)
             raise
     
     def update_user(self, uid: str, updates: Dict) -> bool:
@@ -407,48 +624,53 @@ class FirebaseManager:
             updates["updated_at"] = datetime.now().isoformat()
             return self.update_data(f"users/{uid}", updates)
         except Exception as e:
-            logger.error(f"[ERROR] Error updating user: {str(e)}")
+            logger.error("[ERROR] Error updating user: %s", e)
             raise
     
     # ============ OPERACIONES DE PAGINACION ============
     
-    def read_paginated(self, path: str, limit: int = 50, offset: int = 0) -> Dict:
+    @_operacion("read_paginated")
+    def read_paginated(self, path: str, limit: int = 50, cursor: Optional[str] = None) -> Dict:
         """
-        Lee datos con paginacion
+        Lee una pagina de una coleccion ordenada por clave (paginacion por cursor)
+        
+        Cada pagina es una sola consulta order_by_key().start_at(cursor)
+        .limit_to_first(limit + 1): el registro extra, si existe, es el inicio
+        de la pagina siguiente y su clave forma el next_cursor.
         
         Args:
-            path: Ruta en la base de datos
+            path: Ruta de la coleccion
             limit: Cantidad de registros
-            offset: Cantidad a saltar
+            cursor: Cursor opaco devuelto por la pagina anterior (None = primera)
             
         Returns:
-            Diccionario con 'data' y 'metadata'
+            Diccionario con 'data' ({clave: registro}), 'next_cursor' y 'limit'
+            
+        Raises:
+            ValueError: Si el cursor no es valido
         """
+        inicio = decodificar_cursor(cursor)
         try:
             if self._mock_mode:
-                return {"data": [], "total": 0, "limit": limit, "offset": offset}
+                return {"data": {}, "next_cursor": None, "limit": limit}
             
-            all_data = self.read_data(path) or {}
-            
-            # Convertir a lista si es dict
-            if isinstance(all_data, dict):
-                items = list(all_data.items())
-            else:
-                items = all_data if isinstance(all_data, list) else []
+            query = self.db.reference(path).order_by_key()
+            if inicio is not None:
+                query = query.start_at(inicio)
+            value = query.limit_to_first(limit + 1).get()
             
-            total = len(items)
-            paginated = items[offset:offset + limit]
+            items = list(value.items()) if isinstance(value, dict) else []
+            next_cursor = codificar_cursor(items[limit][0]) if len(items) > limit else None
             
+            logger.debug("[OK] Page of %s: %s records", path, min(len(items), limit))
             return {
-                "data": paginated,
-                "total": total,
-                "limit": limit,
-                "offset": offset,
-                "pages": (total + limit - 1) // limit
+                "data": dict(items[:limit]),
+                "next_cursor": next_cursor,
+                "limit": limit
             }
             
         except Exception as e:
-            logger.error(f"[ERROR] Error in paginated read: {str(e)}")
+            logger.error("[ERROR] Error in paginated read: %s", e)
             raise
     
     # ============ OPERACIONES DE SEGURIDAD ============
@@ -466,15 +688,15 @@ class FirebaseManager:
         """
         try:
             if self._mock_mode:
-                logger.debug(f"[MOCK] Setting claims for {uid}")
+                logger.debug("[MOCK] Setting claims for %s", uid)
                 return True
             
             self.auth.set_custom_user_claims(uid, claims)
-            logger.info(f"[OK] Custom claims set for user {uid}")
+            logger.info("[OK] Custom claims set for user %s", uid)
             return True
             
         except Exception as e:
-            logger.error(f"[ERROR] Error setting user claims: {str(e)}")
+            logger.error("[ERROR] Error setting user claims: %s", e)
             raise
     
     # ============ OPERACIONES DE SALUD ============
@@ -497,7 +719,7 @@ class FirebaseManager:
             return True
             
         except Exception as e:
-            logger.error(f"[WARN] Firebase health check failed: {str(e)}")
+            logger.error("[WARN] Firebase health check failed: %s", e)
             return False
 
 
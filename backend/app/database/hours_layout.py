@@ -0,0 +1,271 @@
+"""
+[DB] DISTRIBUCIÓN DE HORAS POR QUINCENA
+Rutas y operaciones de la distribución compuesta de registros de horas
+
+    clients/{client_id}/hours/{hours_id}                                   (plana)
+    clients/{client_id}/hours_by_quincena/{quincena}/{employee_id}/{hours_id}
+
+Mientras dure la migración ambas se escriben juntas (una sola actualización
+multi-ruta). Las lecturas por empleado/quincena usan la distribución compuesta
+cuando el cliente terminó de migrar y la consulta indexada sobre la plana
+mientras tanto.
+"""
+
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+MIGRACION_HORAS = "hours_by_quincena"
+
+# Clientes cuya migración ya se observó completa en este proceso
+_clientes_migrados = set()
+
+
+def ruta_horas(client_id: str, hours_id: str = None) -> str:
+    """Ruta de la distribución plana (colección o registro)"""
+    path = f"clients/{client_id}/hours"
+    return f"{path}/{hours_id}" if hours_id else path
+
+
+def ruta_horas_quincena(
+    client_id: str,
+    quincena: str,
+    employee_id: str = None,
+    hours_id: str = None
+) -> str:
+    """
+    Ruta de la distribución compuesta
+
+    Args:
+        client_id: ID del cliente
+        quincena: Período (YYYY-MM)
+        employee_id: Empleado (opcional)
+        hours_id: Registro (opcional, requiere employee_id)
+
+    Returns:
+        Ruta de la quincena, del empleado en la quincena o del registro
+    """
+    path = f"clients/{client_id}/hours_by_quincena/{quincena}"
+    if employee_id:
+        path = f"{path}/{employee_id}"
+        if hours_id:
+            path = f"{path}/{hours_id}"
+    return path
+
+
+def ruta_migracion(client_id: str) -> str:
+    """Ruta del checkpoint de la migración de un cliente"""
+    return f"clients/{client_id}/_migrations/{MIGRACION_HORAS}"
+
+
+def tiene_clave_compuesta(registro: Any) -> bool:
+    """True si el registro tiene los campos que forman la ruta compuesta"""
+    return (
+        isinstance(registro, dict)
+        and bool(registro.get("quincena"))
+        and bool(registro.get("employee_id"))
+    )
+
+
+def operaciones_guardar(client_id: str, hours_id: str, registro: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Operaciones batch_write que guardan un registro en ambas distribuciones
+
+    Args:
+        client_id: ID del cliente
+        hours_id: ID del registro
+        registro: Registro completo de horas
+
+    Returns:
+        Lista de operaciones para FirebaseManager.batch_write
+    """
+    operaciones = [{"path": ruta_horas(client_id, hours_id), "operation": "set", "data": registro}]
+    if tiene_clave_compuesta(registro):
+        operaciones.append({
+            "path": ruta_horas_quincena(client_id, registro["quincena"], registro["employee_id"], hours_id),
+            "operation": "set",
+            "data": registro,
+        })
+    return operaciones
+
+
+def operaciones_actualizar(
+    client_id: str,
+    hours_id: str,
+    actual: Dict[str, Any],
+    cambios: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """
+    Operaciones batch_write que actualizan campos de un registro en ambas distribuciones
+
+    Los campos se escriben con 'update' (solo los modificados), así dos
+    actualizaciones concurrentes de campos distintos no se pisan. La copia
+    compuesta se reescribe completa solo si cambia quincena o employee_id y
+    tiene que moverse de ruta.
+
+    Args:
+        client_id: ID del cliente
+        hours_id: ID del registro
+        actual: Registro antes del cambio
+        cambios: Campos a modificar
+
+    Returns:
+        Lista de operaciones para FirebaseManager.batch_write
+    """
+    operaciones = [{"path": ruta_horas(client_id, hours_id), "operation": "update", "data": cambios}]
+
+    nuevo = {**actual, **cambios}
+    mismo_destino = (
+        tiene_clave_compuesta(actual)
+        and tiene_clave_compuesta(nuevo)
+        and actual["quincena"] == nuevo["quincena"]
+        and actual["employee_id"] == nuevo["employee_id"]
+    )
+    if mismo_destino:
+        operaciones.append({
+            "path": ruta_horas_quincena(client_id, actual["quincena"], actual["employee_id"], hours_id),
+            "operation": "update",
+            "data": cambios,
+        })
+        return operaciones
+
+    if tiene_clave_compuesta(actual):
+        operaciones.append({
+            "path": ruta_horas_quincena(client_id, actual["quincena"], actual["employee_id"], hours_id),
+            "operation": "delete",
+        })
+    if tiene_clave_compuesta(nuevo):
+        operaciones.append({
+            "path": ruta_horas_quincena(client_id, nuevo["quincena"], nuevo["employee_id"], hours_id),
+            "operation": "set",
+            "data": {campo: valor for campo, valor in nuevo.items() if valor is not None},
+        })
+    return operaciones
+
+
+def operaciones_eliminar(client_id: str, hours_id: str, registro: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Operaciones batch_write que eliminan un registro de ambas distribuciones"""
+    operaciones = [{"path": ruta_horas(client_id, hours_id), "operation": "delete"}]
+    if tiene_clave_compuesta(registro):
+        operaciones.append({
+            "path": ruta_horas_quincena(client_id, registro["quincena"], registro["employee_id"], hours_id),
+            "operation": "delete",
+        })
+    return operaciones
+
+
+def aplanar_quincena(por_empleado: Any) -> Dict[str, Dict[str, Any]]:
+    """Convierte {employee_id: {hours_id: registro}} en {hours_id: registro}"""
+    registros = {}
+    if isinstance(por_empleado, dict):
+        for registros_empleado in por_empleado.values():
+            if isinstance(registros_empleado, dict):
+                registros.update(
+                    (hours_id, registro)
+                    for hours_id, registro in registros_empleado.items()
+                    if isinstance(registro, dict)
+                )
+    return registros
+
+
+async def migracion_completa(firebase, client_id: str) -> bool:
+    """
+    True si el cliente ya tiene todas sus horas en la distribución compuesta
+
+    La migración no se revierte, así que el resultado positivo se recuerda en
+    el proceso y no vuelve a costar una lectura.
+    """
+    if client_id in _clientes_migrados:
+        return True
+
+    estado = await firebase.read_data(ruta_migracion(client_id), cache=True)
+    if isinstance(estado, dict) and estado.get("completed"):
+        _clientes_migrados.add(client_id)
+        return True
+    return False
+
+
+async def leer_horas_empleado_quincena(
+    firebase,
+    client_id: str,
+    employee_id: str,
+    quincena: str
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Registros de horas de un empleado en una quincena
+
+    Con la migración completa es una lectura directa de ruta; antes de eso la
+    distribución compuesta puede estar incompleta y se consulta la plana.
+
+    Args:
+        firebase: AsyncFirebaseManager
+        client_id: ID del cliente
+        employee_id: ID del empleado
+        quincena: Período (YYYY-MM)
+
+    Returns:
+        Diccionario {hours_id: registro}
+    """
+    if await migracion_completa(firebase, client_id):
+        registros = await firebase.read_data(ruta_horas_quincena(client_id, quincena, employee_id))
+    else:
+        registros = await firebase.query(ruta_horas(client_id), order_by="employee_id", equal_to=employee_id)
+
+    return {
+        hours_id: registro
+        for hours_id, registro in (registros or {}).items()
+        if isinstance(registro, dict) and registro.get("quincena", quincena) == quincena
+    }
+
+
+async def leer_horas_quincena(firebase, client_id: str, quincena: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Registros de horas de todos los empleados en una quincena
+
+    Args:
+        firebase: AsyncFirebaseManager
+        client_id: ID del cliente
+        quincena: Período (YYYY-MM)
+
+    Returns:
+        Diccionario {hours_id: registro}
+    """
+    if await migracion_completa(firebase, client_id):
+        return aplanar_quincena(await firebase.read_data(ruta_horas_quincena(client_id, quincena)))
+
+    return await firebase.query(ruta_horas(client_id), order_by="quincena", equal_to=quincena) or {}
+
+
+async def leer_horas_quincena_rango(
+    firebase,
+    client_id: str,
+    quincena: str,
+    primer_empleado: str,
+    ultimo_empleado: str
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Registros de horas de la quincena para un rango de employee_id (incluido)
+
+    Solo disponible con la migración completa: en la distribución compuesta
+    los empleados son claves, así que el rango es una consulta por $key. Sobre
+    la plana no hay índice por (quincena, empleado) y hay que usar
+    leer_horas_quincena.
+
+    Args:
+        firebase: AsyncFirebaseManager
+        client_id: ID del cliente
+        quincena: Período (YYYY-MM)
+        primer_empleado: Primer employee_id del rango
+        ultimo_empleado: Último employee_id del rango
+
+    Returns:
+        Diccionario {hours_id: registro}
+    """
+    por_empleado = await firebase.query(
+        ruta_horas_quincena(client_id, quincena),
+        order_by="$key",
+        start_at=primer_empleado,
+        end_at=ultimo_empleado,
+    )
+    return aplanar_quincena(por_empleado)
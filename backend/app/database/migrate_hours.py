@@ -0,0 +1,188 @@
+"""
+[DB] MIGRACIÓN DE HORAS A LA DISTRIBUCIÓN POR QUINCENA
+Copia los registros de clients/{id}/hours a clients/{id}/hours_by_quincena
+por bloques, con un checkpoint reanudable por cliente
+
+Debe ejecutarse con la escritura dual ya desplegada: los registros creados o
+modificados durante la migración los mantiene la API en ambas distribuciones.
+
+Uso (desde backend/):
+    python -m app.database.migrate_hours CLIENT_ID [CLIENT_ID ...]
+    python -m app.database.migrate_hours --all [--chunk-size 500] [--restart]
+"""
+
+import argparse
+import logging
+import sys
+from datetime import datetime
+from typing import Any, Dict, List
+
+from app.database.firebase import FirebaseManager, get_firebase
+from app.database.hours_layout import (
+    ruta_horas,
+    ruta_horas_quincena,
+    ruta_migracion,
+    tiene_clave_compuesta,
+)
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+
+def _ruta_compuesta(client_id: str, hours_id: str, registro: Dict[str, Any]) -> str:
+    return ruta_horas_quincena(client_id, registro["quincena"], registro["employee_id"], hours_id)
+
+
+def _reconciliar(
+    firebase: FirebaseManager,
+    client_id: str,
+    leidos: Dict[str, Any],
+    primera: str,
+    ultima: str
+) -> int:
+    """
+    Vuelve a leer el rango recién copiado y corrige lo que la API cambió entre
+    la lectura y la escritura del bloque (registros eliminados o modificados)
+
+    Returns:
+        Cantidad de registros corregidos
+    """
+    actuales = firebase.query(ruta_horas(client_id), order_by="$key", start_at=primera, end_at=ultima)
+
+    operaciones = []
+    corregidos = 0
+    for hours_id, anterior in leidos.items():
+        actual = actuales.get(hours_id)
+        if actual == anterior:
+            continue
+        corregidos += 1
+        if tiene_clave_compuesta(anterior):
+            operaciones.append({"path": _ruta_compuesta(client_id, hours_id, anterior), "operation": "delete"})
+        if tiene_clave_compuesta(actual):
+            operaciones.append({
+                "path": _ruta_compuesta(client_id, hours_id, actual),
+                "operation": "set",
+                "data": actual,
+            })
+
+    if operaciones:
+        firebase.batch_write(operaciones)
+    return corregidos
+
+
+def migrar_cliente(
+    firebase: FirebaseManager,
+    client_id: str,
+    chunk_size: int = CHUNK_SIZE,
+    reiniciar: bool = False
+) -> Dict[str, Any]:
+    """
+    Migra las horas de un cliente a la distribución por quincena
+
+    Recorre la colección plana en orden de clave, en páginas de chunk_size.
+    Cada bloque se escribe con un único batch_write que incluye el checkpoint,
+    así que una interrupción nunca deja el checkpoint por delante de los datos
+    y volver a ejecutar retoma desde la última clave copiada.
+
+    Args:
+        firebase: Gestor de Firebase
+        client_id: ID del cliente
+        chunk_size: Registros por bloque
+        reiniciar: Ignorar el checkpoint y empezar desde el principio
+
+    Returns:
+        Estado final de la migración del cliente
+    """
+    estado = {} if reiniciar else (firebase.read_data(ruta_migracion(client_id)) or {})
+    if estado.get("completed"):
+        logger.info("[MIGRATION] Client %s already migrated", client_id)
+        return estado
+
+    estado = {
+        "last_key": estado.get("last_key"),
+        "migrated": estado.get("migrated", 0),
+        "skipped": estado.get("skipped", 0),
+        "reconciled": estado.get("reconciled", 0),
+        "started_at": estado.get("started_at") or datetime.now().isoformat(),
+        "completed": False,
+    }
+
+    while True:
+        cursor = estado["last_key"]
+        # start_at incluye el cursor: se pide un registro extra y se descarta
+        pagina = firebase.query(
+            ruta_horas(client_id),
+            order_by="$key",
+            start_at=cursor,
+            limit=chunk_size + 1 if cursor else chunk_size
+        )
+        leidos = {k: v for k, v in pagina.items() if k != cursor}
+        if not leidos:
+            break
+
+        operaciones: List[Dict[str, Any]] = []
+        for hours_id, registro in leidos.items():
+            if tiene_clave_compuesta(registro):
+                operaciones.append({
+                    "path": _ruta_compuesta(client_id, hours_id, registro),
+                    "operation": "set",
+                    "data": registro,
+                })
+                estado["migrated"] += 1
+            else:
+                estado["skipped"] += 1
+
+        claves = list(leidos)
+        estado["last_key"] = claves[-1]
+        estado["updated_at"] = datetime.now().isoformat()
+        operaciones.append({"path": ruta_migracion(client_id), "operation": "set", "data": dict(estado)})
+        firebase.batch_write(operaciones)
+
+        estado["reconciled"] += _reconciliar(firebase, client_id, leidos, claves[0], claves[-1])
+        logger.info(
+            "[MIGRATION] Client %s: %s migrated, %s skipped (last key %s)",
+            client_id, estado["migrated"], estado["skipped"], estado["last_key"],
+        )
+
+        if len(leidos) < chunk_size:
+            break
+
+    estado["completed"] = True
+    estado["completed_at"] = datetime.now().isoformat()
+    firebase.write_data(ruta_migracion(client_id), estado)
+    logger.info("[MIGRATION] Client %s completed", client_id)
+    return estado
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Migra las horas a la distribución por quincena")
+    parser.add_argument("client_ids", nargs="*", help="Clientes a migrar")
+    parser.add_argument("--all", action="store_true", help="Migrar todos los clientes")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Registros por bloque")
+    parser.add_argument("--restart", action="store_true", help="Ignorar los checkpoints existentes")
+    args = parser.parse_args(argv)
+
+    firebase = get_firebase()
+    client_ids = firebase.read_keys("clients") if args.all else args.client_ids
+    if not client_ids:
+        parser.error("indique al menos un CLIENT_ID o --all")
+
+    fallidos = 0
+    for client_id in client_ids:
+        try:
+            estado = migrar_cliente(firebase, client_id, chunk_size=args.chunk_size, reiniciar=args.restart)
+            print(
+                f"{client_id}: {estado.get('migrated', 0)} migrados, "
+                f"{estado.get('skipped', 0)} omitidos, {estado.get('reconciled', 0)} reconciliados"
+            )
+        except Exception as e:
+            fallidos += 1
+            logger.error("[MIGRATION] Client %s failed: %s", client_id, e)
+            print(f"{client_id}: error ({str(e)}); vuelva a ejecutar para reanudar")
+
+    return 1 if fallidos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
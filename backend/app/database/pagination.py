@@ -0,0 +1,61 @@
+"""
+[DB] PAGINACIÓN POR CURSOR
+Cursores opacos para paginación por clave (keyset) sobre colecciones de Firebase
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, Dict, Optional, Tuple
+
+
+def codificar_cursor(clave: str) -> str:
+    """Convierte la clave del primer registro de la página siguiente en un cursor opaco"""
+    payload = json.dumps({"k": clave}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: Optional[str]) -> Optional[str]:
+    """
+    Obtiene la clave de inicio a partir de un cursor
+
+    Args:
+        cursor: Cursor devuelto por una página anterior (o None)
+
+    Returns:
+        Clave desde la que continuar, None para la primera página
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    if not cursor:
+        return None
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        clave = payload["k"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValueError("Cursor de paginación inválido")
+    if not isinstance(clave, str) or not clave:
+        raise ValueError("Cursor de paginación inválido")
+    return clave
+
+
+def paginar(registros: Dict[str, Any], limit: int, cursor: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    Pagina en memoria un resultado ya filtrado, con la misma semántica de cursor
+    que FirebaseManager.read_paginated
+
+    Args:
+        registros: Diccionario {clave: registro}
+        limit: Registros por página
+        cursor: Cursor de la página (o None para la primera)
+
+    Returns:
+        Tupla (página, next_cursor)
+    """
+    inicio = decodificar_cursor(cursor)
+    claves = sorted(k for k in (registros or {}) if inicio is None or k >= inicio)
+    pagina = {k: registros[k] for k in claves[:limit]}
+    next_cursor = codificar_cursor(claves[limit]) if len(claves) > limit else None
+    return pagina, next_cursor
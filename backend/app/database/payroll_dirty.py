@@ -0,0 +1,123 @@
+"""
+[DB] NÓMINAS PENDIENTES DE RECÁLCULO
+Marcas de los cambios que invalidan nóminas ya calculadas
+
+    clients/{client_id}/payroll_dirty/quincenas/{quincena}/{employee_id}  horas del empleado en la quincena
+    clients/{client_id}/payroll_dirty/employees/{employee_id}             datos del empleado (todas las quincenas)
+    clients/{client_id}/payroll_dirty/config                              configuración (todos los empleados)
+
+Cada marca guarda el instante (time.time()) del último cambio. Un lote guardado
+recalcula los empleados con marcas posteriores a su calculado_ts, así una
+misma marca sirve para todos los lotes y no hay que borrarla al consumirla.
+Las marcas se escriben en la misma actualización multi-ruta que el cambio.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.database.hours_layout import tiene_clave_compuesta
+
+
+def ruta_pendientes(client_id: str) -> str:
+    return f"clients/{client_id}/payroll_dirty"
+
+
+def operacion_marcar_horas(client_id: str, quincena: str, employee_id: str, ts: Optional[float] = None) -> Dict[str, Any]:
+    """Operación batch_write que marca (employee_id, quincena) como modificado"""
+    return {
+        "path": f"{ruta_pendientes(client_id)}/quincenas/{quincena}/{employee_id}",
+        "operation": "set",
+        "data": ts or time.time(),
+    }
+
+
+def operacion_marcar_empleado(client_id: str, employee_id: str, ts: Optional[float] = None) -> Dict[str, Any]:
+    """Operación batch_write que marca al empleado como modificado en todas las quincenas"""
+    return {
+        "path": f"{ruta_pendientes(client_id)}/employees/{employee_id}",
+        "operation": "set",
+        "data": ts or time.time(),
+    }
+
+
+def operacion_marcar_config(client_id: str, ts: Optional[float] = None) -> Dict[str, Any]:
+    """Operación batch_write que invalida todas las nóminas del cliente"""
+    return {
+        "path": f"{ruta_pendientes(client_id)}/config",
+        "operation": "set",
+        "data": ts or time.time(),
+    }
+
+
+def operaciones_marcar_horas(client_id: str, *registros: Any) -> List[Dict[str, Any]]:
+    """
+    Marcas para uno o más registros de horas (p. ej. el anterior y el nuevo
+    de una actualización que cambia de empleado o quincena)
+    """
+    ts = time.time()
+    pares = {
+        (registro["quincena"], registro["employee_id"])
+        for registro in registros
+        if tiene_clave_compuesta(registro)
+    }
+    return [operacion_marcar_horas(client_id, quincena, employee_id, ts) for quincena, employee_id in pares]
+
+
+def marca_lote(batch: Dict[str, Any]) -> float:
+    """
+    Instante del último cálculo de un lote guardado
+
+    Los lotes anteriores a calculado_ts usan created_at.
+    """
+    if batch.get("calculado_ts"):
+        return float(batch["calculado_ts"])
+    try:
+        return datetime.fromisoformat(batch.get("created_at", "")).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+async def _sin_marcas() -> Dict:
+    return {}
+
+
+async def empleados_pendientes(
+    firebase,
+    client_id: str,
+    quincena: str,
+    desde: float,
+    incluir_horas: bool = True
+) -> Tuple[Set[str], bool]:
+    """
+    Empleados con cambios posteriores a desde que afectan la quincena
+
+    Args:
+        firebase: AsyncFirebaseManager
+        client_id: ID del cliente
+        quincena: Período (YYYY-MM)
+        desde: Instante del último cálculo (ver marca_lote)
+        incluir_horas: Considerar los cambios en las horas registradas (no
+            aplica a lotes calculados con horas enviadas en la request)
+
+    Returns:
+        Tupla (employee_ids modificados, True si cambió la configuración)
+    """
+    raiz = ruta_pendientes(client_id)
+    por_horas, por_empleado, config = await asyncio.gather(
+        firebase.read_data(f"{raiz}/quincenas/{quincena}") if incluir_horas else _sin_marcas(),
+        firebase.read_data(f"{raiz}/employees"),
+        firebase.read_data(f"{raiz}/config"),
+    )
+
+    pendientes = set()
+    for marcas in (por_horas, por_empleado):
+        if isinstance(marcas, dict):
+            pendientes.update(
+                employee_id for employee_id, ts in marcas.items()
+                if isinstance(ts, (int, float)) and ts > desde
+            )
+
+    config_modificada = isinstance(config, (int, float)) and config > desde
+    return pendientes, config_modificada
@@ -0,0 +1,104 @@
+"""
+[DB] TRAZA DE LLAMADAS A FIREBASE POR REQUEST
+Registra cada operación de FirebaseManager (operación, destino, bytes, duración)
+
+La traza activa vive en un ContextVar: FirebaseTraceMiddleware la abre por
+request y AsyncFirebaseManager.run copia el contexto al hilo del pool, así que
+las llamadas hechas desde los hilos se anotan en la traza de su request. Sin
+traza activa (trabajos en segundo plano, CLI) no se registra nada.
+"""
+
+import json
+from collections import Counter
+from contextvars import ContextVar, Token
+from typing import Any, Dict, List, NamedTuple, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional, se usa json
+    orjson = None
+
+# Operaciones de lectura (las que cuentan para lecturas repetidas)
+READ_OPERATIONS = frozenset({"read_data", "query", "read_keys", "read_paginated"})
+
+# Header con el resumen de la traza (solo en DEBUG)
+FIREBASE_TRACE_HEADER = "X-Firebase-Trace"
+
+
+class FirebaseCall(NamedTuple):
+    """Una operación de FirebaseManager"""
+    operation: str
+    target: str
+    bytes: int
+    duration: float
+    ok: bool
+
+
+class FirebaseTrace:
+    """Llamadas a Firebase de una request"""
+
+    __slots__ = ("calls",)
+
+    def __init__(self):
+        # list.append es atómico: los hilos del pool anotan sin lock
+        self.calls: List[FirebaseCall] = []
+
+    def record(self, operation: str, target: str, nbytes: int, duration: float, ok: bool = True):
+        self.calls.append(FirebaseCall(operation, target, nbytes, duration, ok))
+
+    def summary(self) -> Dict[str, Any]:
+        """Totales de la traza"""
+        calls = list(self.calls)
+        reads = sum(1 for call in calls if call.operation in READ_OPERATIONS)
+        return {
+            "calls": len(calls),
+            "reads": reads,
+            "writes": len(calls) - reads,
+            "bytes": sum(call.bytes for call in calls),
+            "ms": round(sum(call.duration for call in calls) * 1000, 1),
+            "errors": sum(1 for call in calls if not call.ok),
+        }
+
+    def repeated_reads(self, threshold: int) -> Dict[str, int]:
+        """Destinos leídos más de threshold veces (misma ruta y parámetros)"""
+        conteo = Counter(call.target for call in list(self.calls) if call.operation in READ_OPERATIONS)
+        return {target: veces for target, veces in conteo.most_common() if veces > threshold}
+
+    def header_value(self) -> str:
+        """Resumen para el header X-Firebase-Trace ("calls=3;reads=2;...")"""
+        return ";".join(f"{clave}={valor}" for clave, valor in self.summary().items())
+
+
+_current_trace: ContextVar[Optional[FirebaseTrace]] = ContextVar("firebase_trace", default=None)
+
+
+def start_trace(trace: Optional[FirebaseTrace] = None) -> Token:
+    """
+    Activa una traza en el contexto actual
+
+    Returns:
+        Token para end_trace
+    """
+    return _current_trace.set(trace or FirebaseTrace())
+
+
+def end_trace(token: Token):
+    """Restaura el contexto anterior a start_trace"""
+    _current_trace.reset(token)
+
+
+def current_trace() -> Optional[FirebaseTrace]:
+    """Traza activa o None"""
+    return _current_trace.get()
+
+
+def json_size(value: Any) -> int:
+    """Bytes aproximados de un valor serializado en JSON (solo con traza activa)"""
+    if value is None:
+        return 0
+    try:
+        if orjson is not None:
+            return len(orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS))
+        return len(json.dumps(value, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
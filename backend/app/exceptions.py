@@ -154,7 +154,7 @@ def register_error_handlers(app: FastAPI):
         logger_func = getattr(logger, log_level)
         
         logger_func(
-            f"🔴 APIError [{request_id}]: {exc.error_code} - {exc.message}",
+            "🔴 APIError [%s]: %s - %s", request_id, exc.error_code, exc.message,
             extra={
                 "request_id": request_id,
                 "error_code": exc.error_code,
@@ -182,7 +182,7 @@ def register_error_handlers(app: FastAPI):
             })
         
         logger.warning(
-            f"⚠️  Validation Error [{request_id}]: {len(error_details)} errores",
+            "⚠️  Validation Error [%s]: %s errores", request_id, len(error_details),
             extra={
                 "request_id": request_id,
                 "errors": error_details
@@ -207,7 +207,7 @@ def register_error_handlers(app: FastAPI):
         request_id = getattr(request.state, "request_id", None)
         
         logger.error(
-            f"❌ Excepción no manejada [{request_id}]: {str(exc)}",
+            "❌ Excepción no manejada [%s]: %s", request_id, exc,
             extra={
                 "request_id": request_id,
                 "error_type": type(exc).__name__,
@@ -3,22 +3,76 @@
 Logging estructurado con JSON para análisis y monitoreo
 """
 
+import atexit
 import logging
 import logging.handlers
 import json
+import math
+import queue
+import socket
 import sys
+import threading
+from contextvars import ContextVar, Token
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, Any
 from app.config.settings import settings
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional, se usa json
+    orjson = None
+
+
+def _dumps_log(data: Dict[str, Any]) -> str:
+    """JSON de un registro (orjson si está instalado); lo no serializable como str"""
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, default=str)
+
 
 class JSONFormatter(logging.Formatter):
-    """Formateador que produce logs en JSON"""
-    
+    """
+    Formateador que produce logs en JSON
+
+    Los campos fijos del proceso (service, version, environment, host) se
+    serializan una sola vez al crear el formateador y se agregan al final de
+    cada línea. El timestamp sale de record.created (UTC) reutilizando la
+    parte de fecha y hora mientras no cambie el segundo.
+    """
+
+    def __init__(self, static_fields: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        if static_fields is None:
+            static_fields = {
+                "service": settings.APP_NAME,
+                "version": settings.VERSION,
+                "environment": settings.ENVIRONMENT,
+                "host": socket.gethostname(),
+            }
+        self._static_fields = dict(static_fields)
+        # ',"service":...,"host":...}' para cerrar cada línea
+        self._static_suffix = "," + _dumps_log(self._static_fields)[1:] if self._static_fields else "}"
+        # (segundo, "YYYY-MM-DDTHH:MM:SS") del último registro; una tupla para
+        # que el reemplazo sea atómico
+        self._second_cache = (None, "")
+
+    def _timestamp(self, created: float) -> str:
+        """Igual a datetime.utcfromtimestamp(created).isoformat()"""
+        fraction, second = math.modf(created)
+        micros = round(fraction * 1e6)
+        if micros >= 1000000:
+            second += 1
+            micros -= 1000000
+        cached_second, prefix = self._second_cache
+        if second != cached_second:
+            prefix = datetime.utcfromtimestamp(second).isoformat()
+            self._second_cache = (second, prefix)
+        return f"{prefix}.{micros:06d}" if micros else prefix
+
     def format(self, record: logging.LogRecord) -> str:
         log_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -28,8 +82,9 @@ class JSONFormatter(logging.Formatter):
         }
         
         # Agregar información adicional si existe
-        if hasattr(record, 'extra_data'):
-            log_data.update(record.extra_data)
+        extra_data = getattr(record, "extra_data", None)
+        if extra_data:
+            log_data.update(extra_data)
         
         # Agregar excepción si existe
         if record.exc_info:
@@ -38,7 +93,12 @@ class JSONFormatter(logging.Formatter):
                 "message": str(record.exc_info[1]),
             }
         
-        return json.dumps(log_data, ensure_ascii=False)
+        # Un campo de extra_data con el nombre de un campo fijo lo reemplaza
+        if extra_data and not self._static_fields.keys().isdisjoint(extra_data):
+            for clave, valor in self._static_fields.items():
+                log_data.setdefault(clave, valor)
+            return _dumps_log(log_data)
+        return _dumps_log(log_data)[:-1] + self._static_suffix
 
 
 class PlainFormatter(logging.Formatter):
@@ -85,8 +145,102 @@ class RotatingFileHandler(logging.handlers.RotatingFileHandler):
         super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount)
 
 
+# ============ PIPELINE ASÍNCRONO ============
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler sobre una cola acotada
+
+    El hilo que registra solo copia el registro a la cola; el formato y la
+    escritura los hace el QueueListener en segundo plano. Con la cola llena,
+    la política "drop" descarta el registro sin bloquear y "block" espera
+    hasta block_timeout segundos antes de descartarlo. Los descartes se
+    cuentan en dropped.
+    """
+
+    def __init__(self, log_queue: queue.Queue, policy: str = "drop", block_timeout: float = 0.1):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"LOG_QUEUE_POLICY desconocida: {policy}")
+        super().__init__(log_queue)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Copia el registro con el mensaje ya resuelto
+
+        A diferencia de QueueHandler.prepare no aplica ningún formateador ni
+        descarta exc_info: la cola es del mismo proceso y los formateadores
+        de cada handler lo necesitan.
+        """
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if self.policy == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    """QueueListener cuyo centinela de parada espera lugar en la cola acotada"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+# Pipeline activo (None si los handlers escriben en el hilo que registra)
+_queue_handler: Optional[BoundedQueueHandler] = None
+_listener: Optional[_QueueListener] = None
+
+
+def shutdown_logging():
+    """Detiene el listener procesando los registros que quedan en la cola"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+    _queue_handler = None
+
+
+def logging_stats() -> Dict[str, Any]:
+    """Estado del pipeline de logging (para /api/status)"""
+    if _queue_handler is None:
+        return {"async": False}
+    return {
+        "async": True,
+        "queue_size": _queue_handler.queue.qsize(),
+        "queue_max_size": _queue_handler.queue.maxsize,
+        "policy": _queue_handler.policy,
+        "dropped": _queue_handler.dropped,
+    }
+
+
+atexit.register(shutdown_logging)
+
+
 def setup_logging():
-    """Configura el sistema de logging profesional"""
+    """
+    Configura el sistema de logging profesional
+
+    Con LOG_ASYNC los handlers (consola, archivo y errores) se atienden desde
+    un QueueListener en segundo plano y el logger raíz solo tiene un
+    BoundedQueueHandler, para que registrar no haga E/S en el event loop.
+    """
+    global _queue_handler, _listener
     
     # Configuración base
     log_level = getattr(logging, settings.LOG_LEVEL, logging.INFO)
@@ -95,8 +249,11 @@ def setup_logging():
     root_logger = logging.getLogger()
     root_logger.setLevel(log_level)
     
-    # Limpiar handlers existentes
+    # Limpiar handlers existentes (y el listener de una configuración anterior)
+    shutdown_logging()
     root_logger.handlers.clear()
+    handlers = []
+    avisos = []
     
     # ===== CONSOLE HANDLER =====
     console_handler = logging.StreamHandler(sys.stdout)
@@ -108,7 +265,7 @@ def setup_logging():
         console_formatter = PlainFormatter()
     
     console_handler.setFormatter(console_formatter)
-    root_logger.addHandler(console_handler)
+    handlers.append(console_handler)
     
     # ===== FILE HANDLER (JSON) =====
     if settings.LOG_FILE:
@@ -120,15 +277,11 @@ def setup_logging():
             )
             file_handler.setLevel(logging.INFO)
             file_handler.setFormatter(JSONFormatter())
-            root_logger.addHandler(file_handler)
+            handlers.append(file_handler)
             
-            logging.getLogger(__name__).info(
-                f"[OK] Log file configured: {settings.LOG_FILE}"
-            )
+            avisos.append((logging.INFO, f"[OK] Log file configured: {settings.LOG_FILE}"))
         except Exception as e:
-            logging.getLogger(__name__).warning(
-                f"⚠️  No se pudo crear archivo de log: {str(e)}"
-            )
+            avisos.append((logging.WARNING, f"⚠️  No se pudo crear archivo de log: {str(e)}"))
     
     # ===== ERROR FILE HANDLER (Errores solamente) =====
     error_log = "logs/errors.log"
@@ -140,11 +293,28 @@ def setup_logging():
         )
         error_handler.setLevel(logging.ERROR)
         error_handler.setFormatter(JSONFormatter())
-        root_logger.addHandler(error_handler)
+        handlers.append(error_handler)
     except Exception as e:
-        logging.getLogger(__name__).warning(
-            f"⚠️  No se pudo crear archivo de errores: {str(e)}"
+        avisos.append((logging.WARNING, f"⚠️  No se pudo crear archivo de errores: {str(e)}"))
+    
+    # ===== PIPELINE (cola + listener en segundo plano) =====
+    if settings.LOG_ASYNC:
+        _queue_handler = BoundedQueueHandler(
+            queue.Queue(maxsize=max(0, settings.LOG_QUEUE_MAX_SIZE)),
+            policy=settings.LOG_QUEUE_POLICY,
+            block_timeout=settings.LOG_QUEUE_BLOCK_SECONDS,
         )
+        _listener = _QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        _queue_handler.addFilter(ContextFilter())
+        root_logger.addHandler(_queue_handler)
+    else:
+        for handler in handlers:
+            handler.addFilter(ContextFilter())
+            root_logger.addHandler(handler)
+    
+    for nivel, aviso in avisos:
+        logging.getLogger(__name__).log(nivel, aviso)
     
     # Configurar loggers específicos
     setup_module_loggers()
@@ -164,53 +334,105 @@ def setup_module_loggers():
     logging.getLogger("app").setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
 
 
+# ============ CONTEXTO POR REQUEST ============
+
+# Campos agregados a todos los registros de la request (o tarea) actual. Cada
+# tarea asyncio hereda una copia del contexto; el dict se reemplaza, nunca se
+# modifica en sitio, así que las requests concurrentes no se mezclan.
+_log_context: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+
+def bind_log_context(**campos) -> Token:
+    """
+    Agrega campos al contexto de logging actual
+
+    Returns:
+        Token para restaurar el contexto anterior con reset_log_context
+    """
+    return _log_context.set({**_log_context.get(), **campos})
+
+
+def reset_log_context(token: Token):
+    """Restaura el contexto anterior a bind_log_context"""
+    _log_context.reset(token)
+
+
+def get_log_context() -> Dict[str, Any]:
+    """Campos del contexto de logging actual"""
+    return _log_context.get()
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copia el contexto actual al registro (record.extra_data)
+
+    Se instala en los handlers del logger raíz, así que corre en el hilo que
+    registra (antes de la cola) y aplica también a logging.getLogger().
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        contexto = _log_context.get()
+        if contexto:
+            record.extra_data = {**contexto, **getattr(record, "extra_data", {})}
+        return True
+
+
 class ContextualLogger:
-    """Logger que mantiene contexto a través de la aplicación"""
-    
+    """
+    Logger estructurado con formato diferido
+
+    El mensaje usa argumentos estilo % y los campos estructurados van como
+    kwargs; un campo que es una función sin argumentos se evalúa solo si el
+    registro se emite. Si el nivel descarta el registro no se formatea ni se
+    extrae nada. El contexto (set_context) vive en un ContextVar por request.
+
+        log = get_contextual_logger(__name__)
+        log.info("Nómina calculada para %s", employee_id, empleados=lambda: len(filas))
+    """
+
+    __slots__ = ("logger",)
+
     def __init__(self, name: str):
         self.logger = logging.getLogger(name)
-        self.context = {}
-    
-    def set_context(self, **kwargs):
-        """Establece contexto"""
-        self.context.update(kwargs)
-    
+
+    def set_context(self, **kwargs) -> Token:
+        """Agrega campos al contexto de la request actual (ver bind_log_context)"""
+        return bind_log_context(**kwargs)
+
     def clear_context(self):
-        """Limpia contexto"""
-        self.context.clear()
-    
-    def _log_with_context(self, level: str, message: str, **extra_data):
-        """Log con contexto"""
-        context_data = self.context.copy()
-        context_data.update(extra_data)
-        
-        log_record = logging.LogRecord(
-            name=self.logger.name,
-            level=getattr(logging, level),
-            pathname="",
-            lineno=0,
-            msg=message,
-            args=(),
-            exc_info=None
-        )
-        log_record.extra_data = context_data
-        
-        getattr(self.logger, level.lower())(message)
-    
-    def info(self, message: str, **extra_data):
-        self._log_with_context("INFO", message, **extra_data)
-    
-    def debug(self, message: str, **extra_data):
-        self._log_with_context("DEBUG", message, **extra_data)
-    
-    def warning(self, message: str, **extra_data):
-        self._log_with_context("WARNING", message, **extra_data)
-    
-    def error(self, message: str, **extra_data):
-        self._log_with_context("ERROR", message, **extra_data)
-    
-    def critical(self, message: str, **extra_data):
-        self._log_with_context("CRITICAL", message, **extra_data)
+        """Vacía el contexto de la request actual"""
+        _log_context.set({})
+
+    def is_enabled_for(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def _log(self, level: int, message: str, args: tuple, exc_info, campos: Dict[str, Any]):
+        if not self.logger.isEnabledFor(level):
+            return
+        extra_data = {clave: valor() if callable(valor) else valor for clave, valor in campos.items()}
+        # stacklevel=3: módulo, función y línea de quien llamó a info()/error()/...
+        self.logger.log(level, message, *args, exc_info=exc_info, extra={"extra_data": extra_data}, stacklevel=3)
+
+    def log(self, level: int, message: str, *args, exc_info=None, **campos):
+        self._log(level, message, args, exc_info, campos)
+
+    def debug(self, message: str, *args, exc_info=None, **campos):
+        self._log(logging.DEBUG, message, args, exc_info, campos)
+
+    def info(self, message: str, *args, exc_info=None, **campos):
+        self._log(logging.INFO, message, args, exc_info, campos)
+
+    def warning(self, message: str, *args, exc_info=None, **campos):
+        self._log(logging.WARNING, message, args, exc_info, campos)
+
+    def error(self, message: str, *args, exc_info=None, **campos):
+        self._log(logging.ERROR, message, args, exc_info, campos)
+
+    def exception(self, message: str, *args, **campos):
+        self._log(logging.ERROR, message, args, True, campos)
+
+    def critical(self, message: str, *args, exc_info=None, **campos):
+        self._log(logging.CRITICAL, message, args, exc_info, campos)
 
 
 # Instancia global para uso
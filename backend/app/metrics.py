@@ -0,0 +1,260 @@
+"""
+📈 MÉTRICAS EN PROCESO
+Contadores e histogramas expuestos en /metrics con el formato de texto de Prometheus
+
+Cada métrica guarda una celda por hilo (dict etiquetas -> valor) y cada hilo
+solo escribe la suya, así que registrar una observación no toma locks. Al
+leer /metrics se suman las celdas de todos los hilos. Los valores que ya
+llevan otros componentes (cachés, rate limiter) se exponen con
+register_collector, leyéndolos en el momento de la consulta.
+
+    requests = registry.counter("app_requests_total", "Requests", ("route",))
+    requests.inc("/api/x")
+"""
+
+import bisect
+import functools
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Media type del formato de texto (la respuesta agrega charset=utf-8)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Límites (segundos) por defecto de los histogramas de latencia
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (sufijo, etiquetas, valor) de una muestra
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class _ThreadCells:
+    """Una celda (dict) por hilo; el lock solo se toma al aparecer un hilo nuevo"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._cells: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def cell(self) -> Dict:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = {}
+            with self._lock:
+                self._cells.append(cell)
+            self._local.cell = cell
+            return cell
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            cells = list(self._cells)
+        return [cell.copy() for cell in cells]
+
+
+class Counter:
+    """Contador monótono con etiquetas"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._cells = _ThreadCells()
+
+    def inc(self, *labels: str, amount: float = 1):
+        cell = self._cells.cell()
+        cell[labels] = cell.get(labels, 0) + amount
+
+    def samples(self) -> List[Sample]:
+        totals: Dict[Tuple, float] = {}
+        for cell in self._cells.snapshot():
+            for labels, value in cell.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return [("", dict(zip(self.labelnames, labels)), value) for labels, value in sorted(totals.items())]
+
+
+class Histogram:
+    """Histograma con límites fijos (le acumulado, _sum y _count)"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._cells = _ThreadCells()
+
+    def observe(self, value: float, *labels: str):
+        cell = self._cells.cell()
+        state = cell.get(labels)
+        if state is None:
+            # Cuenta por límite, +Inf y, al final, la suma
+            state = cell[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def samples(self) -> List[Sample]:
+        totals: Dict[Tuple, List] = {}
+        for cell in self._cells.snapshot():
+            for labels, state in cell.items():
+                state = list(state)
+                current = totals.get(labels)
+                totals[labels] = state if current is None else [a + b for a, b in zip(current, state)]
+
+        samples = []
+        for labels, state in sorted(totals.items()):
+            base = dict(zip(self.labelnames, labels))
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets + (float("inf"),), state):
+                acumulado += cuenta
+                samples.append(("_bucket", {**base, "le": _format_value(limite)}, acumulado))
+            samples.append(("_sum", base, state[-1]))
+            samples.append(("_count", base, acumulado))
+        return samples
+
+
+class _Collector:
+    """Métrica cuyo valor se lee al consultar /metrics"""
+
+    def __init__(self, name: str, documentation: str, type: str, labelnames: Sequence[str], collect: Callable):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+
+    def samples(self) -> List[Sample]:
+        values = self._collect()
+        if values is None:
+            values = {}
+        elif not isinstance(values, dict):
+            values = {(): values}
+        return [("", dict(zip(self.labelnames, labels)), value) for labels, value in sorted(values.items())]
+
+
+class MetricsRegistry:
+    """Registro de métricas del proceso"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrica duplicada: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], Any],
+        type: str = "gauge",
+        labelnames: Sequence[str] = ()
+    ):
+        """
+        Registra una métrica calculada al consultar /metrics
+
+        Args:
+            name: Nombre de la métrica
+            documentation: Texto de HELP
+            collect: Función que devuelve un número o {tupla de etiquetas: número}
+            type: gauge o counter
+            labelnames: Nombres de las etiquetas de las tuplas
+        """
+        self._register(_Collector(name, documentation, type, labelnames, collect))
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus 0.0.4"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                # Un colector que falla no debe tumbar /metrics completo
+                logger.warning("[METRICS] Error leyendo %s: %s", metric.name, e)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in samples:
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def timed(histogram: Histogram, errors: Optional[Counter], *labels: str):
+    """
+    Decorador que observa la duración de cada llamada en histogram y cuenta
+    en errors (si se indica) las que terminan con excepción
+    """
+    def decorador(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                if errors is not None:
+                    errors.inc(*labels)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - inicio, *labels)
+        return envoltura
+    return decorador
+
+
+# Registro global del proceso
+registry = MetricsRegistry()
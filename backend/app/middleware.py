@@ -1,188 +1,332 @@
 """
 🛡️ MIDDLEWARE DE SEGURIDAD AVANZADO
 Protección contra ataques comunes y logging de seguridad
+
+Middlewares ASGI puros: cada capa envuelve send() en lugar de crear una tarea
+y un stream intermedio por request como BaseHTTPMiddleware.
 """
 
-from fastapi import Request, status
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.database.tracing import FIREBASE_TRACE_HEADER, FirebaseTrace, end_trace, start_trace
+from app.logging_config import bind_log_context, get_contextual_logger, reset_log_context
+from app.metrics import registry
+from app.rate_limit import RateLimiter, build_rate_limiter
+from app.security_enhanced import uid_from_authorization
 from datetime import datetime
 import logging
+import math
 import time
 import uuid
-from typing import Callable
+from typing import Iterable, List, Tuple
 
 logger = logging.getLogger(__name__)
+request_logger = get_contextual_logger(__name__)
+
+
+def _set_headers(message: Message, headers: Iterable[Tuple[bytes, bytes]]):
+    """Fija headers en un mensaje http.response.start reemplazando los existentes"""
+    headers = list(headers)
+    names = {name for name, _ in headers}
+    raw = [(k, v) for k, v in message.get("headers", []) if k.lower() not in names]
+    raw.extend(headers)
+    message["headers"] = raw
+
+
+# Duración por plantilla de ruta (no por path, para acotar las series)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Duración de las requests HTTP hasta el inicio de la respuesta",
+    ("method", "route", "status"),
+)
+
 
+def _route_template(scope: Scope) -> str:
+    """Plantilla de la ruta resuelta por el router ("/api/payroll/batch/{quincena}")"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+
+def _client_ip(scope: Scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class SecurityHeadersMiddleware:
     """
     Middleware que agrega headers de seguridad HTTP
     Protege contra vulnerabilidades comunes
     """
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> any:
-        response = await call_next(request)
-        
+
+    HEADERS: List[Tuple[bytes, bytes]] = [
         # Headers de seguridad estándar
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Content-Security-Policy"] = "default-src 'self'; script-src 'self' 'unsafe-inline'"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        
+        (b"x-content-type-options", b"nosniff"),
+        (b"x-frame-options", b"DENY"),
+        (b"x-xss-protection", b"1; mode=block"),
+        (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+        (b"content-security-policy", b"default-src 'self'; script-src 'self' 'unsafe-inline'"),
+        (b"referrer-policy", b"strict-origin-when-cross-origin"),
+        (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
         # Header personalizado
-        response.headers["X-Powered-By"] = "Axyra-Nomina/2.1.0"
-        
-        return response
+        (b"x-powered-by", b"Axyra-Nomina/2.1.0"),
+    ]
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                _set_headers(message, self.HEADERS)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+class RequestLoggingMiddleware:
     """
     Middleware que registra todas las requests con detalles de seguridad
     """
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> any:
-        # Generar ID único para la request
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Generar ID único para la request (visible como request.state.request_id)
         request_id = str(uuid.uuid4())[:8]
-        request.state.request_id = request_id
-        
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        # Todos los logs de la request llevan su request_id
+        token = bind_log_context(request_id=request_id)
+
         # Información de la request
         start_time = time.time()
-        
-        # No loguear headers sensibles
-        safe_headers = {
-            k: v for k, v in request.headers.items()
-            if k.lower() not in ['authorization', 'x-api-key', 'cookie']
-        }
-        
-        logger.info(
-            f"📨 REQUEST [{request_id}] {request.method} {request.url.path}",
-            extra={
-                "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "client": request.client.host if request.client else "unknown",
-                "user_agent": request.headers.get("user-agent", "unknown")[:100],
-            }
+        method = scope["method"]
+        path = scope["path"]
+
+        # Los campos se extraen solo si el registro se emite
+        request_logger.info(
+            "📨 REQUEST [%s] %s %s", request_id, method, path,
+            method=method,
+            path=path,
+            client=lambda: _client_ip(scope),
+            user_agent=lambda: Headers(scope=scope).get("user-agent", "unknown")[:100],
         )
-        
+
+        async def send_with_logging(message: Message):
+            if message["type"] == "http.response.start":
+                process_time = time.time() - start_time
+                status_code = message["status"]
+
+                http_request_duration.observe(process_time, method, _route_template(scope), str(status_code))
+
+                # Log de respuesta
+                request_logger.log(
+                    logging.WARNING if status_code >= 400 else logging.INFO,
+                    "✅ RESPONSE [%s] %s (%.2fs)", request_id, status_code, process_time,
+                    status_code=status_code,
+                    process_time=process_time,
+                )
+
+                # Agregar header con ID de request
+                _set_headers(message, [
+                    (b"x-request-id", request_id.encode("latin-1")),
+                    (b"x-process-time", str(process_time).encode("latin-1")),
+                ])
+            await send(message)
+
         try:
-            response = await call_next(request)
-            
-            process_time = time.time() - start_time
-            
-            # Log de respuesta
-            log_level = "warning" if response.status_code >= 400 else "info"
-            logger_func = getattr(logger, log_level)
-            
-            logger_func(
-                f"✅ RESPONSE [{request_id}] {response.status_code} ({process_time:.2f}s)",
-                extra={
-                    "request_id": request_id,
-                    "status_code": response.status_code,
-                    "process_time": process_time,
-                }
-            )
-            
-            # Agregar header con ID de request
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            return response
-            
+            await self.app(scope, receive, send_with_logging)
         except Exception as e:
             process_time = time.time() - start_time
-            logger.error(
-                f"❌ ERROR [{request_id}] {str(e)} ({process_time:.2f}s)",
-                extra={
-                    "request_id": request_id,
-                    "error": str(e),
-                    "process_time": process_time,
-                },
-                exc_info=True
+            http_request_duration.observe(process_time, method, _route_template(scope), "500")
+            request_logger.error(
+                "❌ ERROR [%s] %s (%.2fs)", request_id, e, process_time,
+                exc_info=True,
+                error=lambda: str(e),
+                process_time=process_time,
             )
             raise
+        finally:
+            reset_log_context(token)
+
+
+firebase_trace_warnings = registry.counter(
+    "firebase_trace_warnings_total",
+    "Requests con lecturas repetidas o por encima del presupuesto de llamadas a Firebase",
+    ("kind",),
+)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class FirebaseTraceMiddleware:
     """
-    Middleware para rate limiting por IP
+    Traza las llamadas a Firebase de cada request (ver app.database.tracing)
+
+    Con header=True agrega X-Firebase-Trace con el resumen de las llamadas
+    hechas hasta el inicio de la respuesta. Al terminar la request avisa si
+    una misma ruta se leyó más de repeat_threshold veces (posible N+1) o si
+    el total de llamadas superó call_budget.
     """
-    
-    def __init__(self, app, requests_per_minute: int = 100):
-        super().__init__(app)
-        self.requests_per_minute = requests_per_minute
-        self.requests = {}  # {ip: [timestamps]}
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> any:
-        client_ip = request.client.host if request.client else "unknown"
-        current_time = time.time()
-        minute_ago = current_time - 60
-        
-        # Inicializar lista si no existe
-        if client_ip not in self.requests:
-            self.requests[client_ip] = []
-        
-        # Limpiar requests antiguas (más de 1 minuto)
-        self.requests[client_ip] = [
-            ts for ts in self.requests[client_ip]
-            if ts > minute_ago
-        ]
-        
+
+    def __init__(self, app: ASGIApp, repeat_threshold: int = 3, call_budget: int = 50, header: bool = False):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+        self.call_budget = call_budget
+        self.header_name = FIREBASE_TRACE_HEADER.lower().encode("latin-1") if header else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = FirebaseTrace()
+        token = start_trace(trace)
+
+        async def send_with_trace(message: Message):
+            if message["type"] == "http.response.start" and self.header_name:
+                _set_headers(message, [(self.header_name, trace.header_value().encode("latin-1"))])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            end_trace(token)
+            self._check(scope, trace)
+
+    def _check(self, scope: Scope, trace: FirebaseTrace):
+        if not trace.calls:
+            return
+        route = _route_template(scope)
+
+        for target, veces in trace.repeated_reads(self.repeat_threshold).items():
+            firebase_trace_warnings.inc("repeated_read")
+            logger.warning(
+                "⚠️  Posible N+1: %s %s leyó %s veces %s",
+                scope["method"], route, veces, target,
+            )
+
+        if len(trace.calls) > self.call_budget:
+            firebase_trace_warnings.inc("call_budget")
+            summary = trace.summary()
+            logger.warning(
+                "⚠️  %s %s hizo %s llamadas a Firebase (presupuesto %s): %s lecturas, %s escrituras, %s bytes, %sms",
+                scope["method"], route, summary["calls"], self.call_budget,
+                summary["reads"], summary["writes"], summary["bytes"], summary["ms"],
+            )
+
+
+class RateLimitMiddleware:
+    """
+    Middleware para rate limiting por IP, usuario (uid del JWT) y ruta
+    """
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter = None):
+        self.app = app
+        self.limiter = limiter or build_rate_limiter()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client_ip = _client_ip(scope)
+        uid = uid_from_authorization(Headers(scope=scope).get("authorization"))
+
+        if self.limiter.blocking:
+            # SQLite puede esperar el lock de otro worker: fuera del event loop
+            result = await run_in_threadpool(self.limiter.check, scope["method"], scope["path"], client_ip, uid)
+        else:
+            result = self.limiter.check(scope["method"], scope["path"], client_ip, uid)
+
         # Verificar límite
-        if len(self.requests[client_ip]) >= self.requests_per_minute:
-            logger.warning(f"⚠️  Rate limit excedido para IP: {client_ip}")
-            return JSONResponse(
+        if not result.allowed:
+            retry_after = max(1, math.ceil(result.retry_after))
+            logger.warning("⚠️  Rate limit excedido para %s", 'usuario ' + uid if uid else 'IP: ' + client_ip)
+            response = JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
-                    "detail": "Demasiadas solicitudes. Intenta de nuevo en un minuto.",
-                    "retry_after": 60
+                    "detail": "Demasiadas solicitudes. Intenta de nuevo más tarde.",
+                    "retry_after": retry_after
+                },
+                headers={
+                    "Retry-After": str(retry_after),
+                    "X-RateLimit-Limit": str(result.limit),
+                    "X-RateLimit-Remaining": "0",
                 }
             )
-        
-        # Agregar timestamp actual
-        self.requests[client_ip].append(current_time)
-        
-        response = await call_next(request)
-        response.headers["X-RateLimit-Limit"] = str(self.requests_per_minute)
-        response.headers["X-RateLimit-Remaining"] = str(
-            self.requests_per_minute - len(self.requests[client_ip])
-        )
-        
-        return response
+            await response(scope, receive, send)
+            return
 
+        limit_headers = [
+            (b"x-ratelimit-limit", str(result.limit).encode("latin-1")),
+            (b"x-ratelimit-remaining", str(result.remaining).encode("latin-1")),
+        ]
+
+        async def send_with_limits(message: Message):
+            if message["type"] == "http.response.start":
+                _set_headers(message, limit_headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_limits)
 
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
+
+class ErrorHandlingMiddleware:
     """
     Middleware para manejo centralizado de errores
     """
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> any:
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_tracking(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
         try:
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, send_tracking)
         except Exception as exc:
-            request_id = getattr(request.state, "request_id", "unknown")
-            
+            # Si la respuesta ya empezó no se puede reemplazar
+            if response_started:
+                raise
+
+            request_id = scope.get("state", {}).get("request_id", "unknown")
+
             logger.error(
-                f"❌ Excepción no manejada [{request_id}]: {str(exc)}",
+                "❌ Excepción no manejada [%s]: %s", request_id, exc,
                 extra={"request_id": request_id},
                 exc_info=True
             )
-            
+
             # En desarrollo, mostrar detalles
             # En producción, mostrar mensaje genérico
             from app.config.settings import settings
-            
+
             if settings.DEBUG:
                 detail = str(exc)
             else:
                 detail = "Error interno del servidor. Contacta a soporte."
-            
-            return JSONResponse(
+
+            response = JSONResponse(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 content={
                     "error": "internal_server_error",
@@ -191,54 +335,67 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
                     "timestamp": datetime.utcnow().isoformat()
                 }
             )
+            await response(scope, receive, send)
 
 
-class CORSValidationMiddleware(BaseHTTPMiddleware):
+class CORSValidationMiddleware:
     """
     Middleware para validar y loguear CORS
     """
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> any:
-        origin = request.headers.get("origin")
-        
-        if origin:
-            logger.debug(f"🌐 CORS request from: {origin}")
-        
-        response = await call_next(request)
-        
-        if origin:
-            cors_origin = response.headers.get("access-control-allow-origin")
-            if cors_origin:
-                logger.debug(f"✅ CORS permitido: {cors_origin}")
-            else:
-                logger.warning(f"⚠️  CORS bloqueado para: {origin}")
-        
-        return response
 
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-class IPWhitelistMiddleware(BaseHTTPMiddleware):
+        origin = Headers(scope=scope).get("origin")
+        if not origin:
+            await self.app(scope, receive, send)
+            return
+
+        logger.debug("🌐 CORS request from: %s", origin)
+
+        async def send_checking_cors(message: Message):
+            if message["type"] == "http.response.start":
+                cors_origin = Headers(raw=message.get("headers", [])).get("access-control-allow-origin")
+                if cors_origin:
+                    logger.debug("✅ CORS permitido: %s", cors_origin)
+                else:
+                    logger.warning("⚠️  CORS bloqueado para: %s", origin)
+            await send(message)
+
+        await self.app(scope, receive, send_checking_cors)
+
+
+class IPWhitelistMiddleware:
     """
     Middleware para whitelist de IPs (opcional)
     """
-    
-    def __init__(self, app, whitelist: list = None):
-        super().__init__(app)
+
+    def __init__(self, app: ASGIApp, whitelist: list = None):
+        self.app = app
         self.whitelist = whitelist or []
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> any:
-        if not self.whitelist:
-            return await call_next(request)
-        
-        client_ip = request.client.host if request.client else "unknown"
-        
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.whitelist:
+            await self.app(scope, receive, send)
+            return
+
+        client_ip = _client_ip(scope)
+
         if client_ip not in self.whitelist:
-            logger.warning(f"⚠️  IP no autorizada: {client_ip}")
+            logger.warning("⚠️  IP no autorizada: %s", client_ip)
             # En development, permitir; en production, bloquear
             from app.config.settings import settings
             if settings.is_production:
-                return JSONResponse(
+                response = JSONResponse(
                     status_code=status.HTTP_403_FORBIDDEN,
                     content={"detail": "IP no autorizada"}
                 )
-        
-        return await call_next(request)
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
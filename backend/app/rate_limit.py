@@ -0,0 +1,384 @@
+"""
+🚦 RATE LIMITING POR TOKEN BUCKET
+Límites por IP, por usuario (uid del JWT) y por ruta con backends intercambiables
+
+Cada clave guarda solo (tokens, actualizado, lleno_en): la comprobación es O(1)
+y una clave inactiva hasta rellenar su cubeta equivale a una clave inexistente,
+así que se puede desalojar sin perder información.
+"""
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.config.settings import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+rate_limit_rejections = registry.counter(
+    "rate_limit_rejections_total",
+    "Requests rechazadas por el rate limiter, por regla",
+    ("rule",),
+)
+rate_limit_backend_failures = registry.counter(
+    "rate_limit_backend_failures_total",
+    "Consultas al backend del rate limiter que fallaron y se dejaron pasar",
+)
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """Límite de requests: capacity requests por cada period segundos"""
+    name: str
+    capacity: int
+    period: float
+    method: Optional[str] = None
+    path_prefix: Optional[str] = None
+
+    @property
+    def refill_rate(self) -> float:
+        """Tokens por segundo"""
+        return self.capacity / self.period
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.method and self.method != method:
+            return False
+        return self.path_prefix is None or path.startswith(self.path_prefix)
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    """Resultado de consumir un token"""
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float
+
+
+def _consumir(tokens: float, updated: float, rule: RateLimitRule, now: float) -> Tuple[bool, float]:
+    """Recarga la cubeta hasta now e intenta tomar un token; devuelve (permitido, tokens)"""
+    tokens = min(rule.capacity, tokens + (now - updated) * rule.refill_rate)
+    if tokens >= 1:
+        return True, tokens - 1
+    return False, tokens
+
+
+def _lleno_en(tokens: float, rule: RateLimitRule, now: float) -> float:
+    """Instante en que la cubeta vuelve a estar llena (y la clave se puede desalojar)"""
+    return now + (rule.capacity - tokens) / rule.refill_rate
+
+
+class RateLimitBackend:
+    """Almacén de cubetas; las implementaciones deben ser seguras entre hilos"""
+
+    # True si consume hace I/O y no debe llamarse desde el event loop
+    blocking = False
+
+    def consume(self, key: str, rule: RateLimitRule) -> Tuple[bool, float]:
+        """
+        Consume un token de la cubeta de key
+
+        Returns:
+            Tupla (permitido, tokens restantes)
+        """
+        raise NotImplementedError
+
+    def consume_many(self, checks: List[Tuple[str, RateLimitRule]]) -> List[Tuple[bool, float]]:
+        """
+        Consume un token de cada cubeta en orden, deteniéndose en la primera
+        que rechaza (las siguientes no se tocan)
+
+        Returns:
+            Lista de (permitido, tokens restantes) de las cubetas consultadas
+        """
+        results = []
+        for key, rule in checks:
+            allowed, tokens = self.consume(key, rule)
+            results.append((allowed, tokens))
+            if not allowed:
+                break
+        return results
+
+    def evict_idle(self) -> int:
+        """Elimina las cubetas que ya se rellenaron; devuelve cuántas"""
+        raise NotImplementedError
+
+    def size(self) -> int:
+        """Cantidad de claves almacenadas"""
+        raise NotImplementedError
+
+
+class MemoryBackend(RateLimitBackend):
+    """
+    Cubetas en memoria del proceso, repartidas en shards con lock propio
+
+    El desalojo es incremental: cada sweep_interval / shards segundos se barre
+    un único shard, de modo que ninguna request paga un barrido completo.
+    """
+
+    def __init__(self, shards: int = 16, sweep_interval: float = 30.0):
+        self._shards: List[Dict[str, List[float]]] = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._sweep_step = sweep_interval / shards
+        self._next_sweep = time.monotonic() + self._sweep_step
+        self._next_shard = 0
+        self._sweep_lock = threading.Lock()
+
+    def _shard(self, key: str) -> int:
+        return hash(key) % len(self._shards)
+
+    def consume(self, key: str, rule: RateLimitRule) -> Tuple[bool, float]:
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep_next(now)
+
+        i = self._shard(key)
+        shard = self._shards[i]
+        with self._locks[i]:
+            bucket = shard.get(key)
+            if bucket is None:
+                allowed, tokens = True, rule.capacity - 1.0
+            else:
+                allowed, tokens = _consumir(bucket[0], bucket[1], rule, now)
+            shard[key] = [tokens, now, _lleno_en(tokens, rule, now)]
+        return allowed, tokens
+
+    def _sweep_next(self, now: float):
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            i = self._next_shard
+            self._next_shard = (i + 1) % len(self._shards)
+            self._next_sweep = now + self._sweep_step
+            self._evict_shard(i, now)
+        finally:
+            self._sweep_lock.release()
+
+    def _evict_shard(self, i: int, now: float) -> int:
+        shard = self._shards[i]
+        with self._locks[i]:
+            idle = [key for key, bucket in shard.items() if bucket[2] <= now]
+            for key in idle:
+                del shard[key]
+        return len(idle)
+
+    def evict_idle(self) -> int:
+        now = time.monotonic()
+        return sum(self._evict_shard(i, now) for i in range(len(self._shards)))
+
+    def size(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+class SQLiteBackend(RateLimitBackend):
+    """
+    Cubetas en un archivo SQLite local compartido por los workers de uvicorn
+
+    Todas las cubetas de una request se consumen en una única transacción
+    IMMEDIATE, así que los procesos se serializan por el lock de escritura del
+    archivo (modo WAL). Si el lock no se obtiene en busy_timeout segundos la
+    request se deja pasar (fail open) en lugar de retener al worker.
+    """
+
+    blocking = True
+
+    def __init__(self, path: Optional[str] = None, sweep_interval: float = 30.0, busy_timeout: float = 0.05):
+        self.path = path or os.path.join(tempfile.gettempdir(), "axyra_rate_limit.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_full_at ON buckets (full_at)")
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+
+    def consume(self, key: str, rule: RateLimitRule) -> Tuple[bool, float]:
+        return self.consume_many([(key, rule)])[0]
+
+    def consume_many(self, checks: List[Tuple[str, RateLimitRule]]) -> List[Tuple[bool, float]]:
+        # Los procesos no comparten reloj monotónico: se usa tiempo de pared
+        now = time.time()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self._sweep_interval
+            try:
+                self.evict_idle()
+            except sqlite3.OperationalError as e:
+                logger.debug("[SECURITY] Rate limit sweep skipped: %s", e)
+
+        with self._lock:
+            try:
+                return self._consume_many(checks, now)
+            except sqlite3.OperationalError as e:
+                # Lock ocupado por otro worker: mejor dejar pasar que bloquear
+                rate_limit_backend_failures.inc()
+                logger.debug("[SECURITY] Rate limit backend busy, failing open: %s", e)
+                return [(True, rule.capacity - 1.0) for _, rule in checks]
+
+    def _consume_many(self, checks: List[Tuple[str, RateLimitRule]], now: float) -> List[Tuple[bool, float]]:
+        cur = self._conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            results = []
+            for key, rule in checks:
+                row = cur.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    allowed, tokens = True, rule.capacity - 1.0
+                else:
+                    allowed, tokens = _consumir(row[0], row[1], rule, now)
+                cur.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                    (key, tokens, now, _lleno_en(tokens, rule, now))
+                )
+                results.append((allowed, tokens))
+                if not allowed:
+                    break
+            cur.execute("COMMIT")
+        except Exception:
+            if self._conn.in_transaction:
+                cur.execute("ROLLBACK")
+            raise
+        return results
+
+    def evict_idle(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM buckets WHERE full_at <= ?", (time.time(),))
+            return cur.rowcount
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+
+def parse_route_rules(spec: str) -> List[RateLimitRule]:
+    """
+    Interpreta la configuración de límites por ruta
+
+    Args:
+        spec: Reglas separadas por comas con formato "[METODO] /prefijo=N/SEGUNDOS",
+            p. ej. "POST /api/auth/login=10/60, /api/payroll=60/60"
+
+    Returns:
+        Lista de reglas en el orden dado
+
+    Raises:
+        ValueError: Si alguna regla está mal formada
+    """
+    rules = []
+    for raw in (spec or "").split(","):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            target, limit = raw.rsplit("=", 1)
+            capacity, period = limit.split("/")
+            parts = target.split()
+            method, prefix = (parts[0].upper(), parts[1]) if len(parts) == 2 else (None, parts[0])
+            rule = RateLimitRule(
+                name=raw.split("=")[0].strip(),
+                capacity=int(capacity),
+                period=float(period),
+                method=method,
+                path_prefix=prefix,
+            )
+        except (ValueError, IndexError):
+            raise ValueError(f"Regla de rate limit inválida: '{raw}'")
+        if rule.capacity < 1 or rule.period <= 0:
+            raise ValueError(f"Regla de rate limit inválida: '{raw}'")
+        rules.append(rule)
+    return rules
+
+
+class RateLimiter:
+    """
+    Aplica el límite global (por IP o por usuario autenticado) y los límites
+    de las rutas que coincidan
+    """
+
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        anonymous_rule: RateLimitRule,
+        user_rule: RateLimitRule,
+        route_rules: List[RateLimitRule] = None
+    ):
+        self.backend = backend
+        self.anonymous_rule = anonymous_rule
+        self.user_rule = user_rule
+        self.route_rules = route_rules or []
+        self.rejected = 0
+
+    @property
+    def blocking(self) -> bool:
+        """True si check hace I/O (el middleware lo llama fuera del event loop)"""
+        return self.backend.blocking
+
+    def check(self, method: str, path: str, client_ip: str, uid: Optional[str] = None) -> RateLimitResult:
+        """
+        Consume un token para la request; las reglas de ruta se evalúan primero
+        para no gastar cupo global en requests que la ruta va a rechazar
+
+        Returns:
+            Resultado de la regla más restrictiva
+        """
+        identity = f"user:{uid}" if uid else f"ip:{client_ip}"
+        checks = [(f"route:{rule.name}:{identity}", rule) for rule in self.route_rules if rule.matches(method, path)]
+        checks.append((identity, self.user_rule if uid else self.anonymous_rule))
+
+        result = None
+        for (key, rule), (allowed, tokens) in zip(checks, self.backend.consume_many(checks)):
+            current = RateLimitResult(
+                allowed=allowed,
+                limit=rule.capacity,
+                remaining=int(tokens),
+                retry_after=0.0 if allowed else (1 - tokens) / rule.refill_rate,
+            )
+            if not allowed:
+                self.rejected += 1
+                rate_limit_rejections.inc(rule.name)
+                return current
+            if result is None or current.remaining < result.remaining:
+                result = current
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores del limitador"""
+        return {"keys": self.backend.size(), "rejected": self.rejected}
+
+
+def build_rate_limiter() -> RateLimiter:
+    """
+    Construye el limitador a partir de la configuración
+
+    Returns:
+        RateLimiter con el backend indicado en RATE_LIMIT_BACKEND
+    """
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        backend = SQLiteBackend(
+            settings.RATE_LIMIT_SQLITE_PATH,
+            settings.RATE_LIMIT_SWEEP_SECONDS,
+            settings.RATE_LIMIT_SQLITE_TIMEOUT,
+        )
+    elif settings.RATE_LIMIT_BACKEND == "memory":
+        backend = MemoryBackend(settings.RATE_LIMIT_SHARDS, settings.RATE_LIMIT_SWEEP_SECONDS)
+    else:
+        raise ValueError(f"RATE_LIMIT_BACKEND desconocido: {settings.RATE_LIMIT_BACKEND}")
+
+    window = settings.RATE_LIMIT_WINDOW_SECONDS
+    limiter = RateLimiter(
+        backend,
+        anonymous_rule=RateLimitRule("ip", settings.RATE_LIMIT_REQUESTS, window),
+        user_rule=RateLimitRule("user", settings.RATE_LIMIT_USER_REQUESTS, window),
+        route_rules=parse_route_rules(settings.RATE_LIMIT_ROUTES),
+    )
+    logger.info("[SECURITY] Rate limiter ready (%s backend)", settings.RATE_LIMIT_BACKEND)
+    return limiter
@@ -0,0 +1,185 @@
+"""
+🔒 REVOCACIÓN DE ACCESS TOKENS
+Tokens revocados en logout, compartidos entre workers
+
+Cada revocación se guarda con el 'exp' del token: pasado ese instante el JWT
+ya se rechaza por expirado, así que la entrada se puede borrar. El backend
+decide hasta dónde llega la revocación:
+
+    memory    solo el proceso actual (un único worker o pruebas)
+    sqlite    todos los workers del mismo host (archivo local en modo WAL)
+    firebase  todas las instancias (nodo revoked_tokens de la base de datos)
+"""
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Nodo de la base de datos con las revocaciones (backend firebase)
+REVOKED_TOKENS_PATH = "revoked_tokens"
+
+
+class RevocationStore:
+    """Almacén de revocaciones; las implementaciones deben ser seguras entre hilos"""
+
+    def revoke(self, digest: bytes, exp: float):
+        """Revoca el token con ese digest hasta exp (epoch en segundos)"""
+        raise NotImplementedError
+
+    def is_revoked(self, digest: bytes) -> bool:
+        raise NotImplementedError
+
+    def size(self) -> Optional[int]:
+        """Revocaciones guardadas, o None si contarlas requiere I/O remoto"""
+        raise NotImplementedError
+
+
+class MemoryRevocationStore(RevocationStore):
+    """Revocaciones en memoria del proceso (no sirve con varios workers)"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._revoked: Dict[bytes, float] = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, digest: bytes, exp: float):
+        with self._lock:
+            now = time.time()
+            if len(self._revoked) >= self.max_entries:
+                self._revoked = {d: e for d, e in self._revoked.items() if e > now}
+            self._revoked[digest] = exp
+
+    def is_revoked(self, digest: bytes) -> bool:
+        with self._lock:
+            exp = self._revoked.get(digest)
+            if exp is None:
+                return False
+            if exp <= time.time():
+                del self._revoked[digest]
+                return False
+            return True
+
+    def size(self) -> Optional[int]:
+        with self._lock:
+            return len(self._revoked)
+
+
+class SQLiteRevocationStore(RevocationStore):
+    """
+    Revocaciones en un archivo SQLite local compartido por los workers de uvicorn
+
+    Las consultas son lecturas por clave primaria (en WAL no esperan a los
+    escritores); las expiradas se borran al revocar cada sweep_interval.
+    """
+
+    def __init__(self, path: Optional[str] = None, sweep_interval: float = 300.0):
+        self.path = path or os.path.join(tempfile.gettempdir(), "axyra_revoked_tokens.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS revoked (digest BLOB PRIMARY KEY, exp REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS revoked_exp ON revoked (exp)")
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+
+    def revoke(self, digest: bytes, exp: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO revoked (digest, exp) VALUES (?, ?)", (digest, exp))
+            if now >= self._next_sweep:
+                self._next_sweep = now + self._sweep_interval
+                self._conn.execute("DELETE FROM revoked WHERE exp <= ?", (now,))
+
+    def is_revoked(self, digest: bytes) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT exp FROM revoked WHERE digest = ?", (digest,)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def size(self) -> Optional[int]:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM revoked").fetchone()[0]
+
+
+class FirebaseRevocationStore(RevocationStore):
+    """
+    Revocaciones en la base de datos (revoked_tokens/{digest hex} = {"exp": ...})
+
+    Cada consulta es una lectura a Firebase; las revocaciones ya vistas se
+    recuerdan en memoria porque no se pueden deshacer. Requiere '.indexOn'
+    sobre 'exp' para borrar las expiradas.
+    """
+
+    def __init__(self, sweep_interval: float = 3600.0):
+        self._known = MemoryRevocationStore()
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+
+    @staticmethod
+    def _firebase():
+        from app.database.firebase import get_firebase
+        return get_firebase()
+
+    def revoke(self, digest: bytes, exp: float):
+        firebase = self._firebase()
+        firebase.write_data(f"{REVOKED_TOKENS_PATH}/{digest.hex()}", {"exp": exp})
+        self._known.revoke(digest, exp)
+
+        now = time.time()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self._sweep_interval
+            try:
+                expired = firebase.query(REVOKED_TOKENS_PATH, "exp", end_at=now)
+                if expired:
+                    firebase.update_data(REVOKED_TOKENS_PATH, {key: None for key in expired})
+            except Exception as e:
+                logger.warning("[SECURITY] Could not purge expired revocations: %s", e)
+
+    def is_revoked(self, digest: bytes) -> bool:
+        if self._known.is_revoked(digest):
+            return True
+        entry = self._firebase().read_data(f"{REVOKED_TOKENS_PATH}/{digest.hex()}")
+        exp = entry.get("exp") if isinstance(entry, dict) else None
+        if not isinstance(exp, (int, float)) or exp <= time.time():
+            return False
+        self._known.revoke(digest, float(exp))
+        return True
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+def build_revocation_store() -> RevocationStore:
+    """
+    Construye el almacén de revocaciones a partir de la configuración
+
+    Returns:
+        RevocationStore del backend indicado en TOKEN_REVOCATION_BACKEND
+
+    Raises:
+        ValueError: Si el backend no existe
+    """
+    backend = settings.TOKEN_REVOCATION_BACKEND
+    if backend == "sqlite":
+        store = SQLiteRevocationStore(settings.TOKEN_REVOCATION_SQLITE_PATH)
+    elif backend == "firebase":
+        store = FirebaseRevocationStore()
+    elif backend == "memory":
+        # Uvicorn toma WEB_CONCURRENCY como cantidad de workers por defecto
+        if int(os.environ.get("WEB_CONCURRENCY") or 1) > 1:
+            raise ValueError("TOKEN_REVOCATION_BACKEND=memory requiere un único worker (WEB_CONCURRENCY > 1)")
+        store = MemoryRevocationStore(settings.TOKEN_CACHE_MAX_ENTRIES or 10000)
+        logger.warning("[SECURITY] Token revocation is per process: run a single worker or use sqlite/firebase")
+    else:
+        raise ValueError(f"TOKEN_REVOCATION_BACKEND desconocido: {backend}")
+    logger.info("[SECURITY] Token revocation ready (%s backend)", backend)
+    return store
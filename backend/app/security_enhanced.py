@@ -4,19 +4,24 @@ Sistema de autenticación y validación profesional
 Integración con Firebase + JWT mejorado
 """
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field, validator
 import hashlib
 import secrets
+import threading
+import time
 from app.config.settings import settings
+from app.revocation import MemoryRevocationStore, RevocationStore, build_revocation_store
 import logging
 
 logger = logging.getLogger(__name__)
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
 class TokenData(BaseModel):
@@ -119,10 +124,10 @@ def create_access_token(
             SecurityConfig.SECRET_KEY,
             algorithm=SecurityConfig.ALGORITHM
         )
-        logger.info(f"✅ Token creado para usuario: {data.get('email')}")
+        logger.info("✅ Token creado para usuario: %s", data.get('email'))
         return encoded_jwt
     except Exception as e:
-        logger.error(f"❌ Error creando token: {str(e)}")
+        logger.error("❌ Error creando token: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error creando token de autenticación"
@@ -160,64 +165,256 @@ def create_refresh_token(user_id: str, client_id: str = None) -> str:
     )
 
 
+class TokenCache:
+    """
+    LRU de access tokens ya verificados, indexada por sha256 del token
+
+    Cada entrada vive hasta el 'exp' del token. La caché es por proceso; los
+    tokens revocados (logout) se guardan en revocations, que según el backend
+    se comparte entre workers (ver app.revocation). Un token en caché que no
+    estaba revocado no se vuelve a consultar en revocations durante
+    revocation_ttl segundos: un logout en este proceso se aplica al instante y
+    uno en otro worker o instancia, a lo sumo tras ese intervalo.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        revocations: Optional[RevocationStore] = None,
+        revocation_ttl: float = 30.0
+    ):
+        self.max_entries = max_entries
+        self.revocation_ttl = revocation_ttl
+        # digest -> [exp, payload, instante hasta el que se sabe no revocado]
+        self._entries: "OrderedDict[bytes, List[Any]]" = OrderedDict()
+        self.revocations = revocations or MemoryRevocationStore(max_entries or 10000)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revocation_checks = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, digest: bytes) -> Optional[Dict[str, Any]]:
+        """Payload verificado del token, o None si no está o ya expiró"""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.time():
+                del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, digest: bytes, payload: Dict[str, Any], checked: bool = False):
+        """
+        Guarda el payload de un token recién verificado
+
+        Args:
+            digest: sha256 del token
+            payload: Claims verificados
+            checked: True si se acaba de comprobar que no está revocado
+        """
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)) or self.max_entries <= 0:
+            return
+        exp = float(exp)
+        not_revoked_until = min(exp, time.time() + self.revocation_ttl) if checked else 0.0
+        with self._lock:
+            self._entries[digest] = [exp, payload, not_revoked_until]
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def revoke(self, digest: bytes, exp: float):
+        """Revoca un token hasta su expiración (se propaga por revocations)"""
+        self.revocations.revoke(digest, exp)
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def is_revoked(self, digest: bytes) -> bool:
+        """
+        True si el token fue revocado
+
+        Solo consulta revocations si el token no está en caché o si pasó
+        revocation_ttl desde la última consulta.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[2] > now:
+                return False
+            self.revocation_checks += 1
+
+        if self.revocations.is_revoked(digest):
+            return True
+
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                entry[2] = min(entry[0], now + self.revocation_ttl)
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "revocation_checks": self.revocation_checks,
+            }
+        stats["revoked"] = self.revocations.size()
+        return stats
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_MAX_ENTRIES,
+    build_revocation_store(),
+    settings.TOKEN_REVOCATION_CHECK_SECONDS,
+)
+
+
+def _decode_access_token(token: str, check_revoked: bool = True) -> Dict[str, Any]:
+    """
+    Decodifica y valida un access token, usando la caché de tokens verificados
+
+    Args:
+        token: Token JWT sin el prefijo Bearer
+        check_revoked: Consultar las revocaciones (puede hacer I/O según el backend)
+
+    Raises:
+        JWTError: Firma inválida o token expirado
+        HTTPException: Token revocado, incompleto o de tipo incorrecto
+    """
+    digest = TokenCache.digest(token)
+    if check_revoked and token_cache.is_revoked(digest):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token revocado"
+        )
+
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(
+        token,
+        SecurityConfig.SECRET_KEY,
+        algorithms=[SecurityConfig.ALGORITHM]
+    )
+
+    # Validaciones básicas
+    uid: str = payload.get("uid")
+    email: str = payload.get("email")
+    token_type = payload.get("type", "access")
+
+    if not uid or not email:
+        logger.warning("❌ Token sin UID o email")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido: datos incompletos"
+        )
+
+    if token_type != "access":
+        logger.warning("❌ Token de tipo incorrecto: %s", token_type)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Tipo de token inválido"
+        )
+
+    token_cache.set(digest, payload, checked=check_revoked)
+    logger.debug("✅ Token verificado para: %s", email)
+    return payload
+
+
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
     """
     Verifica y decodifica un JWT token
     
+    Las sesiones repetidas se resuelven desde la caché de tokens verificados
+    sin volver a comprobar la firma.
+    
     Args:
         credentials: Credenciales HTTP Bearer
         
     Returns:
-        Datos del token decodificado
+        Datos del token decodificado (solo lectura: puede ser compartido)
         
     Raises:
-        HTTPException: Si el token es inválido
+        HTTPException: Si el token es inválido o fue revocado
     """
-    token = credentials.credentials
-    
     try:
-        payload = jwt.decode(
-            token,
-            SecurityConfig.SECRET_KEY,
-            algorithms=[SecurityConfig.ALGORITHM]
-        )
-        
-        # Validaciones básicas
-        uid: str = payload.get("uid")
-        email: str = payload.get("email")
-        token_type = payload.get("type", "access")
-        
-        if not uid or not email:
-            logger.warning("❌ Token sin UID o email")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token inválido: datos incompletos"
-            )
-        
-        if token_type != "access":
-            logger.warning(f"❌ Token de tipo incorrecto: {token_type}")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Tipo de token inválido"
-            )
-        
-        logger.debug(f"✅ Token verificado para: {email}")
-        return payload
+        return _decode_access_token(credentials.credentials)
         
+    except HTTPException:
+        raise
     except JWTError as e:
-        logger.warning(f"❌ Error JWT: {str(e)}")
+        logger.warning("❌ Error JWT: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido o expirado"
         )
     except Exception as e:
-        logger.error(f"❌ Error verificando token: {str(e)}")
+        logger.error("❌ Error verificando token: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Error de autenticación"
         )
 
 
+def revoke_token(token: str):
+    """
+    Revoca un access token (logout) hasta su expiración
+
+    Args:
+        token: Token JWT sin el prefijo Bearer
+    """
+    digest = TokenCache.digest(token)
+    payload = token_cache.get(digest)
+    if payload is None:
+        try:
+            payload = jwt.get_unverified_claims(token)
+        except JWTError:
+            return
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        token_cache.revoke(digest, float(exp))
+
+
+def uid_from_authorization(authorization: Optional[str]) -> Optional[str]:
+    """
+    Obtiene el uid de un header Authorization con un access token válido
+
+    A diferencia de verify_token no lanza excepciones ni registra warnings:
+    se usa fuera de las rutas (p. ej. en el rate limiter) para identificar al
+    usuario cuando el token es válido. Comparte la caché de tokens verificados,
+    así que la dependencia de la ruta no vuelve a verificar la firma. No
+    consulta las revocaciones (corre en el event loop): las rechaza
+    verify_token.
+
+    Args:
+        authorization: Valor del header Authorization ("Bearer <token>")
+
+    Returns:
+        uid del token, o None si falta o no es válido
+    """
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return _decode_access_token(token, check_revoked=False).get("uid")
+    except (JWTError, HTTPException):
+        return None
+
+
 def get_current_user(token_data: Dict = Depends(verify_token)) -> UserContext:
     """
     Obtiene el contexto del usuario actual autenticado
@@ -229,20 +426,42 @@ def get_current_user(token_data: Dict = Depends(verify_token)) -> UserContext:
         Contexto del usuario
     """
     try:
-        return UserContext(
-            uid=token_data.get("uid"),
-            email=token_data.get("email"),
-            client_id=token_data.get("client_id", ""),
+        # uid y email ya fueron validados al verificar el token: se omite la
+        # validación de Pydantic en cada request
+        return UserContext.model_construct(
+            uid=str(token_data["uid"]),
+            email=str(token_data["email"]),
+            client_id=str(token_data.get("client_id") or ""),
             authenticated_at=datetime.utcnow()
         )
     except Exception as e:
-        logger.error(f"❌ Error obteniendo contexto de usuario: {str(e)}")
+        logger.error("❌ Error obteniendo contexto de usuario: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Error obteniendo información del usuario"
         )
 
 
+def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> Optional[UserContext]:
+    """
+    Contexto del usuario si la request trae un Bearer token
+
+    Para rutas que solo exigen autenticación en algunos modos. Un token
+    inválido o revocado sigue siendo 401.
+
+    Args:
+        credentials: Credenciales HTTP Bearer (None si no hay header)
+
+    Returns:
+        Contexto del usuario, o None si no hay token
+    """
+    if credentials is None:
+        return None
+    return get_current_user(verify_token(credentials))
+
+
 def hash_password(password: str) -> str:
     """
     Genera hash seguro de contraseña
@@ -284,7 +503,7 @@ def verify_password(password: str, hash_stored: str) -> bool:
         )
         return pwd_check.hex() == pwd_hash
     except Exception as e:
-        logger.error(f"Error verificando contraseña: {str(e)}")
+        logger.error("Error verificando contraseña: %s", e)
         return False
 
 
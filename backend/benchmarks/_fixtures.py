@@ -0,0 +1,228 @@
+"""
+Utilidades compartidas por los benchmarks
+Firebase en memoria con contadores y generación de datos sintéticos
+"""
+
+import os
+import sys
+import time
+import random
+from collections import Counter
+from typing import Dict, Any, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# La configuración exige una SECRET_KEY distinta a la de ejemplo
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-no-usar-en-produccion")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+CAMPOS_HORAS = [
+    "horas_ordinarias",
+    "recargo_nocturno",
+    "recargo_diurno_dominical",
+    "recargo_nocturno_dominical",
+    "hora_extra_diurna",
+    "hora_extra_nocturna",
+    "hora_diurna_dominical_o_festivo",
+    "hora_extra_diurna_dominical_o_festivo",
+    "hora_nocturna_dominical_o_festivo",
+    "hora_extra_nocturna_dominical_o_festivo",
+]
+
+RECARGOS = {
+    "Ordinarias": 0,
+    "Recargo Nocturno": 35,
+    "Recargo Diurno Dominical": 75,
+    "Recargo Nocturno Dominical": 110,
+    "Hora Extra Diurna": 25,
+    "Hora Extra Nocturna": 75,
+    "Hora Diurna Dominical o Festivo": 80,
+    "Hora Extra Diurna Dominical o Festivo": 105,
+    "Hora Nocturna Dominical o Festivo": 110,
+    "Hora Extra Nocturna Dominical o Festivo": 185,
+}
+
+
+class InMemoryFirebase:
+    """Sustituto de FirebaseManager sobre un árbol en memoria que cuenta cada operación"""
+
+    def __init__(self, tree: Dict[str, Any] = None, latency: float = 0.0):
+        self.tree = tree or {}
+        self.calls = Counter()
+        self.latency = latency
+
+    def _round_trip(self, op: str):
+        self.calls[op] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _node(self, path: str, create: bool = False):
+        node = self.tree
+        for part in [p for p in path.split("/") if p]:
+            if not isinstance(node, dict):
+                return None
+            if part not in node:
+                if not create:
+                    return None
+                node[part] = {}
+            node = node[part]
+        return node
+
+    def read_data(self, path: str, cache: bool = False) -> Dict:
+        self._round_trip("read_data")
+        value = self._node(path)
+        return value if value is not None else {}
+
+    def query(self, path: str, order_by: str, equal_to: Any = None, start_at: Any = None,
+              end_at: Any = None, limit: int = None) -> Dict:
+        self._round_trip("query")
+        node = self._node(path)
+        if not isinstance(node, dict):
+            return {}
+
+        def clave(item):
+            key, value = item
+            if order_by == "$key":
+                return key
+            if order_by == "$value":
+                return value
+            return value.get(order_by) if isinstance(value, dict) else None
+
+        items = [item for item in node.items() if clave(item) is not None]
+        if equal_to is not None:
+            items = [item for item in items if clave(item) == equal_to]
+        if start_at is not None:
+            items = [item for item in items if clave(item) >= start_at]
+        if end_at is not None:
+            items = [item for item in items if clave(item) <= end_at]
+        items.sort(key=lambda item: (clave(item), item[0]))
+        if limit is not None:
+            items = items[:limit]
+        return dict(items)
+
+    def read_keys(self, path: str) -> List[str]:
+        self._round_trip("read_keys")
+        value = self._node(path)
+        return list(value) if isinstance(value, dict) else []
+
+    def write_data(self, path: str, data: Dict) -> bool:
+        self._round_trip("write_data")
+        parent, _, key = path.strip("/").rpartition("/")
+        self._node(parent, create=True)[key] = data
+        return True
+
+    def update_data(self, path: str, data: Dict) -> bool:
+        self._round_trip("update_data")
+        node = self._node(path, create=True)
+        for key, value in data.items():
+            # Como en Realtime Database, un hijo en None se borra
+            if value is None:
+                node.pop(key, None)
+            else:
+                node[key] = value
+        return True
+
+    def delete_data(self, path: str) -> bool:
+        self._round_trip("delete_data")
+        parent, _, key = path.strip("/").rpartition("/")
+        node = self._node(parent)
+        if isinstance(node, dict):
+            node.pop(key, None)
+        return True
+
+    def health_check(self) -> bool:
+        return True
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {"enabled": False}
+
+    def round_trips(self) -> int:
+        return sum(self.calls.values())
+
+
+def generar_cliente(client_id: str, n_empleados: int, periodo: str, seed: int = 7) -> Dict[str, Any]:
+    """Genera el árbol de un cliente con empleados, horas de la quincena y configuración"""
+    rnd = random.Random(seed)
+    employees = {}
+    hours = {}
+    for i in range(n_empleados):
+        emp_id = f"emp-{i:06d}"
+        tipo = "FIJO" if rnd.random() < 0.8 else "TEMPORAL"
+        employees[emp_id] = {
+            "id": emp_id,
+            "client_id": client_id,
+            "nombre": f"Empleado {i}",
+            "cedula": f"{10000000 + i}",
+            "tipo": tipo,
+            "salario": rnd.choice([1423500, 1800000, 2500000, 3200000.5]),
+            "deducir_salud": tipo == "FIJO",
+            "deducir_pension": tipo == "FIJO",
+            "deducir_auxilioTransporte": tipo == "FIJO",
+            "deuda_consumos": rnd.choice([0, 0, 0, 15000, 32000.75]),
+            "created_at": f"{periodo}-01T08:00:00",
+            "updated_at": f"{periodo}-01T08:00:00",
+        }
+        hours_id = f"h-{i:06d}"
+        registro = {
+            "id": hours_id,
+            "client_id": client_id,
+            "employee_id": emp_id,
+            "employee_name": employees[emp_id]["nombre"],
+            "cedula": employees[emp_id]["cedula"],
+            "fecha": f"{periodo}-15",
+            "quincena": periodo,
+            "created_at": f"{periodo}-15T18:00:00",
+            "updated_at": f"{periodo}-15T18:00:00",
+        }
+        for campo in CAMPOS_HORAS:
+            registro[campo] = rnd.choice([0, 0, 1, 2, 4, 7.5, 8, 40, 80])
+        hours[hours_id] = registro
+
+    return {
+        "employees": employees,
+        "hours": hours,
+        "config": {
+            "company": {
+                "salario_minimo_legal": 1423500,
+                "auxilio_transporte": 100000,
+                "descuento_salud_porcentaje": 4.0,
+                "descuento_pension_porcentaje": 4.0,
+            },
+            "hours": {
+                "valor_hora_ordinaria": 1423500 / 240,
+                "horas_por_config": {
+                    nombre: {"nombre": nombre, "recargo_porcentaje": pct}
+                    for nombre, pct in RECARGOS.items()
+                },
+            },
+        },
+    }
+
+
+def usuario_benchmark():
+    """UserContext mínimo para invocar endpoints directamente"""
+    from datetime import datetime
+    from app.security_enhanced import UserContext
+
+    return UserContext(
+        uid="benchmark",
+        email="benchmark@axyra.co",
+        client_id="bench",
+        authenticated_at=datetime.utcnow(),
+    )
+
+
+def token_benchmark() -> str:
+    """JWT de acceso válido para llamar endpoints autenticados"""
+    from app.security_enhanced import create_access_token
+
+    return create_access_token({"uid": "benchmark", "email": "benchmark@axyra.co"}, client_id="bench")
+
+
+def tamanos(default: List[int]) -> List[int]:
+    """Permite sobreescribir los tamaños desde la línea de comandos"""
+    if len(sys.argv) > 1:
+        return [int(x) for x in sys.argv[1:]]
+    return default
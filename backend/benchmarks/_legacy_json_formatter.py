@@ -0,0 +1,38 @@
+"""
+JSONFormatter anterior (datetime.utcnow() + json.dumps por registro)
+
+Copia de app/logging_config.py antes de cachear los campos fijos; solo se usa
+como línea base en bench_json_formatter.py.
+"""
+
+import json
+import logging
+from datetime import datetime
+
+
+class JSONFormatter(logging.Formatter):
+    """Formateador que produce logs en JSON"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        log_data = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        
+        # Agregar información adicional si existe
+        if hasattr(record, 'extra_data'):
+            log_data.update(record.extra_data)
+        
+        # Agregar excepción si existe
+        if record.exc_info:
+            log_data["exception"] = {
+                "type": record.exc_info[0].__name__,
+                "message": str(record.exc_info[1]),
+            }
+        
+        return json.dumps(log_data, ensure_ascii=False)
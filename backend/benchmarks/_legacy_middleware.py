@@ -0,0 +1,240 @@
+"""
+Middlewares basados en BaseHTTPMiddleware (implementación anterior)
+
+Copia de app/middleware.py antes de pasar a ASGI puro; solo se usa como
+línea base en bench_middleware.py.
+"""
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.rate_limit import RateLimiter, build_rate_limiter
+from app.security_enhanced import uid_from_authorization
+from datetime import datetime
+import logging
+import math
+import time
+import uuid
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware que agrega headers de seguridad HTTP
+    Protege contra vulnerabilidades comunes
+    """
+    
+    async def dispatch(self, request: Request, call_next: Callable) -> any:
+        response = await call_next(request)
+        
+        # Headers de seguridad estándar
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        response.headers["Content-Security-Policy"] = "default-src 'self'; script-src 'self' 'unsafe-inline'"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
+        
+        # Header personalizado
+        response.headers["X-Powered-By"] = "Axyra-Nomina/2.1.0"
+        
+        return response
+
+
+class RequestLoggingMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware que registra todas las requests con detalles de seguridad
+    """
+    
+    async def dispatch(self, request: Request, call_next: Callable) -> any:
+        # Generar ID único para la request
+        request_id = str(uuid.uuid4())[:8]
+        request.state.request_id = request_id
+        
+        # Información de la request
+        start_time = time.time()
+        
+        # No loguear headers sensibles
+        safe_headers = {
+            k: v for k, v in request.headers.items()
+            if k.lower() not in ['authorization', 'x-api-key', 'cookie']
+        }
+        
+        logger.info(
+            f"📨 REQUEST [{request_id}] {request.method} {request.url.path}",
+            extra={
+                "request_id": request_id,
+                "method": request.method,
+                "path": request.url.path,
+                "client": request.client.host if request.client else "unknown",
+                "user_agent": request.headers.get("user-agent", "unknown")[:100],
+            }
+        )
+        
+        try:
+            response = await call_next(request)
+            
+            process_time = time.time() - start_time
+            
+            # Log de respuesta
+            log_level = "warning" if response.status_code >= 400 else "info"
+            logger_func = getattr(logger, log_level)
+            
+            logger_func(
+                f"✅ RESPONSE [{request_id}] {response.status_code} ({process_time:.2f}s)",
+                extra={
+                    "request_id": request_id,
+                    "status_code": response.status_code,
+                    "process_time": process_time,
+                }
+            )
+            
+            # Agregar header con ID de request
+            response.headers["X-Request-ID"] = request_id
+            response.headers["X-Process-Time"] = str(process_time)
+            
+            return response
+            
+        except Exception as e:
+            process_time = time.time() - start_time
+            logger.error(
+                f"❌ ERROR [{request_id}] {str(e)} ({process_time:.2f}s)",
+                extra={
+                    "request_id": request_id,
+                    "error": str(e),
+                    "process_time": process_time,
+                },
+                exc_info=True
+            )
+            raise
+
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware para rate limiting por IP, usuario (uid del JWT) y ruta
+    """
+    
+    def __init__(self, app, limiter: RateLimiter = None):
+        super().__init__(app)
+        self.limiter = limiter or build_rate_limiter()
+    
+    async def dispatch(self, request: Request, call_next: Callable) -> any:
+        client_ip = request.client.host if request.client else "unknown"
+        uid = uid_from_authorization(request.headers.get("authorization"))
+        
+        result = self.limiter.check(request.method, request.url.path, client_ip, uid)
+        
+        # Verificar límite
+        if not result.allowed:
+            retry_after = max(1, math.ceil(result.retry_after))
+            logger.warning(f"⚠️  Rate limit excedido para {'usuario ' + uid if uid else 'IP: ' + client_ip}")
+            return JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={
+                    "detail": "Demasiadas solicitudes. Intenta de nuevo más tarde.",
+                    "retry_after": retry_after
+                },
+                headers={
+                    "Retry-After": str(retry_after),
+                    "X-RateLimit-Limit": str(result.limit),
+                    "X-RateLimit-Remaining": "0",
+                }
+            )
+        
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(result.limit)
+        response.headers["X-RateLimit-Remaining"] = str(result.remaining)
+        
+        return response
+
+
+class ErrorHandlingMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware para manejo centralizado de errores
+    """
+    
+    async def dispatch(self, request: Request, call_next: Callable) -> any:
+        try:
+            response = await call_next(request)
+            return response
+        except Exception as exc:
+            request_id = getattr(request.state, "request_id", "unknown")
+            
+            logger.error(
+                f"❌ Excepción no manejada [{request_id}]: {str(exc)}",
+                extra={"request_id": request_id},
+                exc_info=True
+            )
+            
+            # En desarrollo, mostrar detalles
+            # En producción, mostrar mensaje genérico
+            from app.config.settings import settings
+            
+            if settings.DEBUG:
+                detail = str(exc)
+            else:
+                detail = "Error interno del servidor. Contacta a soporte."
+            
+            return JSONResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                content={
+                    "error": "internal_server_error",
+                    "detail": detail,
+                    "request_id": request_id,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+            )
+
+
+class CORSValidationMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware para validar y loguear CORS
+    """
+    
+    async def dispatch(self, request: Request, call_next: Callable) -> any:
+        origin = request.headers.get("origin")
+        
+        if origin:
+            logger.debug(f"🌐 CORS request from: {origin}")
+        
+        response = await call_next(request)
+        
+        if origin:
+            cors_origin = response.headers.get("access-control-allow-origin")
+            if cors_origin:
+                logger.debug(f"✅ CORS permitido: {cors_origin}")
+            else:
+                logger.warning(f"⚠️  CORS bloqueado para: {origin}")
+        
+        return response
+
+
+class IPWhitelistMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware para whitelist de IPs (opcional)
+    """
+    
+    def __init__(self, app, whitelist: list = None):
+        super().__init__(app)
+        self.whitelist = whitelist or []
+    
+    async def dispatch(self, request: Request, call_next: Callable) -> any:
+        if not self.whitelist:
+            return await call_next(request)
+        
+        client_ip = request.client.host if request.client else "unknown"
+        
+        if client_ip not in self.whitelist:
+            logger.warning(f"⚠️  IP no autorizada: {client_ip}")
+            # En development, permitir; en production, bloquear
+            from app.config.settings import settings
+            if settings.is_production:
+                return JSONResponse(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    content={"detail": "IP no autorizada"}
+                )
+        
+        return await call_next(request)
@@ -0,0 +1,80 @@
+"""
+Benchmark: throughput por worker con acceso bloqueante vs asíncrono a Firebase
+
+Lanza requests concurrentes contra GET /api/employees/{id} con un Firebase en
+memoria que simula latencia de red. "bloqueante" llama al SDK desde el event
+loop (comportamiento anterior); "async" usa AsyncFirebaseManager.
+
+Uso:
+    python benchmarks/bench_async_firebase.py [concurrencia ...]
+"""
+
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from _fixtures import InMemoryFirebase, generar_cliente, token_benchmark, tamanos
+
+from app.api import employees
+from app.database.async_firebase import AsyncFirebaseManager
+
+LATENCIA = 0.02  # 20 ms por round-trip
+REQUESTS = 200
+
+
+class BlockingFirebase:
+    """Expone la interfaz asíncrona pero ejecuta el SDK en el event loop"""
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    async def read_data(self, path: str, cache: bool = False):
+        return self.manager.read_data(path, cache=cache)
+
+
+async def cargar(app: FastAPI, concurrencia: int, token: str) -> float:
+    semaforo = asyncio.Semaphore(concurrencia)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        async def una(i: int):
+            async with semaforo:
+                resp = await client.get(
+                    f"/api/employees/emp-{i % 100:06d}", params={"client_id": "bench"}, headers=headers
+                )
+                assert resp.status_code == 200, resp.text
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(una(i) for i in range(REQUESTS)))
+        return REQUESTS / (time.perf_counter() - inicio)
+
+
+def medir(concurrencia: int):
+    firebase = InMemoryFirebase({"clients": {"bench": generar_cliente("bench", 100, "2026-10")}}, latency=LATENCIA)
+    app = FastAPI()
+    app.include_router(employees.router)
+    token = token_benchmark()
+
+    employees.get_async_firebase = lambda: BlockingFirebase(firebase)
+    bloqueante = asyncio.run(cargar(app, concurrencia, token))
+
+    async_firebase = AsyncFirebaseManager(firebase, max_workers=concurrencia)
+    employees.get_async_firebase = lambda: async_firebase
+    asincrono = asyncio.run(cargar(app, concurrencia, token))
+    async_firebase.shutdown()
+
+    return bloqueante, asincrono
+
+
+def main():
+    print(f"latencia simulada: {LATENCIA * 1000:.0f} ms, {REQUESTS} requests")
+    print(f"{'concurrencia':>12} {'bloqueante (req/s)':>19} {'async (req/s)':>14}")
+    for c in tamanos([1, 8, 32]):
+        bloqueante, asincrono = medir(c)
+        print(f"{c:>12} {bloqueante:>19.1f} {asincrono:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
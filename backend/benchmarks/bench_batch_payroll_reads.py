@@ -0,0 +1,62 @@
+"""
+Benchmark: lecturas a Firebase de /api/payroll/batch-calculate
+
+Cuenta los round-trips a Firebase por cantidad de empleados. Antes del índice
+de horas eran 3 + 2N (roster, config x2, y por empleado su registro y el árbol
+completo de horas); ahora deben mantenerse constantes.
+
+Uso:
+    python benchmarks/bench_batch_payroll_reads.py [N ...]
+"""
+
+import asyncio
+import json
+import time
+
+from starlette.requests import Request
+
+from _fixtures import InMemoryFirebase, generar_cliente, usuario_benchmark, tamanos
+
+from app.api import payroll
+from app.database.async_firebase import AsyncFirebaseManager
+
+PERIODO = "2026-10"
+
+# El módulo redefine el nombre más abajo; se toma el endpoint registrado en el router
+calculate_batch_payroll = next(
+    r.endpoint for r in payroll.router.routes if r.path == "/api/payroll/batch-calculate"
+)
+
+
+def medir(n_empleados: int):
+    firebase = InMemoryFirebase({"clients": {"bench": generar_cliente("bench", n_empleados, PERIODO)}})
+    async_firebase = AsyncFirebaseManager(firebase, max_workers=4)
+    payroll.get_async_firebase = lambda: async_firebase
+
+    inicio = time.perf_counter()
+    # Request sin Accept: respuesta JSON completa (no NDJSON)
+    respuesta = asyncio.run(calculate_batch_payroll(
+        request=Request({"type": "http", "method": "POST", "headers": []}),
+        client_id="bench",
+        periodo=PERIODO,
+        employee_ids=None,
+        stream=False,
+        current_user=usuario_benchmark(),
+    ))
+    duracion = time.perf_counter() - inicio
+    async_firebase.shutdown()
+
+    resultado = json.loads(respuesta.body)
+    assert resultado["cantidad_empleados"] == n_empleados
+    return firebase.round_trips(), 3 + 2 * n_empleados, duracion
+
+
+def main():
+    print(f"{'empleados':>10} {'round-trips':>12} {'antes (3+2N)':>13} {'tiempo (s)':>11}")
+    for n in tamanos([10, 100, 500, 2000]):
+        reads, antes, duracion = medir(n)
+        print(f"{n:>10} {reads:>12} {antes:>13} {duracion:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: JSONFormatter anterior vs actual (registros/s)
+
+Formatea la secuencia de registros de una request típica (REQUEST del
+middleware con su contexto, log del handler, RESPONSE) con el formateador
+anterior y con el actual, reporta registros/s y verifica que, salvo el
+timestamp y los campos fijos nuevos, las líneas sean iguales.
+
+Uso:
+    python benchmarks/bench_json_formatter.py [REQUESTS ...]
+"""
+
+import json
+import logging
+import random
+import time
+import uuid
+from datetime import datetime
+
+from _fixtures import tamanos
+
+import _legacy_json_formatter as legacy
+from app.logging_config import JSONFormatter
+
+CAMPOS_FIJOS = ("service", "version", "environment", "host")
+
+
+def registro(name, level, msg, args, func, lineno, extra_data, created):
+    record = logging.LogRecord(name, level, f"/app/{name.replace('.', '/')}.py", lineno, msg, args, None, func)
+    record.created = created
+    record.extra_data = extra_data
+    return record
+
+
+def registros_request(created: float):
+    """Los tres registros que deja una request a /api/payroll/batch-calculate"""
+    request_id = uuid.uuid4().hex[:8]
+    contexto = {"request_id": request_id}
+    return [
+        registro(
+            "app.middleware", logging.INFO, "📨 REQUEST [%s] %s %s",
+            (request_id, "POST", "/api/payroll/batch-calculate"), "__call__", 102,
+            {**contexto, "method": "POST", "path": "/api/payroll/batch-calculate",
+             "client": "10.0.0.7", "user_agent": "Mozilla/5.0 (X11; Linux x86_64)"},
+            created,
+        ),
+        registro(
+            "app.api.payroll", logging.INFO, "Usuario %s calculando nómina en lote para período %s",
+            ("u1@axyra.co", "2026-10"), "calculate_batch_payroll", 390, contexto, created + 0.0004,
+        ),
+        registro(
+            "app.middleware", logging.INFO, "✅ RESPONSE [%s] %s (%.2fs)",
+            (request_id, 200, 0.0123), "send_with_logging", 116,
+            {**contexto, "status_code": 200, "process_time": 0.0123}, created + 0.0123,
+        ),
+    ]
+
+
+def medir(formateador, registros):
+    inicio = time.perf_counter()
+    lineas = [formateador.format(r) for r in registros]
+    return len(registros) / (time.perf_counter() - inicio), lineas
+
+
+def verificar_timestamps(formateador, n=100000):
+    """El timestamp cacheado coincide con datetime.utcfromtimestamp().isoformat()"""
+    base = time.time()
+    for _ in range(n):
+        created = base + random.random() * 5
+        if formateador._timestamp(created) != datetime.utcfromtimestamp(created).isoformat():
+            return False
+    return True
+
+
+def main():
+    actual = JSONFormatter()
+    anterior = legacy.JSONFormatter()
+    print(f"timestamps exactos: {verificar_timestamps(JSONFormatter())}")
+    print(f"{'requests':>9} {'registros':>10} {'anterior (reg/s)':>17} {'actual (reg/s)':>15} {'x':>6} {'iguales':>8}")
+    for n in tamanos([10000, 100000]):
+        base = time.time()
+        registros = [r for i in range(n) for r in registros_request(base + i * 0.001)]
+        rps_anterior, lineas_anterior = medir(anterior, registros)
+        rps_actual, lineas_actual = medir(actual, registros)
+
+        iguales = True
+        for a, b in zip(lineas_anterior, lineas_actual):
+            a, b = json.loads(a), json.loads(b)
+            if not all(campo in b for campo in CAMPOS_FIJOS):
+                iguales = False
+                break
+            for campo in ("timestamp",) + CAMPOS_FIJOS:
+                a.pop(campo, None)
+                b.pop(campo, None)
+            if a != b:
+                iguales = False
+                break
+        print(
+            f"{n:>9} {len(registros):>10} {rps_anterior:>17,.0f} {rps_actual:>15,.0f} "
+            f"{rps_actual / rps_anterior:>6.1f} {str(iguales):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: serialización de la respuesta de nómina en lote
+
+Arma la respuesta de /api/payroll/batch-calculate para un cliente sintético y
+mide el tiempo de convertirla en el cuerpo HTTP:
+
+    fastapi     jsonable_encoder + JSONResponse (json estándar), lo de FastAPI
+    por_defecto jsonable_encoder + FastJSONResponse (default_response_class)
+    directa     FastJSONResponse(...) devuelta por la ruta, con orjson
+    json        FastJSONResponse(...) directa con el respaldo de json estándar
+
+Verifica que todos los cuerpos decodifiquen al mismo JSON.
+
+Uso:
+    python benchmarks/bench_json_responses.py [N ...]
+"""
+
+import json
+import time
+
+from _fixtures import generar_cliente, tamanos
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.api import responses
+from app.api.responses import FastJSONResponse
+from app.business.calculations import PayrollCalculator
+
+PERIODO = "2026-10"
+REPETICIONES = 3
+
+
+def respuesta_lote(n_empleados: int):
+    cliente = generar_cliente("bench", n_empleados, PERIODO)
+    config = {**cliente["config"]["company"], **cliente["config"]["hours"]}
+    empleados = list(cliente["employees"].values())
+    horas = list(cliente["hours"].values())
+    payrolls = PayrollCalculator(config).calcular_nomina_batch(empleados, horas, PERIODO)
+    return {
+        "success": True,
+        "periodo": PERIODO,
+        "cantidad_empleados": len(payrolls),
+        "payrolls": payrolls,
+        "totales": {"total_bruto": 0.0, "total_descuentos": 0.0, "total_neto": 0.0},
+    }
+
+
+def cronometrar(serializar, contenido):
+    """(mejor tiempo de REPETICIONES, cuerpo)"""
+    mejor = float("inf")
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        cuerpo = serializar(contenido)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, cuerpo
+
+
+def medir(n_empleados: int):
+    contenido = respuesta_lote(n_empleados)
+    variantes = {
+        "fastapi": lambda c: JSONResponse(jsonable_encoder(c)).body,
+        "por_defecto": lambda c: FastJSONResponse(jsonable_encoder(c)).body,
+        "directa": lambda c: FastJSONResponse(c).body,
+        "json": responses._dumps_json,
+    }
+    tiempos = {}
+    cuerpos = []
+    for nombre, serializar in variantes.items():
+        tiempos[nombre], cuerpo = cronometrar(serializar, contenido)
+        cuerpos.append(json.loads(cuerpo))
+    identicos = all(cuerpo == cuerpos[0] for cuerpo in cuerpos)
+    return tiempos, identicos
+
+
+def main():
+    backend = "orjson" if responses.dumps is responses._dumps_orjson else "json"
+    print(f"FastJSONResponse usa {backend}")
+    print(
+        f"{'empleados':>10} {'fastapi (s)':>12} {'por_defecto (s)':>16} "
+        f"{'directa (s)':>12} {'json (s)':>9} {'idénticos':>10}"
+    )
+    for n in tamanos([1000, 10000, 50000]):
+        tiempos, identicos = medir(n)
+        print(
+            f"{n:>10} {tiempos['fastapi']:>12.3f} {tiempos['por_defecto']:>16.3f} "
+            f"{tiempos['directa']:>12.3f} {tiempos['json']:>9.3f} {str(identicos):>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
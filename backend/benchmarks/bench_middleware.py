@@ -0,0 +1,99 @@
+"""
+Benchmark: pila de middlewares BaseHTTPMiddleware vs ASGI puro
+
+Misma pila y mismo orden que main.py (logging, rate limit, errores, CORS,
+headers de seguridad) sobre GET /health y POST /api/payroll/calculate/{id},
+con Firebase en memoria sin latencia para que domine el costo del middleware.
+Reporta p50/p99 de latencia por request y requests/s secuenciales.
+
+Uso:
+    python benchmarks/bench_middleware.py [requests]
+"""
+
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+from _fixtures import InMemoryFirebase, generar_cliente, token_benchmark, tamanos
+
+import _legacy_middleware as legacy
+from app import middleware as asgi
+from app.api import payroll
+from app.database.async_firebase import AsyncFirebaseManager
+from app.rate_limit import MemoryBackend, RateLimiter, RateLimitRule
+
+PERIODO = "2026-10"
+
+
+def construir_app(mw) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    app.include_router(payroll.router)
+
+    # Límites altos: se mide el costo del chequeo, no los rechazos
+    limiter = RateLimiter(
+        MemoryBackend(),
+        anonymous_rule=RateLimitRule("ip", 10 ** 9, 60),
+        user_rule=RateLimitRule("user", 10 ** 9, 60),
+    )
+    app.add_middleware(mw.SecurityHeadersMiddleware)
+    app.add_middleware(CORSMiddleware, allow_origins=["http://localhost:3000"], allow_headers=["*"])
+    app.add_middleware(mw.CORSValidationMiddleware)
+    app.add_middleware(mw.ErrorHandlingMiddleware)
+    app.add_middleware(mw.RateLimitMiddleware, limiter=limiter)
+    app.add_middleware(mw.RequestLoggingMiddleware)
+    return app
+
+
+async def medir(app: FastAPI, metodo: str, url: str, n: int, **kwargs):
+    latencias = []
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for _ in range(50):  # calentamiento
+            await client.request(metodo, url, **kwargs)
+        inicio = time.perf_counter()
+        for _ in range(n):
+            t = time.perf_counter()
+            resp = await client.request(metodo, url, **kwargs)
+            latencias.append(time.perf_counter() - t)
+            assert resp.status_code == 200, resp.text
+        total = time.perf_counter() - inicio
+
+    latencias.sort()
+    p50 = statistics.median(latencias) * 1000
+    p99 = latencias[int(len(latencias) * 0.99) - 1] * 1000
+    return p50, p99, n / total
+
+
+def main():
+    n = tamanos([2000])[0]
+    firebase = InMemoryFirebase({"clients": {"bench": generar_cliente("bench", 100, PERIODO)}})
+    async_firebase = AsyncFirebaseManager(firebase, max_workers=4)
+    payroll.get_async_firebase = lambda: async_firebase
+
+    headers = {"Authorization": f"Bearer {token_benchmark()}", "Origin": "http://localhost:3000"}
+    casos = [
+        ("GET /health", "GET", "/health", {"headers": headers}),
+        ("POST /api/payroll/calculate", "POST", "/api/payroll/calculate/emp-000001",
+         {"headers": headers, "params": {"client_id": "bench", "periodo": PERIODO}}),
+    ]
+
+    print(f"{n} requests secuenciales por caso")
+    print(f"{'endpoint':<30} {'pila':<20} {'p50 (ms)':>9} {'p99 (ms)':>9} {'req/s':>9}")
+    for nombre, metodo, url, kwargs in casos:
+        for etiqueta, mw in (("BaseHTTPMiddleware", legacy), ("ASGI puro", asgi)):
+            p50, p99, rps = asyncio.run(medir(construir_app(mw), metodo, url, n, **kwargs))
+            print(f"{nombre:<30} {etiqueta:<20} {p50:>9.3f} {p99:>9.3f} {rps:>9.0f}")
+
+    async_firebase.shutdown()
+
+
+if __name__ == "__main__":
+    main()
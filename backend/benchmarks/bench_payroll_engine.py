@@ -0,0 +1,52 @@
+"""
+Benchmark: cálculo escalar vs columnar de PayrollCalculator
+
+Calcula la nómina de un cliente sintético con ambos motores, verifica que el
+JSON de cada resultado sea idéntico (salvo fecha_calculo) y reporta tiempos.
+
+Uso:
+    python benchmarks/bench_payroll_engine.py [N ...]
+"""
+
+import json
+import time
+
+from _fixtures import generar_cliente, tamanos
+
+from app.business.calculations import PayrollCalculator
+
+PERIODO = "2026-10"
+
+
+def serializar(payrolls):
+    return [json.dumps({**p, "fecha_calculo": None}) for p in payrolls]
+
+
+def medir(n_empleados: int):
+    cliente = generar_cliente("bench", n_empleados, PERIODO)
+    config = {**cliente["config"]["company"], **cliente["config"]["hours"]}
+    empleados = list(cliente["employees"].values())
+    horas = list(cliente["hours"].values())
+    calculator = PayrollCalculator(config)
+
+    inicio = time.perf_counter()
+    escalar = [calculator.calcular_nomina(e, h, PERIODO) for e, h in zip(empleados, horas)]
+    t_escalar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    columnar = calculator.calcular_nomina_batch(empleados, horas, PERIODO)
+    t_columnar = time.perf_counter() - inicio
+
+    identicos = serializar(escalar) == serializar(columnar)
+    return t_escalar, t_columnar, identicos
+
+
+def main():
+    print(f"{'empleados':>10} {'escalar (s)':>12} {'columnar (s)':>13} {'idénticos':>10}")
+    for n in tamanos([1000, 10000, 50000]):
+        t_escalar, t_columnar, identicos = medir(n)
+        print(f"{n:>10} {t_escalar:>12.3f} {t_columnar:>13.3f} {str(identicos):>10}")
+
+
+if __name__ == "__main__":
+    main()
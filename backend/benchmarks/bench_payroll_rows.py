@@ -0,0 +1,73 @@
+"""
+Benchmark: memoria de la nómina en lote, dicts vs PayrollRow
+
+Calcula la nómina de un cliente sintético como lista de dicts (forma pública)
+y como lista de PayrollRow, mide con tracemalloc la memoria retenida y el pico
+de cada representación, y verifica que to_dict() reproduzca el JSON público
+(salvo fecha_calculo).
+
+Uso:
+    python benchmarks/bench_payroll_rows.py [N ...]
+"""
+
+import gc
+import json
+import time
+import tracemalloc
+
+from _fixtures import generar_cliente, tamanos
+
+from app.business.calculations import PayrollCalculator
+
+PERIODO = "2026-10"
+
+
+def serializar(payrolls):
+    return [json.dumps({**p, "fecha_calculo": None}) for p in payrolls]
+
+
+def medir_memoria(calcular):
+    """(resultado, segundos, MB retenidos, MB pico) de calcular()"""
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = calcular()
+    segundos = time.perf_counter() - inicio
+    retenido, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, segundos, retenido / 2 ** 20, pico / 2 ** 20
+
+
+def medir(n_empleados: int):
+    cliente = generar_cliente("bench", n_empleados, PERIODO)
+    config = {**cliente["config"]["company"], **cliente["config"]["hours"]}
+    empleados = list(cliente["employees"].values())
+    horas = list(cliente["hours"].values())
+    calculator = PayrollCalculator(config)
+
+    dicts, t_dicts, mb_dicts, pico_dicts = medir_memoria(
+        lambda: calculator.calcular_nomina_batch(empleados, horas, PERIODO)
+    )
+    del dicts
+    filas, t_filas, mb_filas, pico_filas = medir_memoria(
+        lambda: calculator.calcular_filas_batch(empleados, horas, PERIODO)
+    )
+
+    referencia = calculator.calcular_nomina_batch(empleados, horas, PERIODO)
+    identicos = serializar(referencia) == serializar(f.to_dict() for f in filas)
+    return (t_dicts, mb_dicts, pico_dicts), (t_filas, mb_filas, pico_filas), identicos
+
+
+def main():
+    print(
+        f"{'empleados':>10} {'repr':>6} {'tiempo (s)':>11} {'retenido (MB)':>14} "
+        f"{'pico (MB)':>10} {'idénticos':>10}"
+    )
+    for n in tamanos([10000, 50000]):
+        dicts, filas, identicos = medir(n)
+        for nombre, (segundos, retenido, pico) in (("dicts", dicts), ("filas", filas)):
+            print(f"{n:>10} {nombre:>6} {segundos:>11.3f} {retenido:>14.1f} {pico:>10.1f} {str(identicos):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,20 +6,29 @@ Versión 2.1.0 - Production Ready
 
 import logging
 import sys
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.config.settings import settings
-from app.logging_config import setup_logging
+from app.logging_config import setup_logging, logging_stats
 from app.api import auth, employees, hours, payroll, configuration
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.api.responses import FastJSONResponse
+from app.rate_limit import build_rate_limiter
 from app.middleware import (
     SecurityHeadersMiddleware,
     RequestLoggingMiddleware,
     RateLimitMiddleware,
     ErrorHandlingMiddleware,
-    CORSValidationMiddleware
+    CORSValidationMiddleware,
+    FirebaseTraceMiddleware
 )
 from app.exceptions import register_error_handlers
-from app.database.firebase import get_firebase
+from app.database.async_firebase import get_async_firebase, shutdown_async_firebase
+from app.database.tracing import FIREBASE_TRACE_HEADER
+from app.business.jobs import shutdown_job_manager
+from app.business.calculations import resultados_cache
+from app.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics_registry
+from app.security_enhanced import token_cache
 from datetime import datetime
 
 # Configurar logging PRIMERO
@@ -28,9 +37,9 @@ logger = logging.getLogger(__name__)
 
 # Información de inicio
 logger.info("=" * 60)
-logger.info(f"[STARTUP] {settings.APP_NAME} v{settings.VERSION}")
-logger.info(f"[ENV] Environment: {settings.ENVIRONMENT}")
-logger.info(f"[CONFIG] Debug: {settings.DEBUG}")
+logger.info("[STARTUP] %s v%s", settings.APP_NAME, settings.VERSION)
+logger.info("[ENV] Environment: %s", settings.ENVIRONMENT)
+logger.info("[CONFIG] Debug: %s", settings.DEBUG)
 logger.info("=" * 60)
 
 # ============ CREAR APLICACIÓN ============
@@ -40,6 +49,7 @@ app = FastAPI(
     version=settings.VERSION,
     debug=settings.DEBUG,
     redirect_slashes=False,
+    default_response_class=FastJSONResponse,
     openapi_url="/docs/openapi.json",
     docs_url="/docs",
     redoc_url="/redoc"
@@ -48,6 +58,9 @@ app = FastAPI(
 # ============ CONFIGURAR MIDDLEWARE ============
 logger.info("[SECURITY] Configuring security middleware...")
 
+# Limitador compartido por el middleware y /api/status
+rate_limiter = build_rate_limiter() if settings.RATE_LIMIT_ENABLED else None
+
 # Security Headers Middleware
 app.add_middleware(SecurityHeadersMiddleware)
 
@@ -58,12 +71,22 @@ app.add_middleware(
     allow_credentials=settings.CORS_ALLOW_CREDENTIALS,
     allow_methods=settings.CORS_ALLOW_METHODS,
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER] + ([FIREBASE_TRACE_HEADER] if settings.DEBUG else []),
 )
 
 # Validation y otras capas
 app.add_middleware(CORSValidationMiddleware)
 app.add_middleware(ErrorHandlingMiddleware)
-app.add_middleware(RateLimitMiddleware)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+firebase_trace_enabled = settings.DEBUG if settings.FIREBASE_TRACE_ENABLED is None else settings.FIREBASE_TRACE_ENABLED
+if firebase_trace_enabled:
+    app.add_middleware(
+        FirebaseTraceMiddleware,
+        repeat_threshold=settings.FIREBASE_TRACE_REPEAT_THRESHOLD,
+        call_budget=settings.FIREBASE_TRACE_CALL_BUDGET,
+        header=settings.DEBUG,
+    )
 app.add_middleware(RequestLoggingMiddleware)
 
 # ============ REGISTRAR EXCEPTION HANDLERS ============
@@ -78,26 +101,71 @@ app.include_router(hours.router, prefix="")
 app.include_router(payroll.router, prefix="")
 app.include_router(configuration.router, prefix="")
 
-logger.info(f"[OK] 5 routers included successfully")
+logger.info("[OK] 5 routers included successfully")
+
+# ============ MÉTRICAS ============
+def _cache_stats() -> dict:
+    """Contadores de las cachés en proceso, por nombre"""
+    firebase_cache = get_async_firebase().cache_stats()
+    caches = {"payroll_result": resultados_cache.stats(), "token": token_cache.stats()}
+    if firebase_cache.get("enabled"):
+        caches["firebase"] = firebase_cache
+    return caches
+
+
+def _cache_metric(campo: str):
+    return lambda: {(nombre,): stats.get(campo, 0) for nombre, stats in _cache_stats().items()}
+
+
+def _cache_hit_ratio() -> dict:
+    ratios = {}
+    for nombre, stats in _cache_stats().items():
+        total = stats.get("hits", 0) + stats.get("misses", 0)
+        ratios[(nombre,)] = stats.get("hits", 0) / total if total else 0.0
+    return ratios
+
+
+metrics_registry.register_collector(
+    "app_cache_hits_total", "Aciertos de las cachés en proceso", _cache_metric("hits"),
+    type="counter", labelnames=("cache",)
+)
+metrics_registry.register_collector(
+    "app_cache_misses_total", "Fallos de las cachés en proceso", _cache_metric("misses"),
+    type="counter", labelnames=("cache",)
+)
+metrics_registry.register_collector(
+    "app_cache_hit_ratio", "Fracción de aciertos de las cachés en proceso", _cache_hit_ratio,
+    labelnames=("cache",)
+)
+metrics_registry.register_collector(
+    "app_log_records_dropped_total", "Registros de log descartados con la cola llena",
+    lambda: logging_stats().get("dropped", 0), type="counter"
+)
+if rate_limiter is not None:
+    metrics_registry.register_collector(
+        "rate_limit_tracked_keys", "Claves con estado en el rate limiter", rate_limiter.backend.size
+    )
 
 # ============ EVENTOS DE APLICACIÓN ============
 @app.on_event("startup")
 async def startup_event():
     """Inicialización de la aplicación"""
     try:
-        firebase = get_firebase()
-        health = firebase.health_check()
+        firebase = get_async_firebase()
+        health = await firebase.health_check()
         logger.info("[DB] Firebase connected successfully")
-        logger.info(f"[OK] {settings.APP_NAME} started in {settings.ENVIRONMENT}")
+        logger.info("[OK] %s started in %s", settings.APP_NAME, settings.ENVIRONMENT)
     except Exception as e:
-        logger.error(f"[ERROR] Startup error: {str(e)}")
+        logger.error("[ERROR] Startup error: %s", e)
         raise
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cierre limpio de la aplicación"""
-    logger.info(f"[SHUTDOWN] {settings.APP_NAME} closing...")
+    logger.info("[SHUTDOWN] %s closing...", settings.APP_NAME)
+    shutdown_job_manager()
+    shutdown_async_firebase()
 
 
 # ============ ENDPOINTS DE ESTADO ============
@@ -113,6 +181,7 @@ async def root():
         "endpoints": {
             "health": "/health",
             "status": "/api/status",
+            "metrics": "/metrics",
             "auth": "/api/auth",
             "employees": "/api/employees",
             "hours": "/api/hours",
@@ -127,8 +196,8 @@ async def root():
 async def health_check():
     """Health check simple"""
     try:
-        firebase = get_firebase()
-        firebase_status = firebase.health_check()
+        firebase = get_async_firebase()
+        firebase_status = await firebase.health_check()
         return {
             "status": "healthy",
             "service": settings.APP_NAME,
@@ -137,7 +206,7 @@ async def health_check():
             "firebase": "connected" if firebase_status else "disconnected"
         }
     except Exception as e:
-        logger.error(f"Health check error: {str(e)}")
+        logger.error("Health check error: %s", e)
         return {
             "status": "unhealthy",
             "error": str(e),
@@ -145,12 +214,19 @@ async def health_check():
         }
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Métricas del proceso en formato de texto de Prometheus"""
+        return Response(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/api/status")
 async def api_status():
     """Status endpoint detallado del sistema"""
     try:
-        firebase = get_firebase()
-        firebase_health = firebase.health_check()
+        firebase = get_async_firebase()
+        firebase_health = await firebase.health_check()
         
         return {
             "status": "operational",
@@ -163,13 +239,19 @@ async def api_status():
                     "enabled": True,
                     "origins_count": len(settings.ALLOWED_ORIGINS)
                 },
+                "firebase_cache": firebase.cache_stats(),
+                "payroll_result_cache": resultados_cache.stats(),
                 "rate_limiting": {
                     "enabled": settings.RATE_LIMIT_ENABLED,
-                    "requests_limit": settings.RATE_LIMIT_REQUESTS
+                    "requests_limit": settings.RATE_LIMIT_REQUESTS,
+                    "user_requests_limit": settings.RATE_LIMIT_USER_REQUESTS,
+                    "backend": settings.RATE_LIMIT_BACKEND,
+                    **(rate_limiter.stats() if rate_limiter else {})
                 },
                 "logging": {
                     "level": settings.LOG_LEVEL,
-                    "format": settings.LOG_FORMAT
+                    "format": settings.LOG_FORMAT,
+                    **logging_stats()
                 }
             },
             "features": {
@@ -182,7 +264,7 @@ async def api_status():
             "endpoints_available": 5
         }
     except Exception as e:
-        logger.error(f"Status endpoint error: {str(e)}")
+        logger.error("Status endpoint error: %s", e)
         return {
             "status": "error",
             "error": str(e),
@@ -0,0 +1,34 @@
+"""
+Configuración compartida de las pruebas
+Se ejecutan desde backend/: python -m pytest -q tests
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# La configuración exige una SECRET_KEY de al menos 32 caracteres
+os.environ.setdefault("SECRET_KEY", "pruebas-secret-key-no-usar-en-produccion")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("TOKEN_REVOCATION_BACKEND", "memory")
+
+import pytest
+
+from benchmarks._fixtures import InMemoryFirebase, generar_cliente
+
+PERIODO = "2026-10"
+
+
+@pytest.fixture
+def cliente():
+    """Árbol sintético de un cliente con 200 empleados y sus horas de la quincena"""
+    return generar_cliente("cliente-1", 200, PERIODO)
+
+
+@pytest.fixture
+def firebase(cliente):
+    """FirebaseManager en memoria con el cliente cargado"""
+    return InMemoryFirebase({"clients": {"cliente-1": cliente}})
@@ -0,0 +1,127 @@
+"""Pruebas de la caché de lecturas de Firebase (TTLCache)"""
+
+import types
+
+import pytest
+
+from app.database import cache as cache_module
+from app.database.cache import TTLCache, normalizar_ruta, rutas_relacionadas
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj monotónico controlado por la prueba"""
+    ahora = {"t": 1000.0}
+    monkeypatch.setattr(cache_module, "time", types.SimpleNamespace(monotonic=lambda: ahora["t"]))
+    return ahora
+
+
+def test_normalizar_y_relacionar_rutas():
+    assert normalizar_ruta("/clients//c1/employees/") == "clients/c1/employees"
+    assert rutas_relacionadas("clients/c1", "clients/c1/employees")
+    assert rutas_relacionadas("clients/c1/employees", "clients/c1")
+    assert not rutas_relacionadas("clients/c1", "clients/c10")
+    assert not rutas_relacionadas("clients/c1/employees", "clients/c1/hours")
+
+
+def test_acierto_devuelve_copia():
+    cache = TTLCache()
+    cache.set("/clients/c1/config", {"a": [1, 2]})
+
+    hit, valor = cache.get("clients/c1/config")
+    assert hit and valor == {"a": [1, 2]}
+
+    valor["a"].append(3)
+    assert cache.get("clients/c1/config") == (True, {"a": [1, 2]})
+    assert cache.stats()["hits"] == 2
+
+
+def test_expira_por_ttl(reloj):
+    cache = TTLCache(ttl_seconds=60)
+    cache.set("clients/c1/config", {"a": 1})
+
+    reloj["t"] += 59
+    assert cache.get("clients/c1/config") == (True, {"a": 1})
+
+    reloj["t"] += 1
+    assert cache.get("clients/c1/config") == (False, None)
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_invalida_ruta_ancestros_y_descendientes():
+    cache = TTLCache()
+    cache.set("clients/c1", {"x": 1})
+    cache.set("clients/c1/employees", {"e1": {}})
+    cache.set("clients/c1/employees/e1", {"nombre": "A"})
+    cache.set("clients/c1/hours", {})
+    cache.set("clients/c2/employees", {})
+
+    assert cache.invalidate("clients/c1/employees") == 3
+
+    assert cache.get("clients/c1")[0] is False
+    assert cache.get("clients/c1/employees")[0] is False
+    assert cache.get("clients/c1/employees/e1")[0] is False
+    assert cache.get("clients/c1/hours")[0] is True
+    assert cache.get("clients/c2/employees")[0] is True
+    assert cache.stats()["invalidations"] == 3
+
+
+def test_descarta_lectura_anterior_a_una_invalidacion():
+    cache = TTLCache()
+    generacion = cache.generation
+
+    # Una escritura concurrente invalida mientras la lectura estaba en curso
+    cache.invalidate("clients/c1/employees")
+
+    assert cache.set("clients/c1/employees", {"viejo": True}, generation=generacion) is False
+    assert cache.get("clients/c1/employees") == (False, None)
+    assert cache.set("clients/c1/employees", {"nuevo": True}, generation=cache.generation) is True
+
+
+def test_clear_invalida_lecturas_en_curso():
+    cache = TTLCache()
+    cache.set("a", 1)
+    generacion = cache.generation
+
+    cache.clear()
+
+    assert cache.stats()["entries"] == 0
+    assert cache.set("a", 2, generation=generacion) is False
+
+
+def test_expulsa_lru_por_bytes():
+    valor = "x" * 100
+    tamano = len(b'"' + valor.encode() + b'"')
+    cache = TTLCache(max_bytes=tamano * 3)
+
+    cache.set("a", valor)
+    cache.set("b", valor)
+    cache.set("c", valor)
+    cache.get("a")  # "b" queda como el menos usado
+    cache.set("d", valor)
+
+    assert cache.get("b")[0] is False
+    assert all(cache.get(ruta)[0] for ruta in ("a", "c", "d"))
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == tamano * 3
+
+
+def test_no_guarda_valores_demasiado_grandes_ni_no_serializables():
+    cache = TTLCache(max_bytes=10)
+    circular = {}
+    circular["self"] = circular
+
+    assert cache.set("a", "x" * 20) is False
+    assert cache.set("b", circular) is False
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_reemplazo_actualiza_bytes():
+    cache = TTLCache()
+    cache.set("a", "x" * 10)
+    cache.set("a", "y")
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == len(b'"y"')
+    assert cache.get("a") == (True, "y")
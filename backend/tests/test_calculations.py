@@ -0,0 +1,154 @@
+"""Pruebas del cálculo de nómina en lote frente al cálculo escalar"""
+
+import json
+
+import pytest
+
+from app.business import calculations
+from app.business.calculations import PayrollCalculator
+
+PERIODO = "2026-10"
+
+
+def _sin_fecha(resultado):
+    """Resultado serializado sin fecha_calculo (la única diferencia esperada)"""
+    return json.dumps({k: v for k, v in resultado.items() if k != "fecha_calculo"})
+
+
+def _entrada(cliente):
+    config = {**cliente["config"]["company"], **cliente["config"]["hours"]}
+    empleados = list(cliente["employees"].values())
+    horas = list(cliente["hours"].values())
+    return PayrollCalculator(config), empleados, horas
+
+
+def _escalar(calculator, empleados, horas):
+    return [calculator.calcular_nomina(e, h, PERIODO) for e, h in zip(empleados, horas)]
+
+
+def test_batch_igual_al_escalar(cliente):
+    calculator, empleados, horas = _entrada(cliente)
+
+    escalar = _escalar(calculator, empleados, horas)
+    lote = calculator.calcular_nomina_batch(empleados, horas, PERIODO)
+
+    # Misma serialización: mismos valores al centavo y mismos tipos int/float
+    assert [_sin_fecha(r) for r in lote] == [_sin_fecha(r) for r in escalar]
+
+
+def test_filas_igual_al_escalar(cliente):
+    calculator, empleados, horas = _entrada(cliente)
+
+    escalar = _escalar(calculator, empleados, horas)
+    filas = calculator.calcular_filas_batch(empleados, horas, PERIODO)
+
+    assert [_sin_fecha(f.to_dict()) for f in filas] == [_sin_fecha(r) for r in escalar]
+
+
+def test_batch_casos_borde():
+    calculator = PayrollCalculator({"auxilio_transporte": 100000})
+    empleados = [
+        # Sin banderas ni salario: aplica todo sobre el salario mínimo
+        {"id": "a"},
+        # Sin deducciones ni horas: todo entero
+        {"id": "b", "salario": 2000000, "deducir_salud": False, "deducir_pension": False,
+         "deducir_auxilioTransporte": False, "deuda_consumos": 5000},
+        # Deuda mayor al bruto: neto en cero
+        {"id": "c", "salario": 1500000, "deuda_consumos": 9000000.5},
+        # Salario decimal con deuda decimal
+        {"id": "d", "salario": 3200000.5, "deuda_consumos": 32000.75},
+    ]
+    horas = [
+        {},
+        {},
+        {"horas_ordinarias": 8},
+        {"horas_ordinarias": 7.5, "hora_extra_nocturna": 0.333, "recargo_nocturno": -2},
+    ]
+
+    escalar = _escalar(calculator, empleados, horas)
+    lote = calculator.calcular_nomina_batch(empleados, horas, PERIODO)
+
+    assert [_sin_fecha(r) for r in lote] == [_sin_fecha(r) for r in escalar]
+    assert lote[1]["neto_a_pagar"] == 0 and isinstance(lote[1]["total_descuentos"], int)
+    assert lote[2]["neto_a_pagar"] == 0
+
+
+def test_batch_vacio():
+    calculator = PayrollCalculator({})
+    assert calculator.calcular_nomina_batch([], [], PERIODO) == []
+    assert calculator.calcular_filas_batch([], [], PERIODO) == []
+
+
+def test_batch_sin_numpy(cliente, monkeypatch):
+    calculator, empleados, horas = _entrada(cliente)
+    columnar = calculator.calcular_nomina_batch(empleados, horas, PERIODO)
+
+    monkeypatch.setattr(calculations, "np", None)
+    escalar = calculator.calcular_nomina_batch(empleados, horas, PERIODO)
+    filas = calculator.calcular_filas_batch(empleados, horas, PERIODO)
+
+    assert [_sin_fecha(r) for r in escalar] == [_sin_fecha(r) for r in columnar]
+    assert [_sin_fecha(f.to_dict()) for f in filas] == [_sin_fecha(r) for r in columnar]
+
+
+@pytest.mark.parametrize("cantidad", [0.005, 0.015, 1.125, 2.675, 1234.565])
+def test_redondeo_empates(cantidad):
+    calculator = PayrollCalculator({"valor_hora_ordinaria": 1})
+    empleado = {"id": "x", "salario": 1000000}
+    horas = {"horas_ordinarias": cantidad}
+
+    lote = calculator.calcular_nomina_batch([empleado], [horas], PERIODO)[0]
+    escalar = calculator.calcular_nomina(empleado, horas, PERIODO)
+
+    assert _sin_fecha(lote) == _sin_fecha(escalar)
+
+
+@pytest.fixture
+def memo_calculador(cliente, monkeypatch):
+    """Calculador con huella y una caché de resultados vacía"""
+    monkeypatch.setattr(calculations, "resultados_cache", calculations.ResultadoCache(1000))
+    return calculations.obtener_calculador(cliente["config"]["company"], cliente["config"]["hours"])
+
+
+def test_memo_igual_al_escalar(cliente, memo_calculador):
+    _, empleados, horas = _entrada(cliente)
+
+    for _ in range(2):  # fallo y acierto de caché
+        for empleado, horas_empleado in zip(empleados, horas):
+            memo = calculations.calcular_nomina_memo(memo_calculador, empleado, horas_empleado, PERIODO)
+            escalar = memo_calculador.calcular_nomina(empleado, horas_empleado, PERIODO)
+            assert _sin_fecha(memo) == _sin_fecha(escalar)
+
+    assert calculations.resultados_cache.stats()["hits"] == len(empleados)
+
+
+def test_memo_conserva_los_tipos_de_entrada(memo_calculador):
+    horas = {"horas_ordinarias": 8}
+    variantes = [
+        {"id": "e1", "cedula": 123, "salario": 1500000.0, "deuda_consumos": 0},
+        {"id": "e1", "cedula": "123", "salario": 1500000, "deuda_consumos": 0.0},
+        {"id": "e1", "cedula": 123, "salario": 1500000.0, "deducir_salud": 1},
+    ]
+
+    for empleado in variantes:
+        memo = calculations.calcular_nomina_memo(memo_calculador, empleado, horas, PERIODO)
+        escalar = memo_calculador.calcular_nomina(empleado, horas, PERIODO)
+        assert _sin_fecha(memo) == _sin_fecha(escalar)
+
+    # Solo la tercera reutiliza la primera: 1 equivale al True por defecto y
+    # la deuda ausente a 0
+    assert calculations.resultados_cache.stats()["hits"] == 1
+
+    for cantidad in (8.0, True):
+        memo = calculations.calcular_nomina_memo(memo_calculador, variantes[0], {"horas_ordinarias": cantidad}, PERIODO)
+        assert type(memo["detalle"][0]["cantidad"]) is type(cantidad)
+
+
+@pytest.mark.parametrize("horas", [{"horas_ordinarias": "8"}, {"horas_ordinarias": None}])
+def test_memo_rechaza_horas_no_numericas(memo_calculador, horas):
+    empleado = {"id": "e1", "salario": 1500000}
+
+    with pytest.raises(TypeError):
+        memo_calculador.calcular_nomina(empleado, horas, PERIODO)
+    with pytest.raises(TypeError):
+        calculations.calcular_nomina_memo(memo_calculador, empleado, horas, PERIODO)
@@ -0,0 +1,99 @@
+"""Pruebas de la escritura dual de registros de horas"""
+
+import pytest
+
+from app.database.firebase import FirebaseManager
+from app.database.hours_layout import operaciones_actualizar, operaciones_guardar
+
+CLIENTE = "c1"
+
+
+class _Raiz:
+    """Referencia raíz de Realtime Database: update multi-ruta sobre un dict"""
+
+    def __init__(self, arbol):
+        self.arbol = arbol
+
+    def update(self, cambios):
+        for ruta, valor in cambios.items():
+            *padres, hoja = [parte for parte in ruta.split("/") if parte]
+            nodo = self.arbol
+            for parte in padres:
+                nodo = nodo.setdefault(parte, {})
+            if valor is None:
+                nodo.pop(hoja, None)
+            else:
+                nodo[hoja] = valor
+
+
+class _BaseDatos:
+    def __init__(self):
+        self.arbol = {}
+
+    def reference(self, path=None):
+        assert path is None
+        return _Raiz(self.arbol)
+
+
+@pytest.fixture
+def firebase():
+    """FirebaseManager con batch_write sobre un árbol en memoria (sin el singleton)"""
+    manager = object.__new__(FirebaseManager)
+    manager._mock_mode = False
+    manager.cache = None
+    manager.db = _BaseDatos()
+    return manager
+
+
+def _registro(**campos):
+    return {
+        "id": "h1", "employee_id": "e1", "quincena": "2026-10",
+        "horas_ordinarias": 8, "recargo_nocturno": 0, **campos,
+    }
+
+
+def _copias(firebase):
+    cliente = firebase.db.arbol["clients"][CLIENTE]
+    return cliente["hours"]["h1"], cliente.get("hours_by_quincena", {})
+
+
+def test_actualizaciones_concurrentes_no_se_pisan(firebase):
+    actual = _registro()
+    firebase.batch_write(operaciones_guardar(CLIENTE, "h1", actual))
+
+    # Dos PUT que leyeron el mismo registro y cambian campos distintos
+    firebase.batch_write(operaciones_actualizar(CLIENTE, "h1", actual, {"horas_ordinarias": 6}))
+    firebase.batch_write(operaciones_actualizar(CLIENTE, "h1", actual, {"recargo_nocturno": 2}))
+
+    plano, compuesto = _copias(firebase)
+    esperado = _registro(horas_ordinarias=6, recargo_nocturno=2)
+    assert plano == esperado
+    assert compuesto["2026-10"]["e1"]["h1"] == esperado
+
+
+def test_cambio_de_quincena_mueve_la_copia_compuesta(firebase):
+    actual = _registro()
+    firebase.batch_write(operaciones_guardar(CLIENTE, "h1", actual))
+
+    operaciones = operaciones_actualizar(CLIENTE, "h1", actual, {"quincena": "2026-11"})
+    firebase.batch_write(operaciones)
+
+    plano, compuesto = _copias(firebase)
+    assert plano == _registro(quincena="2026-11")
+    assert "h1" not in compuesto["2026-10"]["e1"]
+    assert compuesto["2026-11"]["e1"]["h1"] == _registro(quincena="2026-11")
+    assert [op["operation"] for op in operaciones] == ["update", "delete", "set"]
+
+
+def test_registro_sin_clave_compuesta(firebase):
+    actual = {"id": "h1", "employee_id": "e1", "horas_ordinarias": 8}
+    firebase.batch_write(operaciones_guardar(CLIENTE, "h1", actual))
+
+    assert operaciones_actualizar(CLIENTE, "h1", actual, {"horas_ordinarias": 4}) == [
+        {"path": f"clients/{CLIENTE}/hours/h1", "operation": "update", "data": {"horas_ordinarias": 4}},
+    ]
+
+    # Al recibir quincena pasa a tener copia compuesta
+    firebase.batch_write(operaciones_actualizar(CLIENTE, "h1", actual, {"quincena": "2026-10"}))
+    plano, compuesto = _copias(firebase)
+    assert compuesto["2026-10"]["e1"]["h1"] == plano == {**actual, "quincena": "2026-10"}
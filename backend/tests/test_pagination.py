@@ -0,0 +1,132 @@
+"""Pruebas de la paginación por cursor (read_paginated y paginar)"""
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.pagination import PaginationParams
+from app.database.firebase import FirebaseManager
+from app.database.pagination import codificar_cursor, decodificar_cursor, paginar
+
+
+class _Consulta:
+    """Consulta order_by_key de Realtime Database sobre un dict"""
+
+    def __init__(self, nodo, inicio=None, limite=None):
+        self.nodo = nodo
+        self.inicio = inicio
+        self.limite = limite
+
+    def order_by_key(self):
+        return self
+
+    def start_at(self, inicio):
+        return _Consulta(self.nodo, inicio, self.limite)
+
+    def limit_to_first(self, limite):
+        return _Consulta(self.nodo, self.inicio, limite)
+
+    def get(self):
+        claves = sorted(k for k in self.nodo if self.inicio is None or k >= self.inicio)
+        return {k: self.nodo[k] for k in claves[:self.limite]}
+
+
+class _BaseDatos:
+    def __init__(self, arbol):
+        self.arbol = arbol
+        self.rutas = []
+
+    def reference(self, path):
+        self.rutas.append(path)
+        nodo = self.arbol
+        for parte in path.split("/"):
+            nodo = nodo.get(parte, {})
+        return _Consulta(nodo)
+
+
+@pytest.fixture
+def manager():
+    """FirebaseManager conectado a una base de datos en memoria (sin el singleton)"""
+    registros = {f"emp-{i:03d}": {"nombre": f"Empleado {i}"} for i in range(23)}
+    firebase = object.__new__(FirebaseManager)
+    firebase._mock_mode = False
+    firebase.db = _BaseDatos({"clients": {"c1": {"employees": registros}}})
+    return firebase, registros
+
+
+def test_cursor_ida_y_vuelta():
+    cursor = codificar_cursor("emp-010")
+    assert "=" not in cursor
+    assert decodificar_cursor(cursor) == "emp-010"
+    assert decodificar_cursor(None) is None
+    assert decodificar_cursor("") is None
+
+
+@pytest.mark.parametrize("cursor", ["no-es-base64!", codificar_cursor(""), "e30", "eyJrIjogMX0"])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError):
+        decodificar_cursor(cursor)
+
+
+def test_read_paginated_recorre_todo_sin_repetir(manager):
+    firebase, registros = manager
+
+    vistos = []
+    cursor = None
+    paginas = 0
+    while True:
+        pagina = firebase.read_paginated("clients/c1/employees", limit=5, cursor=cursor)
+        assert pagina["limit"] == 5
+        assert len(pagina["data"]) <= 5
+        vistos.extend(pagina["data"])
+        paginas += 1
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            break
+        # El cursor apunta al primer registro de la página siguiente
+        assert decodificar_cursor(cursor) not in pagina["data"]
+
+    assert vistos == sorted(registros)
+    assert paginas == 5
+    assert len(firebase.db.rutas) == paginas
+
+
+def test_read_paginated_ultima_pagina_exacta(manager):
+    firebase, registros = manager
+
+    pagina = firebase.read_paginated("clients/c1/employees", limit=len(registros))
+
+    assert list(pagina["data"]) == sorted(registros)
+    assert pagina["next_cursor"] is None
+
+
+def test_read_paginated_cursor_invalido_no_consulta(manager):
+    firebase, _ = manager
+
+    with pytest.raises(ValueError):
+        firebase.read_paginated("clients/c1/employees", limit=5, cursor="basura")
+    assert firebase.db.rutas == []
+
+
+def test_paginar_misma_semantica_que_read_paginated(manager):
+    firebase, registros = manager
+
+    cursor = None
+    while True:
+        pagina, siguiente = paginar(registros, 7, cursor)
+        remota = firebase.read_paginated("clients/c1/employees", limit=7, cursor=cursor)
+        assert pagina == remota["data"]
+        assert siguiente == remota["next_cursor"]
+        if siguiente is None:
+            break
+        cursor = siguiente
+
+
+def test_pagination_params():
+    assert PaginationParams(limit=None, cursor=None).enabled is False
+
+    con_cursor = PaginationParams(limit=None, cursor=codificar_cursor("emp-001"))
+    assert con_cursor.enabled and con_cursor.limit > 0
+
+    with pytest.raises(HTTPException) as error:
+        PaginationParams(limit=10, cursor="basura")
+    assert error.value.status_code == 400
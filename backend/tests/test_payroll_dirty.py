@@ -0,0 +1,125 @@
+"""Pruebas de las marcas de nóminas pendientes de recálculo"""
+
+import pytest
+
+from app.database.async_firebase import AsyncFirebaseManager
+from app.database.payroll_dirty import (
+    empleados_pendientes,
+    marca_lote,
+    operacion_marcar_config,
+    operacion_marcar_empleado,
+    operacion_marcar_horas,
+    operaciones_marcar_horas,
+)
+from benchmarks._fixtures import InMemoryFirebase
+
+CLIENTE = "c1"
+QUINCENA = "2026-10"
+CALCULADO = 1000.0
+
+
+@pytest.fixture
+def base():
+    return InMemoryFirebase()
+
+
+@pytest.fixture
+def firebase(base):
+    """AsyncFirebaseManager sobre la base de datos en memoria"""
+    manager = AsyncFirebaseManager(base, max_workers=2)
+    yield manager
+    manager.shutdown()
+
+
+def _aplicar(base, *operaciones):
+    """Aplica operaciones batch_write 'set' sobre la base en memoria"""
+    for operacion in operaciones:
+        assert operacion["operation"] == "set"
+        base.write_data(operacion["path"], operacion["data"])
+
+
+@pytest.mark.asyncio
+async def test_sin_marcas(firebase):
+    assert await empleados_pendientes(firebase, CLIENTE, QUINCENA, CALCULADO) == (set(), False)
+
+
+@pytest.mark.asyncio
+async def test_solo_marcas_posteriores_al_calculo(base, firebase):
+    _aplicar(
+        base,
+        operacion_marcar_horas(CLIENTE, QUINCENA, "e1", CALCULADO + 1),
+        operacion_marcar_horas(CLIENTE, QUINCENA, "e2", CALCULADO - 1),
+        operacion_marcar_horas(CLIENTE, QUINCENA, "e3", CALCULADO),
+        operacion_marcar_horas(CLIENTE, "2026-09", "e4", CALCULADO + 1),
+        operacion_marcar_empleado(CLIENTE, "e5", CALCULADO + 1),
+        operacion_marcar_empleado(CLIENTE, "e6", CALCULADO - 1),
+    )
+
+    pendientes, config = await empleados_pendientes(firebase, CLIENTE, QUINCENA, CALCULADO)
+
+    # e4 cambió otra quincena; e2, e3 y e6 ya estaban incluidos en el cálculo
+    assert pendientes == {"e1", "e5"}
+    assert config is False
+
+
+@pytest.mark.asyncio
+async def test_la_marca_no_se_consume(base, firebase):
+    _aplicar(base, operacion_marcar_horas(CLIENTE, QUINCENA, "e1", CALCULADO + 1))
+
+    primero = await empleados_pendientes(firebase, CLIENTE, QUINCENA, CALCULADO)
+    segundo = await empleados_pendientes(firebase, CLIENTE, QUINCENA, CALCULADO)
+    recalculado = await empleados_pendientes(firebase, CLIENTE, QUINCENA, CALCULADO + 2)
+
+    assert primero == segundo == ({"e1"}, False)
+    assert recalculado == (set(), False)
+
+
+@pytest.mark.asyncio
+async def test_lote_con_horas_enviadas_ignora_horas_registradas(base, firebase):
+    _aplicar(
+        base,
+        operacion_marcar_horas(CLIENTE, QUINCENA, "e1", CALCULADO + 1),
+        operacion_marcar_empleado(CLIENTE, "e2", CALCULADO + 1),
+    )
+    lecturas = base.calls["read_data"]
+
+    pendientes, _ = await empleados_pendientes(firebase, CLIENTE, QUINCENA, CALCULADO, incluir_horas=False)
+
+    assert pendientes == {"e2"}
+    assert base.calls["read_data"] == lecturas + 2
+
+
+@pytest.mark.asyncio
+async def test_cambio_de_configuracion(base, firebase):
+    _aplicar(base, operacion_marcar_config(CLIENTE, CALCULADO + 1))
+
+    assert await empleados_pendientes(firebase, CLIENTE, QUINCENA, CALCULADO) == (set(), True)
+    assert await empleados_pendientes(firebase, CLIENTE, QUINCENA, CALCULADO + 1) == (set(), False)
+
+
+@pytest.mark.asyncio
+async def test_ignora_marcas_no_numericas(base, firebase):
+    base.write_data(f"clients/{CLIENTE}/payroll_dirty/quincenas/{QUINCENA}", {"e1": "x", "e2": None, "e3": CALCULADO + 1})
+    base.write_data(f"clients/{CLIENTE}/payroll_dirty/config", "x")
+
+    assert await empleados_pendientes(firebase, CLIENTE, QUINCENA, CALCULADO) == ({"e3"}, False)
+
+
+def test_operaciones_marcar_horas_deduplica_y_omite_incompletos():
+    anterior = {"quincena": "2026-09", "employee_id": "e1"}
+    nuevo = {"quincena": QUINCENA, "employee_id": "e1"}
+
+    operaciones = operaciones_marcar_horas(CLIENTE, anterior, nuevo, dict(nuevo), {"quincena": QUINCENA})
+
+    assert sorted(op["path"] for op in operaciones) == [
+        f"clients/{CLIENTE}/payroll_dirty/quincenas/2026-09/e1",
+        f"clients/{CLIENTE}/payroll_dirty/quincenas/{QUINCENA}/e1",
+    ]
+    assert len({op["data"] for op in operaciones}) == 1
+
+
+def test_marca_lote():
+    assert marca_lote({"calculado_ts": 123.5, "created_at": "2026-10-01T00:00:00"}) == 123.5
+    assert marca_lote({"created_at": "2026-10-01T00:00:00"}) > 0
+    assert marca_lote({"created_at": "no es fecha"}) == 0.0
+    assert marca_lote({}) == 0.0
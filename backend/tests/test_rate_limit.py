@@ -0,0 +1,170 @@
+"""Pruebas del rate limiter por token bucket"""
+
+import sqlite3
+import types
+
+import pytest
+
+from app import rate_limit
+from app.rate_limit import (
+    MemoryBackend,
+    RateLimiter,
+    RateLimitRule,
+    SQLiteBackend,
+    parse_route_rules,
+)
+
+REGLA = RateLimitRule("ip", capacity=3, period=30)  # un token cada 10 s
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj controlado por la prueba (monotónico y de pared)"""
+    ahora = {"t": 1000.0}
+    monkeypatch.setattr(
+        rate_limit, "time",
+        types.SimpleNamespace(monotonic=lambda: ahora["t"], time=lambda: ahora["t"]),
+    )
+    return ahora
+
+
+def _fallos_backend():
+    return sum(valor for _, _, valor in rate_limit.rate_limit_backend_failures.samples())
+
+
+def _consumir(backend, veces, clave="ip:1.2.3.4", regla=REGLA):
+    return [backend.consume(clave, regla)[0] for _ in range(veces)]
+
+
+def test_memoria_agota_y_recarga(reloj):
+    backend = MemoryBackend(shards=4, sweep_interval=1000)
+
+    assert _consumir(backend, 4) == [True, True, True, False]
+
+    # Recarga proporcional: a los 10 s hay exactamente un token
+    reloj["t"] += 10
+    assert _consumir(backend, 2) == [True, False]
+
+    # Las cubetas de otras claves son independientes
+    assert _consumir(backend, 1, clave="ip:5.6.7.8") == [True]
+
+
+def test_memoria_recarga_no_supera_la_capacidad(reloj):
+    backend = MemoryBackend(shards=4, sweep_interval=1000)
+    _consumir(backend, 3)
+
+    reloj["t"] += 3600
+    assert _consumir(backend, 4) == [True, True, True, False]
+
+
+def test_memoria_desaloja_solo_cubetas_llenas(reloj):
+    backend = MemoryBackend(shards=4, sweep_interval=1000)
+    _consumir(backend, 1, clave="a")      # llena de nuevo en 10 s
+    _consumir(backend, 3, clave="b")      # llena de nuevo en 30 s
+
+    reloj["t"] += 10
+    assert backend.evict_idle() == 1
+    assert backend.size() == 1
+
+    # Desalojar una cubeta llena no cambia el resultado: vuelve con capacidad completa
+    assert _consumir(backend, 4, clave="a") == [True, True, True, False]
+
+    reloj["t"] += 30
+    assert backend.evict_idle() == 2
+    assert backend.size() == 0
+
+
+def test_memoria_barrido_incremental(reloj):
+    backend = MemoryBackend(shards=4, sweep_interval=40)
+    claves = [f"ip:{i}" for i in range(40)]
+    for clave in claves:
+        backend.consume(clave, REGLA)
+
+    # Todas las cubetas se rellenaron; cada consume tras sweep_interval / shards
+    # barre un único shard (el siguiente en turno)
+    en_primer_shard = len(backend._shards[0])
+    reloj["t"] += 10
+    backend.consume("nueva", REGLA)
+    assert backend.size() == len(claves) - en_primer_shard + 1
+
+    for _ in range(3):
+        reloj["t"] += 10
+        backend.consume("nueva", REGLA)
+    assert backend.size() == 1
+
+
+def test_consume_many_se_detiene_en_el_primer_rechazo(reloj):
+    backend = MemoryBackend(shards=4, sweep_interval=1000)
+    ruta = RateLimitRule("login", capacity=1, period=60)
+    _consumir(backend, 1, clave="route:login:ip:1", regla=ruta)
+
+    resultados = backend.consume_many([("route:login:ip:1", ruta), ("ip:1", REGLA)])
+
+    assert resultados == [(False, 0.0)]
+    assert backend.size() == 1  # la cubeta global no se tocó
+
+
+def test_limiter_rechaza_por_regla_de_ruta_sin_gastar_cupo_global(reloj):
+    limiter = RateLimiter(
+        MemoryBackend(shards=4, sweep_interval=1000),
+        anonymous_rule=REGLA,
+        user_rule=RateLimitRule("user", capacity=10, period=10),
+        route_rules=parse_route_rules("POST /api/auth/login=1/60"),
+    )
+
+    primero = limiter.check("POST", "/api/auth/login", "1.2.3.4")
+    segundo = limiter.check("POST", "/api/auth/login", "1.2.3.4")
+
+    assert primero.allowed and primero.remaining == 0
+    assert not segundo.allowed
+    assert segundo.limit == 1 and segundo.retry_after == pytest.approx(60)
+    assert limiter.stats()["rejected"] == 1
+
+    # La regla global por IP conserva sus dos tokens restantes
+    assert [limiter.check("GET", "/api/employees", "1.2.3.4").allowed for _ in range(3)] == [True, True, False]
+
+    # Un usuario autenticado usa su propia cubeta
+    assert limiter.check("GET", "/api/employees", "1.2.3.4", uid="u1").remaining == 9
+
+
+def test_parse_route_rules():
+    reglas = parse_route_rules(" POST /api/auth/login=10/60, /api/payroll=60/30 ,")
+    assert [(r.method, r.path_prefix, r.capacity, r.period) for r in reglas] == [
+        ("POST", "/api/auth/login", 10, 60.0),
+        (None, "/api/payroll", 60, 30.0),
+    ]
+    assert reglas[0].matches("POST", "/api/auth/login/x")
+    assert not reglas[0].matches("GET", "/api/auth/login")
+
+    for invalida in ("/api=0/60", "/api=10", "/api=10/0", "POST=1/1/1"):
+        with pytest.raises(ValueError):
+            parse_route_rules(invalida)
+
+
+def test_sqlite_misma_semantica_que_memoria(reloj, tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "rl.db"), sweep_interval=1000)
+
+    assert _consumir(backend, 4) == [True, True, True, False]
+    reloj["t"] += 10
+    assert _consumir(backend, 2) == [True, False]
+
+    reloj["t"] += 30
+    assert backend.evict_idle() == 1
+    assert backend.size() == 0
+
+
+def test_sqlite_deja_pasar_si_el_archivo_esta_bloqueado(tmp_path):
+    ruta = str(tmp_path / "rl.db")
+    backend = SQLiteBackend(ruta, sweep_interval=1000, busy_timeout=0.01)
+    otro_worker = sqlite3.connect(ruta, isolation_level=None)
+    otro_worker.execute("BEGIN IMMEDIATE")
+    try:
+        fallos = _fallos_backend()
+        assert backend.consume_many([("ip:1", REGLA), ("ip:2", REGLA)]) == [(True, 2.0), (True, 2.0)]
+        assert _fallos_backend() == fallos + 1
+    finally:
+        otro_worker.execute("ROLLBACK")
+        otro_worker.close()
+
+    assert _consumir(backend, 1) == [True]
+    assert backend.size() == 1
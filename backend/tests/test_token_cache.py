@@ -0,0 +1,246 @@
+"""Pruebas de la caché de tokens verificados y de las revocaciones"""
+
+import time
+import types
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app import revocation, security_enhanced
+from app.revocation import (
+    FirebaseRevocationStore,
+    MemoryRevocationStore,
+    SQLiteRevocationStore,
+    build_revocation_store,
+)
+from app.security_enhanced import (
+    TokenCache,
+    _decode_access_token,
+    create_access_token,
+    revoke_token,
+    uid_from_authorization,
+)
+from benchmarks._fixtures import InMemoryFirebase
+
+
+def _payload(segundos=60, uid="u1"):
+    return {"uid": uid, "email": f"{uid}@test.com", "exp": time.time() + segundos}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """Caché de tokens del módulo reemplazada por una limpia"""
+    nueva = TokenCache(100, MemoryRevocationStore())
+    monkeypatch.setattr(security_enhanced, "token_cache", nueva)
+    return nueva
+
+
+def test_cache_guarda_hasta_exp():
+    cache = TokenCache(10)
+    vigente, vencido = TokenCache.digest("a"), TokenCache.digest("b")
+
+    cache.set(vigente, _payload(60))
+    cache.set(vencido, _payload(-1))
+
+    assert cache.get(vigente)["uid"] == "u1"
+    assert cache.get(vencido) is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "revocation_checks": 0, "revoked": 0}
+
+
+def test_cache_lru_y_deshabilitada():
+    cache = TokenCache(2)
+    a, b, c = (TokenCache.digest(t) for t in "abc")
+    cache.set(a, _payload())
+    cache.set(b, _payload())
+    cache.get(a)
+    cache.set(c, _payload())
+
+    assert cache.get(b) is None
+    assert cache.get(a) is not None and cache.get(c) is not None
+
+    sin_cache = TokenCache(0)
+    sin_cache.set(a, _payload())
+    assert sin_cache.get(a) is None
+
+    # Sin 'exp' no se guarda
+    cache.set(b, {"uid": "u1"})
+    assert cache.get(b) is None
+
+
+def test_revocar_saca_de_la_cache_hasta_exp():
+    cache = TokenCache(10)
+    digest = TokenCache.digest("a")
+    cache.set(digest, _payload())
+
+    cache.revoke(digest, time.time() + 60)
+    assert cache.get(digest) is None
+    assert cache.is_revoked(digest)
+
+    # Pasado el exp del token la revocación ya no hace falta
+    vencido = TokenCache.digest("b")
+    cache.revoke(vencido, time.time() - 1)
+    assert not cache.is_revoked(vencido)
+
+
+def test_memoria_purga_expiradas_al_llenarse():
+    store = MemoryRevocationStore(max_entries=2)
+    store.revoke(b"a", time.time() - 1)
+    store.revoke(b"b", time.time() + 60)
+    store.revoke(b"c", time.time() + 60)
+
+    assert store.size() == 2
+    assert store.is_revoked(b"b") and store.is_revoked(b"c")
+
+
+def test_sqlite_compartido_entre_workers(tmp_path):
+    ruta = str(tmp_path / "revoked.db")
+    worker_1 = SQLiteRevocationStore(ruta)
+    worker_2 = SQLiteRevocationStore(ruta)
+
+    worker_1.revoke(b"token", time.time() + 60)
+    worker_1.revoke(b"viejo", time.time() - 1)
+
+    assert worker_2.is_revoked(b"token")
+    assert not worker_2.is_revoked(b"viejo")
+    assert not worker_2.is_revoked(b"otro")
+
+
+def test_sqlite_barre_expiradas_al_revocar(tmp_path):
+    store = SQLiteRevocationStore(str(tmp_path / "revoked.db"), sweep_interval=0)
+    store.revoke(b"viejo", time.time() - 1)
+    store.revoke(b"nuevo", time.time() + 60)
+
+    assert store.size() == 1
+
+
+def test_firebase_compartido_entre_instancias(monkeypatch):
+    base = InMemoryFirebase()
+    monkeypatch.setattr(FirebaseRevocationStore, "_firebase", staticmethod(lambda: base))
+    instancia_1 = FirebaseRevocationStore()
+    instancia_2 = FirebaseRevocationStore()
+
+    instancia_1.revoke(b"\x01\x02", time.time() + 60)
+
+    assert base.tree[revocation.REVOKED_TOKENS_PATH]["0102"]["exp"] > time.time()
+    assert instancia_2.is_revoked(b"\x01\x02")
+    lecturas = base.calls["read_data"]
+
+    # Una revocación ya vista no vuelve a leerse
+    assert instancia_2.is_revoked(b"\x01\x02")
+    assert base.calls["read_data"] == lecturas
+    assert not instancia_2.is_revoked(b"\x03")
+
+
+def test_firebase_purga_expiradas(monkeypatch):
+    base = InMemoryFirebase({revocation.REVOKED_TOKENS_PATH: {"aa": {"exp": time.time() - 1}}})
+    monkeypatch.setattr(FirebaseRevocationStore, "_firebase", staticmethod(lambda: base))
+    store = FirebaseRevocationStore(sweep_interval=0)
+
+    store.revoke(b"\xbb", time.time() + 60)
+
+    assert list(base.tree[revocation.REVOKED_TOKENS_PATH]) == ["bb"]
+
+
+def test_memoria_exige_un_worker(monkeypatch):
+    monkeypatch.setattr(revocation.settings, "TOKEN_REVOCATION_BACKEND", "memory")
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    with pytest.raises(ValueError):
+        build_revocation_store()
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    assert isinstance(build_revocation_store(), MemoryRevocationStore)
+
+
+def test_logout_revoca_el_token(cache):
+    token = create_access_token({"uid": "u1", "email": "u1@test.com"}, timedelta(minutes=5))
+
+    assert _decode_access_token(token)["uid"] == "u1"
+    assert cache.stats()["entries"] == 1
+
+    revoke_token(token)
+
+    with pytest.raises(HTTPException) as error:
+        _decode_access_token(token)
+    assert error.value.status_code == 401
+    assert error.value.detail == "Token revocado"
+
+    # El rate limiter identifica al usuario sin consultar revocaciones
+    assert uid_from_authorization(f"Bearer {token}") == "u1"
+    assert uid_from_authorization("Bearer basura") is None
+    assert uid_from_authorization(f"Basic {token}") is None
+
+
+def test_token_verificado_se_reutiliza(cache):
+    token = create_access_token({"uid": "u2", "email": "u2@test.com"}, timedelta(minutes=5))
+
+    primero = _decode_access_token(token)
+    segundo = _decode_access_token(token)
+
+    assert segundo is primero
+    assert cache.stats()["hits"] == 1
+
+
+class _StoreContado(MemoryRevocationStore):
+    """Revocaciones en memoria que cuentan las consultas (como si fueran remotas)"""
+
+    def __init__(self):
+        super().__init__()
+        self.consultas = 0
+
+    def is_revoked(self, digest: bytes) -> bool:
+        self.consultas += 1
+        return super().is_revoked(digest)
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj de la caché de tokens controlado por la prueba"""
+    ahora = {"t": time.time()}
+    monkeypatch.setattr(security_enhanced, "time", types.SimpleNamespace(time=lambda: ahora["t"]))
+    return ahora
+
+
+def test_no_consulta_revocaciones_en_cada_request(monkeypatch, reloj):
+    store = _StoreContado()
+    monkeypatch.setattr(security_enhanced, "token_cache", TokenCache(100, store, revocation_ttl=30))
+    token = create_access_token({"uid": "u1", "email": "u1@test.com"}, timedelta(minutes=5))
+
+    for _ in range(5):
+        _decode_access_token(token)
+    assert store.consultas == 1
+
+    reloj["t"] += 31
+    _decode_access_token(token)
+    _decode_access_token(token)
+    assert store.consultas == 2
+
+
+def test_revocacion_de_otro_worker_se_aplica_tras_el_ttl(monkeypatch, reloj):
+    compartido = MemoryRevocationStore()
+    monkeypatch.setattr(security_enhanced, "token_cache", TokenCache(100, compartido, revocation_ttl=30))
+    token = create_access_token({"uid": "u1", "email": "u1@test.com"}, timedelta(minutes=5))
+    _decode_access_token(token)
+
+    # Logout atendido por otro worker: solo escribe en el almacén compartido
+    compartido.revoke(TokenCache.digest(token), time.time() + 300)
+    _decode_access_token(token)
+
+    reloj["t"] += 31
+    with pytest.raises(HTTPException):
+        _decode_access_token(token)
+
+
+def test_token_del_rate_limiter_se_revisa_al_verificar(monkeypatch):
+    store = _StoreContado()
+    monkeypatch.setattr(security_enhanced, "token_cache", TokenCache(100, store))
+    token = create_access_token({"uid": "u1", "email": "u1@test.com"}, timedelta(minutes=5))
+    store.revoke(TokenCache.digest(token), time.time() + 300)
+
+    # uid_from_authorization cachea el token sin consultar revocaciones...
+    assert uid_from_authorization(f"Bearer {token}") == "u1"
+    assert store.consultas == 0
+
+    # ...así que la verificación de la ruta sí las consulta
+    with pytest.raises(HTTPException):
+        _decode_access_token(token)